@@ -1,19 +1,38 @@
 import os
-from flask import Flask
+from flask import Flask, current_app
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_bcrypt import Bcrypt
-from flask_mail import Mail
 from config import config
+from app.utils.replicas import RoutingSession, init_replicas
 
 # Initialize extensions
-db = SQLAlchemy()
-migrate = Migrate()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 jwt = JWTManager()
 bcrypt = Bcrypt()
-mail = Mail()
+
+# Rarely used extensions are imported and bound on first use to keep worker cold start fast
+migrate = None
+mail = None
+
+def get_mail():
+    """Get the Flask-Mail extension, initializing it for the current app on first use"""
+    global mail
+    if mail is None:
+        from flask_mail import Mail
+        mail = Mail()
+    if 'mail' not in current_app.extensions:
+        mail.init_app(current_app)
+    return mail
+
+def init_migrate(app):
+    """Initialize Flask-Migrate (only needed for the `flask db` commands)"""
+    global migrate
+    if migrate is None:
+        from flask_migrate import Migrate
+        migrate = Migrate()
+    migrate.init_app(app, db)
 
 def create_app(config_name='default'):
     """Application factory function"""
@@ -24,14 +43,49 @@ def create_app(config_name='default'):
     
     # Initialize extensions
     db.init_app(app)
-    migrate.init_app(app, db)
+    init_replicas(app)
     jwt.init_app(app)
     bcrypt.init_app(app)
-    mail.init_app(app)
+    
+    # Migrations are only reachable through the Flask CLI
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        init_migrate(app)
+    
+    # Client addresses from trusted reverse proxies only
+    if app.config['PROXY_FIX_HOPS']:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_HOPS'],
+                                x_proto=app.config['PROXY_FIX_HOPS'])
     
     # Enable CORS
     CORS(app)
     
+    # Structured JSON request logs (queued, written off the request path)
+    from app.utils.request_log import init_request_logging
+    init_request_logging(app)
+    
+    # Rate limiting and load shedding
+    from app.utils.ratelimit import limiter
+    limiter.init_app(app)
+    
+    # Auto-dispatch of incidents to admins (index loads from the database on first use)
+    from app.utils.dispatch import init_dispatch
+    init_dispatch(app)
+    
+    # SLA deadlines (set by mapper events; breaches are found by the job worker)
+    from app.utils import sla  # noqa: F401
+    
+    # Dashboard rollups and ranking scores (refreshed by the job worker's periodic tasks)
+    from app.utils import rollups, ranking  # noqa: F401
+    
+    # Geofenced area subscriptions (index loads from the database on first use)
+    from app.utils.geofence import init_geofence
+    init_geofence(app)
+    
+    # Live truck positions (index loads from the database on first use; trail writes are batched)
+    from app.utils.fleet import init_fleet
+    init_fleet(app)
+    
     # Create upload directory if it doesn't exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
@@ -39,10 +93,23 @@ def create_app(config_name='default'):
     from app.routes.auth import auth_bp
     from app.routes.incidents import incidents_bp
     from app.routes.admin import admin_bp
+    from app.routes.subscriptions import subscriptions_bp
+    from app.routes.trucks import trucks_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(incidents_bp, url_prefix='/api/incidents')
     app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    app.register_blueprint(subscriptions_bp, url_prefix='/api/subscriptions')
+    app.register_blueprint(trucks_bp, url_prefix='/api/trucks')
+    
+    # Register CLI commands
+    from app.commands import register_commands
+    register_commands(app)
+    
+    # Run background jobs in process unless a separate `flask jobs work` worker is deployed
+    if app.config['JOBS_WORKER'] == 'thread':
+        from app.utils.jobs import start_worker_on_first_request
+        start_worker_on_first_request(app)
     
     # Health check endpoint
     @app.route('/health')
@@ -50,7 +117,7 @@ def create_app(config_name='default'):
         return {
             'status': 'OK',
             'message': 'VeloManage CMIS Backend is running',
-            'environment': app.config['ENV']
+            'environment': config_name
         }
     
     # Error handlers
@@ -0,0 +1,196 @@
+import asyncio
+import random
+from io import BytesIO
+from asgiref.wsgi import WsgiToAsgi
+from flask import current_app, jsonify, request
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.models.incident import Incident
+from app.routes.incidents import listing_statement, listing_response, stats_response
+from app.utils.replicas import healthy_replicas
+from app.utils.request_log import record_exception
+
+# Async drivers used for the same database the sync (WSGI) side talks to
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+def async_database_uri(uri):
+    """Rewrite a database URI to its asyncio driver"""
+    url = make_url(uri)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+def async_session():
+    """New AsyncSession for the current app (use as `async with async_session() as session`)"""
+    return current_app.extensions['async_db']()
+
+async def replica_session():
+    """New AsyncSession on a healthy read replica, chosen as use_replica() does for the sync
+    handlers, or on the primary when none is (use as `async with await replica_session() as session`)"""
+    sessions = current_app.extensions['async_replicas']
+    if sessions:
+        # The lag check (cached for REPLICA_LAG_CHECK_SECONDS) uses the sync engines
+        replicas = await asyncio.to_thread(healthy_replicas, current_app.extensions['replicas'])
+        if replicas:
+            return sessions[random.choice(replicas)]()
+    return async_session()
+
+async def list_incidents():
+    """Async GET /api/incidents/ (same filters, fields and body as the sync handler)"""
+    try:
+        try:
+            statement, fields, page, per_page = listing_statement(request.args)
+        except ValueError as e:
+            error, message = e.args
+            return jsonify({
+                'error': error,
+                'message': message
+            }), 400
+        
+        async with await replica_session() as session:
+            total = await session.scalar(
+                select(func.count()).select_from(statement.order_by(None).subquery())
+            )
+            items = (await session.scalars(
+                statement.limit(per_page).offset((page - 1) * per_page)
+            )).all()
+        
+        return listing_response(items, fields, page, per_page, total), 200
+        
+    except Exception as e:
+        record_exception(e)
+        return jsonify({
+            'error': 'Incident retrieval failed',
+            'message': 'Unable to get incidents'
+        }), 500
+
+async def incident_stats():
+    """Async GET /api/incidents/stats"""
+    try:
+        async with await replica_session() as session:
+            results = [
+                (await session.execute(statement)).all() for statement in Incident.stats_statements()
+            ]
+        return stats_response(Incident.combine_stats(results)), 200
+        
+    except Exception as e:
+        record_exception(e)
+        return jsonify({
+            'error': 'Statistics retrieval failed',
+            'message': 'Unable to get incident statistics'
+        }), 500
+
+# (method, path) -> async handler; every other request is served by the Flask app
+ASYNC_ROUTES = {
+    ('GET', '/api/incidents/'): list_incidents,
+    ('GET', '/api/incidents/stats'): incident_stats
+}
+
+def _environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope so the request can run inside a Flask request context"""
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope['query_string'].decode('ascii'),
+        'SERVER_PROTOCOL': f'HTTP/{scope["http_version"]}',
+        'SERVER_NAME': scope['server'][0] if scope.get('server') else 'localhost',
+        'SERVER_PORT': str(scope['server'][1]) if scope.get('server') else '80',
+        'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': BytesIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1')
+        key = {'content-length': 'CONTENT_LENGTH', 'content-type': 'CONTENT_TYPE'}.get(
+            name, f'HTTP_{name.upper().replace("-", "_")}'
+        )
+        value = value.decode('latin1')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+class AsgiApp:
+    """ASGI entry point: hot read-only endpoints run natively on the event loop with async DB access,
+    everything else is served by the unchanged Flask app in a thread pool (asgiref's WsgiToAsgi).
+
+    Native handlers still run Flask's before/after request hooks, so rate limiting, load
+    shedding and CORS behave exactly as under WSGI.
+    """
+
+    def __init__(self, flask_app, routes=None):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.routes = ASYNC_ROUTES if routes is None else routes
+        options = flask_app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+        self.engine = create_async_engine(
+            async_database_uri(flask_app.config['SQLALCHEMY_DATABASE_URI']), **options
+        )
+        # Named like the sync replica engines, so healthy_replicas() picks for both
+        self.replica_engines = {
+            name: create_async_engine(async_database_uri(engine.url), **options)
+            for name, engine in flask_app.extensions['replicas'].items()
+        }
+        flask_app.extensions['async_db'] = async_sessionmaker(self.engine, expire_on_commit=False)
+        flask_app.extensions['async_replicas'] = {
+            name: async_sessionmaker(engine, expire_on_commit=False)
+            for name, engine in self.replica_engines.items()
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        handler = self.routes.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+        if handler is None:
+            return await self.wsgi(scope, receive, send)
+        return await self._handle(handler, scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def dispose(self):
+        """Close the async engines' pooled connections"""
+        for engine in [self.engine, *self.replica_engines.values()]:
+            await engine.dispose()
+
+    async def _handle(self, handler, scope, receive, send):
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        app = self.flask_app
+        with app.request_context(_environ(scope, body)):
+            try:
+                response = app.preprocess_request()
+                if response is None:
+                    response = await handler()
+                response = app.process_response(app.make_response(response))
+            except Exception as e:
+                response = app.make_response(app.handle_exception(e))
+
+            await send({
+                'type': 'http.response.start',
+                'status': response.status_code,
+                'headers': [
+                    (name.lower().encode('latin1'), value.encode('latin1'))
+                    for name, value in response.headers.items()
+                ]
+            })
+            await send({'type': 'http.response.body', 'body': response.get_data()})
+
+def create_asgi_app(flask_app):
+    """Wrap a Flask app for ASGI servers such as uvicorn"""
+    return AsgiApp(flask_app)
@@ -0,0 +1,325 @@
+import click
+from flask.cli import AppGroup
+
+users_cli = AppGroup('users', help='User accounts')
+
+@users_cli.command('normalize-emails')
+def normalize_emails_command():
+    """Fill email_normalized for users created before it existed (run once after upgrading)"""
+    from app import db
+    from app.models.user import User
+
+    normalized = db.func.lower(db.func.trim(User.email))
+    duplicates = db.session.query(normalized, db.func.count()).group_by(normalized).having(db.func.count() > 1).all()
+    if duplicates:
+        for email, count in duplicates:
+            click.echo(f'{count} accounts share the email {email}')
+        raise click.ClickException('Merge or rename these accounts before normalizing emails')
+
+    updated = User.query.filter(User.email_normalized.is_(None)).update(
+        {'email_normalized': normalized}, synchronize_session=False
+    )
+    db.session.commit()
+    click.echo(f'Normalized {updated} email address(es)')
+
+@users_cli.command('search-indexes')
+def search_indexes_command():
+    """Create the user search indexes on a database created before they existed"""
+    from app.utils.user_search import create_search_indexes
+
+    create_search_indexes()
+    click.echo('User search indexes are in place')
+
+rollups_cli = AppGroup('rollups', help='Daily incident rollup maintenance')
+
+@rollups_cli.command('refresh')
+@click.option('--full', is_flag=True, help='Recompute every day instead of only dirty days')
+def refresh_rollups_command(full):
+    """Recompute daily rollups for days changed since the last run (the job worker also does this)"""
+    from app.utils.rollups import refresh_rollups
+
+    days = refresh_rollups(full=full)
+    click.echo(f'Refreshed rollups for {len(days)} day(s)')
+
+dedup_cli = AppGroup('dedup', help='Duplicate incident detection')
+
+@dedup_cli.command('backfill')
+@click.option('--batch-size', default=1000, help='Incidents per batch')
+def backfill_signatures_command(batch_size):
+    """Compute text signatures for incidents reported before duplicate detection existed"""
+    from app import db
+    from app.models.incident import Incident
+
+    total = 0
+    last_id = 0
+    while True:
+        batch = Incident.query.filter(
+            Incident.id > last_id,
+            Incident.text_signature.is_(None)
+        ).order_by(Incident.id).limit(batch_size).all()
+        if not batch:
+            break
+        for incident in batch:
+            incident.refresh_signature()
+        db.session.commit()
+        total += len(batch)
+        last_id = batch[-1].id
+        click.echo(f'Signed {total} incident(s)')
+
+scores_cli = AppGroup('scores', help='Trending and urgency ranking')
+
+@scores_cli.command('decay')
+@click.option('--batch-size', default=1000, help='Incidents per batch')
+def decay_scores_command(batch_size):
+    """Recompute age-dependent urgency scores for active incidents (the job worker also does this)"""
+    from app.utils.ranking import decay_scores
+
+    click.echo(f'Rescored {decay_scores(batch_size)} incident(s)')
+
+jobs_cli = AppGroup('jobs', help='Background job queue')
+
+@jobs_cli.command('work')
+@click.option('--once', is_flag=True, help='Run due jobs once and exit')
+def work_command(once):
+    """Run the background job worker in this process"""
+    from flask import current_app
+    from app.utils.jobs import run_pending, work
+
+    if once:
+        click.echo(f'Processed {run_pending()} job(s)')
+    else:
+        click.echo('Job worker started')
+        work(current_app._get_current_object())
+
+sla_cli = AppGroup('sla', help='SLA deadlines and breach detection')
+
+@sla_cli.command('check')
+def check_sla_command():
+    """Mark incidents past their deadline as breached and notify (the job worker also runs this)"""
+    from app.utils.sla import check_breaches
+
+    click.echo(f'Found {len(check_breaches())} new SLA breach(es)')
+
+@sla_cli.command('backfill')
+@click.option('--batch-size', default=1000, help='Incidents per batch')
+def backfill_due_dates_command(batch_size):
+    """Set deadlines on incidents reported before SLA tracking existed"""
+    from app import db
+    from app.models.incident import Incident
+    from app.utils.sla import sla_due_at
+
+    total = 0
+    last_id = 0
+    while True:
+        batch = Incident.query.filter(
+            Incident.id > last_id,
+            Incident.due_at.is_(None)
+        ).order_by(Incident.id).limit(batch_size).all()
+        if not batch:
+            break
+        for incident in batch:
+            incident.due_at = sla_due_at(incident.priority, incident.created_at)
+        db.session.commit()
+        total += len(batch)
+        last_id = batch[-1].id
+        click.echo(f'Set deadlines for {total} incident(s)')
+
+history_cli = AppGroup('history', help='Incident status history')
+
+@history_cli.command('backfill')
+@click.option('--batch-size', default=5000, help='Incidents per batch')
+def backfill_history_command(batch_size):
+    """Record the current state of incidents that have no history yet (run once after upgrading)"""
+    from sqlalchemy import case, select
+    from app import db
+    from app.models.incident import Incident
+    from app.models.history import IncidentStatusChange, PRIORITY_CODES, STATUS_CODES
+
+    history = IncidentStatusChange.__table__
+    total = 0
+    last_id = 0
+    while True:
+        ids = [incident_id for incident_id, in db.session.query(Incident.id).filter(
+            Incident.id > last_id
+        ).order_by(Incident.id).limit(batch_size)]
+        if not ids:
+            break
+        snapshot = select(
+            Incident.id,
+            case(STATUS_CODES, value=Incident.status, else_=0),
+            case(PRIORITY_CODES, value=Incident.priority, else_=0),
+            Incident.assigned_to,
+            Incident.reported_by,
+            Incident.created_at
+        ).where(
+            Incident.id.in_(ids),
+            ~select(history.c.id).where(history.c.incident_id == Incident.id).exists()
+        )
+        result = db.session.execute(history.insert().from_select(
+            ['incident_id', 'status', 'priority', 'assigned_to', 'changed_by', 'changed_at'], snapshot
+        ))
+        db.session.commit()
+        total += result.rowcount
+        last_id = ids[-1]
+        click.echo(f'Recorded history for {total} incident(s)')
+
+dispatch_cli = AppGroup('dispatch', help='Auto-dispatch of incidents to admins')
+
+@dispatch_cli.command('recount')
+def recount_command():
+    """Recompute admins' open workload counters from the incidents table"""
+    from app.utils.dispatch import recount_open_assignments
+
+    click.echo(f'Recounted workload for {recount_open_assignments()} user(s)')
+
+sync_cli = AppGroup('sync', help='Delta sync feed')
+
+@sync_cli.command('purge-tombstones')
+def purge_tombstones_command():
+    """Delete deletion-log entries older than SYNC_TOMBSTONE_DAYS (schedule via cron)"""
+    from datetime import datetime, timedelta
+    from flask import current_app
+    from app.models.tombstone import IncidentTombstone
+
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config['SYNC_TOMBSTONE_DAYS'])
+    click.echo(f'Purged {IncidentTombstone.purge_before(cutoff)} tombstone(s)')
+
+geocode_cli = AppGroup('geocode', help='Offline reverse geocoding')
+
+@geocode_cli.command('build')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', help='Index file to write (defaults to GEOCODER_INDEX_PATH)')
+@click.option('--cell-degrees', default=0.05, help='Grid cell size of the index')
+def build_gazetteer_command(csv_path, output, cell_degrees):
+    """Compile a gazetteer CSV (latitude, longitude, address, city, state, zip_code) into an index file"""
+    import os
+    from flask import current_app
+    from app.utils.geocoder import build_gazetteer, load_gazetteer_csv
+
+    output = output or current_app.config['GEOCODER_INDEX_PATH']
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    count = build_gazetteer(load_gazetteer_csv(csv_path), output, cell_degrees)
+    click.echo(f'Indexed {count} place(s) into {output}')
+
+@geocode_cli.command('backfill')
+@click.option('--batch-size', default=1000, help='Incidents per batch')
+def backfill_locations_command(batch_size):
+    """Fill missing address, city, state and zip code of existing incidents from the gazetteer"""
+    from app import db
+    from app.models.incident import Incident
+    from app.utils.geocoder import GEOCODED_FIELDS, fill_location, gazetteer
+
+    if gazetteer() is None:
+        raise click.ClickException('No gazetteer index; run `flask geocode build` first')
+
+    missing = db.or_(*(
+        db.or_(getattr(Incident, field).is_(None), getattr(Incident, field) == '') for field in GEOCODED_FIELDS
+    ))
+    scanned = filled = 0
+    last_id = 0
+    while True:
+        batch = Incident.query.filter(Incident.id > last_id, missing).order_by(Incident.id).limit(batch_size).all()
+        if not batch:
+            break
+        filled += sum(fill_location(incident) for incident in batch)
+        db.session.commit()
+        scanned += len(batch)
+        last_id = batch[-1].id
+        click.echo(f'Geocoded {filled}/{scanned} incident(s)')
+
+coordinates_cli = AppGroup('coordinates', help='Incident coordinate storage')
+
+@coordinates_cli.command('migrate')
+@click.option('--batch-size', default=5000, help='Rows converted per transaction')
+@click.option('--pause', default=0.0, help='Seconds to sleep between batches to limit database load')
+def migrate_coordinates_command(batch_size, pause):
+    """Convert decimal latitude/longitude columns to integer microdegrees (run once, before deploying)"""
+    from app.utils.coordinates import migrate_coordinates
+
+    converted = migrate_coordinates(
+        batch_size, pause, progress=lambda table, total: click.echo(f'{table}: converted {total} row(s)')
+    )
+    if not converted:
+        click.echo('Coordinates are already stored as microdegrees')
+    for table, total in converted.items():
+        click.echo(f'{table}: switched to microdegrees ({total} row(s))')
+
+idempotency_cli = AppGroup('idempotency', help='Idempotency-Key storage')
+
+@idempotency_cli.command('purge')
+def purge_idempotency_keys_command():
+    """Delete expired idempotency keys (schedule via cron)"""
+    from app.models.idempotency import IdempotencyKey
+
+    click.echo(f'Purged {IdempotencyKey.purge_expired()} expired key(s)')
+
+archive_cli = AppGroup('archive', help='Archival of long-resolved incidents')
+
+@archive_cli.command('run')
+@click.option('--days', type=int, help='Archive incidents resolved more than this many days ago')
+@click.option('--batch-size', type=int, help='Incidents moved per transaction')
+@click.option('--pause', type=float, help='Seconds to sleep between batches to limit database load')
+@click.option('--limit', type=int, help='Stop after roughly this many incidents')
+def archive_command(days, batch_size, pause, limit):
+    """Move long-resolved incidents to the archive table in throttled batches (schedule via cron)"""
+    import time
+    from flask import current_app
+    from app.utils.archive import archive_batch, archive_cutoff, archivable_query
+
+    config = current_app.config
+    days = days if days is not None else config['ARCHIVE_AFTER_DAYS']
+    batch_size = batch_size or config['ARCHIVE_BATCH_SIZE']
+    pause = pause if pause is not None else config['ARCHIVE_PAUSE_SECONDS']
+    cutoff = archive_cutoff(days)
+
+    pending = archivable_query(cutoff).count()
+    click.echo(f'{pending} incident(s) resolved before {cutoff:%Y-%m-%d} to archive')
+
+    total = 0
+    last_id = 0
+    while limit is None or total < limit:
+        ids = archive_batch(cutoff, batch_size, after_id=last_id)
+        if not ids:
+            break
+        total += len(ids)
+        last_id = ids[-1]
+        click.echo(f'Archived {total}/{pending} incident(s)')
+        if len(ids) < batch_size:
+            break
+        time.sleep(pause)
+
+    click.echo(f'Archived {total} incident(s)')
+
+@click.command('import-profile')
+@click.option('--config', 'config_name', default='production', help='Config name passed to create_app')
+@click.option('--top', default=25, help='Number of modules to show')
+def import_profile_command(config_name, top):
+    """Report the slowest imports and total time of create_app in a fresh interpreter"""
+    from app.utils.startup import measure_startup, profile_imports
+
+    entries = profile_imports(config_name)
+    top_level = sum(cumulative for name, self_us, cumulative, depth in entries if depth == 0)
+
+    click.echo(f'{"cumulative ms":>14} {"self ms":>9}  module')
+    for name, self_us, cumulative, depth in sorted(entries, key=lambda entry: -entry[2])[:top]:
+        click.echo(f'{cumulative / 1000:>14.1f} {self_us / 1000:>9.1f}  {"  " * depth}{name}')
+
+    click.echo(f'\nTotal import time: {top_level / 1000:.1f} ms')
+    click.echo(f'Startup (imports + create_app): {measure_startup(config_name) * 1000:.1f} ms')
+
+def register_commands(app):
+    """Register CLI command groups on the app"""
+    app.cli.add_command(users_cli)
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(dedup_cli)
+    app.cli.add_command(scores_cli)
+    app.cli.add_command(archive_cli)
+    app.cli.add_command(idempotency_cli)
+    app.cli.add_command(dispatch_cli)
+    app.cli.add_command(sla_cli)
+    app.cli.add_command(history_cli)
+    app.cli.add_command(sync_cli)
+    app.cli.add_command(geocode_cli)
+    app.cli.add_command(coordinates_cli)
+    app.cli.add_command(import_profile_command)
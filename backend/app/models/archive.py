@@ -0,0 +1,43 @@
+from datetime import datetime
+from app.models.incident import Incident
+from app import db
+
+ARCHIVABLE_STATUSES = ('resolved', 'closed')
+
+def _archived_column(column):
+    """Copy of a live incidents column; values are copied verbatim so no defaults are needed"""
+    foreign_keys = [db.ForeignKey(key.target_fullname) for key in column.foreign_keys]
+    return db.Column(column.name, column.type, *foreign_keys,
+                     primary_key=column.primary_key, nullable=column.nullable, autoincrement=False)
+
+class ArchivedIncident(db.Model):
+    """Resolved or closed incident moved out of the live table by `flask archive run`"""
+    __table__ = db.Table(
+        'incidents_archive',
+        *[_archived_column(column) for column in Incident.__table__.columns],
+        db.Column('archived_at', db.DateTime, default=datetime.utcnow, nullable=False),
+        db.Index('ix_incidents_archive_created_at', 'created_at'),
+        db.Index('ix_incidents_archive_resolved_at', 'resolved_at'),
+        db.Index('ix_incidents_archive_reported_by', 'reported_by')
+    )
+    
+    reporter = db.relationship('User', foreign_keys='ArchivedIncident.reported_by')
+    assigned_admin = db.relationship('User', foreign_keys='ArchivedIncident.assigned_to')
+    
+    def get_vote_count(self):
+        """Get net vote count"""
+        return self.upvotes - self.downvotes
+    
+    def to_dict(self, fields=None):
+        """Same representation as a live incident, plus when it was archived"""
+        data = Incident.to_dict(self, fields)
+        data['archived_at'] = self.archived_at.isoformat()
+        return data
+    
+    @staticmethod
+    def find(incident_id):
+        """Look an incident up in the live table first, then in the archive"""
+        return db.session.get(Incident, incident_id) or db.session.get(ArchivedIncident, incident_id)
+    
+    def __repr__(self):
+        return f'<ArchivedIncident {self.title}>'
@@ -0,0 +1,145 @@
+from datetime import datetime
+from flask import has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.models.incident import Incident
+from app import db
+
+# Small-int encodings of the incident enums; 0 stores a value outside the known set
+STATUS_CODES = {'open': 1, 'in_progress': 2, 'resolved': 3, 'closed': 4}
+PRIORITY_CODES = {'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+PRIORITY_NAMES = {code: name for name, code in PRIORITY_CODES.items()}
+
+TRACKED_FIELDS = ('status', 'priority', 'assigned_to')
+
+# Rows per multi-row INSERT (keeps bulk updates under SQLite's bound-parameter limit)
+_INSERT_CHUNK = 500
+
+class IncidentStatusChange(db.Model):
+    """Append-only snapshot of an incident's status, priority and assignee after each change"""
+    __tablename__ = 'incident_status_history'
+    __table_args__ = (
+        db.Index('ix_incident_status_history_timeline', 'incident_id', 'changed_at', 'id'),
+        db.Index('ix_incident_status_history_changed_at', 'changed_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: the history outlives archival and deletion of the incident
+    incident_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.SmallInteger, nullable=False)
+    priority = db.Column(db.SmallInteger, nullable=False)
+    assigned_to = db.Column(db.Integer)
+    changed_by = db.Column(db.Integer)
+    changed_at = db.Column(db.DateTime, nullable=False)
+    
+    def to_dict(self):
+        """Convert history entry to dictionary"""
+        return {
+            'status': STATUS_NAMES.get(self.status),
+            'priority': PRIORITY_NAMES.get(self.priority),
+            'assigned_to': self.assigned_to,
+            'changed_by': self.changed_by,
+            'changed_at': self.changed_at.isoformat()
+        }
+    
+    @staticmethod
+    def snapshot(incident, changed_by, changed_at):
+        """History row values for an incident's current state"""
+        return {
+            'incident_id': incident.id,
+            'status': STATUS_CODES.get(incident.status, 0),
+            'priority': PRIORITY_CODES.get(incident.priority, 0),
+            'assigned_to': incident.assigned_to,
+            'changed_by': changed_by,
+            'changed_at': changed_at
+        }
+    
+    @staticmethod
+    def timeline(incident_id):
+        """An incident's changes, oldest first"""
+        return IncidentStatusChange.query.filter_by(incident_id=incident_id).order_by(
+            IncidentStatusChange.changed_at, IncidentStatusChange.id
+        ).all()
+    
+    @staticmethod
+    def time_in_state(since, now=None):
+        """Per status: stints entered since `since`, how many are still open, and average/total hours.
+
+        Window functions do the work in the database: LAG drops rows that only changed the
+        priority or assignee, and LEAD gives the time each stint ended (now if it has not).
+        """
+        from sqlalchemy import case, func, or_, select
+        from app.utils.rollups import _seconds_between
+        
+        now = now or datetime.utcnow()
+        history = IncidentStatusChange
+        touched = select(history.incident_id).where(history.changed_at >= since)
+        ordering = (history.changed_at, history.id)
+        changes = select(
+            history.id, history.incident_id, history.status, history.changed_at,
+            func.lag(history.status).over(partition_by=history.incident_id, order_by=ordering).label('previous')
+        ).where(history.incident_id.in_(touched)).subquery()
+        stints = select(
+            changes.c.status,
+            changes.c.changed_at.label('entered_at'),
+            func.lead(changes.c.changed_at).over(
+                partition_by=changes.c.incident_id, order_by=(changes.c.changed_at, changes.c.id)
+            ).label('left_at')
+        ).where(or_(changes.c.previous.is_(None), changes.c.previous != changes.c.status)).subquery()
+        
+        seconds = _seconds_between(stints.c.entered_at, func.coalesce(stints.c.left_at, now))
+        rows = db.session.query(
+            stints.c.status,
+            func.count(),
+            func.sum(case((stints.c.left_at.is_(None), 1), else_=0)),
+            func.avg(seconds),
+            func.sum(seconds)
+        ).filter(stints.c.entered_at >= since).group_by(stints.c.status).all()
+        
+        return [
+            {
+                'status': STATUS_NAMES.get(status),
+                'stints': count,
+                'in_progress_stints': int(ongoing or 0),
+                'avg_hours': round(float(average) / 3600, 2),
+                'total_hours': round(float(total) / 3600, 2)
+            }
+            for status, count, ongoing, average, total in sorted(rows, key=lambda row: row[0])
+        ]
+    
+    def __repr__(self):
+        return f'<IncidentStatusChange {self.incident_id} {STATUS_NAMES.get(self.status)}>'
+
+def _actor():
+    """Id of the authenticated user making the current request, if any"""
+    if not has_request_context():
+        return None
+    try:
+        from flask_jwt_extended import get_jwt_identity
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+@event.listens_for(Session, 'after_flush')
+def _record_incident_changes(session, flush_context):
+    # Runs inside the flush's transaction while session.new/dirty and attribute history still
+    # describe what was just written, so one multi-row INSERT covers a whole bulk update
+    now = datetime.utcnow()
+    rows = []
+    actor = None
+    for incident in session.new:
+        if isinstance(incident, Incident):
+            rows.append(IncidentStatusChange.snapshot(incident, incident.reported_by, incident.created_at or now))
+    for incident in session.dirty:
+        if not isinstance(incident, Incident):
+            continue
+        state = db.inspect(incident)
+        if state.deleted or not any(getattr(state.attrs, field).history.has_changes() for field in TRACKED_FIELDS):
+            continue
+        actor = actor if actor is not None else _actor()
+        rows.append(IncidentStatusChange.snapshot(incident, actor, now))
+
+    connection = session.connection() if rows else None
+    for start in range(0, len(rows), _INSERT_CHUNK):
+        connection.execute(IncidentStatusChange.__table__.insert().values(rows[start:start + _INSERT_CHUNK]))
@@ -0,0 +1,35 @@
+from datetime import datetime
+from app import db
+
+class IdempotencyKey(db.Model):
+    """Stored outcome of a request sent with an Idempotency-Key header"""
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        # The claim: concurrent requests with the same key race on this constraint and one wins
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.LargeBinary(32), nullable=False)  # sha256 of method, path and body
+    status = db.Column(db.String(10), default='pending', nullable=False)  # pending, done
+    
+    # Replayed response
+    response_status = db.Column(db.SmallInteger)
+    response_body = db.Column(db.LargeBinary)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    @staticmethod
+    def purge_expired(now=None):
+        """Delete expired keys and return how many were removed"""
+        removed = IdempotencyKey.query.filter(
+            IdempotencyKey.expires_at <= (now or datetime.utcnow())
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return removed
+    
+    def __repr__(self):
+        return f'<IdempotencyKey {self.user_id}:{self.key} {self.status}>'
@@ -1,10 +1,48 @@
 from datetime import datetime
-from flask_sqlalchemy import SQLAlchemy
 from app import db
 
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+def _float(value):
+    return float(value) if value else None
+
+# Partial-index predicates for SLA tracking. Queries filter on the same text so the planner
+# (SQLite in particular) can match them to the index.
+SLA_PENDING = "status IN ('open', 'in_progress') AND sla_breached_at IS NULL"
+SLA_BREACHED = "status IN ('open', 'in_progress') AND sla_breached_at IS NOT NULL"
+
+class MicroDegrees(db.TypeDecorator):
+    """Coordinate stored as an integer count of microdegrees (about 11 cm), read back as a float"""
+    impl = db.Integer
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        return None if value is None else round(float(value) * 1000000)
+    
+    def process_result_value(self, value, dialect):
+        return None if value is None else float(value) / 1000000
+
 class Incident(db.Model):
     """Incident model for civic incident reporting"""
     __tablename__ = 'incidents'
+    __table_args__ = (
+        db.Index('ix_incidents_lat_lng', 'latitude', 'longitude'),
+        db.Index('ix_incidents_dedup', 'category', 'status', 'latitude'),
+        db.Index('ix_incidents_trending', 'trending_score', 'id'),
+        db.Index('ix_incidents_urgency', 'urgency_score', 'id'),
+        db.Index('ix_incidents_updated', 'updated_at', 'id'),  # delta sync keyset
+        db.Index('ix_incidents_reporter_status', 'reported_by', 'status'),  # per-user incident counts
+        # SLA: only unbreached active incidents, so each breach check is a short range scan
+        db.Index('ix_incidents_sla_pending', 'due_at',
+                 postgresql_where=db.text(SLA_PENDING), sqlite_where=db.text(SLA_PENDING)),
+        db.Index('ix_incidents_sla_breached', 'priority',
+                 postgresql_where=db.text(SLA_BREACHED), sqlite_where=db.text(SLA_BREACHED)),
+        # Never reuse the id of an archived incident, so ids stay unique across both tables
+        {'sqlite_autoincrement': True}
+    )
+    
+    STATUSES = ('open', 'in_progress', 'resolved', 'closed')
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -13,9 +51,9 @@ class Incident(db.Model):
     status = db.Column(db.String(20), default='open', nullable=False)  # open, in_progress, resolved, closed
     priority = db.Column(db.String(20), default='medium', nullable=False)  # low, medium, high, critical
     
-    # Geolocation
-    latitude = db.Column(db.Numeric(10, 8), nullable=False)
-    longitude = db.Column(db.Numeric(11, 8), nullable=False)
+    # Geolocation: integer microdegrees in the database, so bounding-box filters compare integers
+    latitude = db.Column(MicroDegrees, nullable=False)
+    longitude = db.Column(MicroDegrees, nullable=False)
     address = db.Column(db.String(500))
     city = db.Column(db.String(100))
     state = db.Column(db.String(100))
@@ -32,15 +70,27 @@ class Incident(db.Model):
     assigned_to = db.Column(db.Integer, db.ForeignKey('users.id'))
     
     # Resolution fields
-    resolved_at = db.Column(db.DateTime)
+    resolved_at = db.Column(db.DateTime, index=True)
     resolution_notes = db.Column(db.Text)
     
+    # Duplicate detection: MinHash signature of title + description
+    text_signature = db.Column(db.LargeBinary)
+    
     # Voting
     upvotes = db.Column(db.Integer, default=0)
     downvotes = db.Column(db.Integer, default=0)
     
+    # Ranking: precomputed sort keys, refreshed on vote/update and decayed by `flask scores decay`
+    duplicate_reports = db.Column(db.Integer, default=0, nullable=False)
+    trending_score = db.Column(db.Float, default=0, nullable=False)
+    urgency_score = db.Column(db.Float, default=0, nullable=False)
+    
+    # SLA: response deadline from priority (app.utils.sla), and when it was found breached
+    due_at = db.Column(db.DateTime)
+    sla_breached_at = db.Column(db.DateTime)
+    
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def __init__(self, **kwargs):
@@ -50,37 +100,118 @@ class Incident(db.Model):
         if not self.contact_info:
             self.contact_info = {}
     
-    def to_dict(self):
-        """Convert incident to dictionary"""
-        return {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'category': self.category,
-            'status': self.status,
-            'priority': self.priority,
-            'latitude': float(self.latitude) if self.latitude else None,
-            'longitude': float(self.longitude) if self.longitude else None,
-            'address': self.address,
-            'city': self.city,
-            'state': self.state,
-            'zip_code': self.zip_code,
-            'images': self.images,
-            'contact_info': self.contact_info,
-            'estimated_cost': float(self.estimated_cost) if self.estimated_cost else None,
-            'estimated_timeframe': self.estimated_timeframe,
-            'reported_by': self.reported_by,
-            'assigned_to': self.assigned_to,
-            'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None,
-            'resolution_notes': self.resolution_notes,
-            'upvotes': self.upvotes,
-            'downvotes': self.downvotes,
-            'vote_count': self.get_vote_count(),
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
-            'reporter': self.reporter.to_dict() if self.reporter else None,
-            'assigned_admin': self.assigned_admin.to_dict() if self.assigned_admin else None
-        }
+    # Sparse fieldsets: every key to_dict can emit, in output order
+    FIELDS = (
+        'id', 'title', 'description', 'category', 'status', 'priority',
+        'latitude', 'longitude', 'address', 'city', 'state', 'zip_code',
+        'images', 'contact_info', 'estimated_cost', 'estimated_timeframe',
+        'reported_by', 'assigned_to', 'resolved_at', 'resolution_notes',
+        'upvotes', 'downvotes', 'vote_count', 'due_at', 'sla_breached_at', 'created_at', 'updated_at',
+        'reporter', 'assigned_admin'
+    )
+    
+    # Named presets accepted by listing endpoints via ?view=
+    VIEWS = {
+        'map': ('id', 'latitude', 'longitude', 'status', 'category'),
+        'compact': (
+            'id', 'title', 'category', 'status', 'priority', 'latitude',
+            'longitude', 'address', 'city', 'vote_count', 'created_at'
+        ),
+        'full': FIELDS
+    }
+    
+    # Columns an output key depends on (keys not listed map to the column of the same name)
+    FIELD_COLUMNS = {
+        'vote_count': ('upvotes', 'downvotes'),
+        'reporter': ('reported_by',),
+        'assigned_admin': ('assigned_to',)
+    }
+    
+    # Output keys backed by a relationship that must be loaded separately
+    FIELD_RELATIONSHIPS = ('reporter', 'assigned_admin')
+    
+    # Per-key serializers used by to_dict
+    _SERIALIZERS = {
+        'id': lambda i: i.id,
+        'title': lambda i: i.title,
+        'description': lambda i: i.description,
+        'category': lambda i: i.category,
+        'status': lambda i: i.status,
+        'priority': lambda i: i.priority,
+        'latitude': lambda i: i.latitude,
+        'longitude': lambda i: i.longitude,
+        'address': lambda i: i.address,
+        'city': lambda i: i.city,
+        'state': lambda i: i.state,
+        'zip_code': lambda i: i.zip_code,
+        'images': lambda i: i.images,
+        'contact_info': lambda i: i.contact_info,
+        'estimated_cost': lambda i: _float(i.estimated_cost),
+        'estimated_timeframe': lambda i: i.estimated_timeframe,
+        'reported_by': lambda i: i.reported_by,
+        'assigned_to': lambda i: i.assigned_to,
+        'resolved_at': lambda i: _isoformat(i.resolved_at),
+        'resolution_notes': lambda i: i.resolution_notes,
+        'upvotes': lambda i: i.upvotes,
+        'downvotes': lambda i: i.downvotes,
+        'vote_count': lambda i: i.get_vote_count(),
+        'due_at': lambda i: _isoformat(i.due_at),
+        'sla_breached_at': lambda i: _isoformat(i.sla_breached_at),
+        'created_at': lambda i: i.created_at.isoformat(),
+        'updated_at': lambda i: i.updated_at.isoformat(),
+        'reporter': lambda i: i.reporter.to_dict() if i.reporter else None,
+        'assigned_admin': lambda i: i.assigned_admin.to_dict() if i.assigned_admin else None
+    }
+    
+    def to_dict(self, fields=None):
+        """Convert incident to dictionary, optionally limited to a sparse fieldset"""
+        if fields is None:
+            fields = Incident.FIELDS
+        return {field: Incident._SERIALIZERS[field](self) for field in fields}
+    
+    @staticmethod
+    def resolve_fields(fields=None, view=None):
+        """Resolve a comma-separated fields selector and/or view preset into output keys"""
+        if fields:
+            selected = [field.strip() for field in fields.split(',') if field.strip()]
+            invalid = [field for field in selected if field not in Incident.FIELDS]
+            if invalid:
+                raise ValueError(f'Unknown fields: {", ".join(invalid)}')
+            if 'id' not in selected:
+                selected.insert(0, 'id')
+            return tuple(dict.fromkeys(selected))
+        
+        view = view or 'full'
+        if view not in Incident.VIEWS:
+            raise ValueError(f'View must be one of: {", ".join(Incident.VIEWS)}')
+        return Incident.VIEWS[view]
+    
+    @staticmethod
+    def load_options(fields):
+        """Query options that load only the columns and relationships needed for fields"""
+        from sqlalchemy.orm import load_only, selectinload
+        
+        columns = []
+        for field in fields:
+            for column in Incident.FIELD_COLUMNS.get(field, (field,)):
+                if column not in columns and column not in Incident.FIELD_RELATIONSHIPS:
+                    columns.append(column)
+        
+        options = [load_only(*[getattr(Incident, column) for column in columns])]
+        for relationship in Incident.FIELD_RELATIONSHIPS:
+            if relationship in fields:
+                options.append(selectinload(getattr(Incident, relationship)))
+        return options
+    
+    def refresh_signature(self):
+        """Recompute the duplicate-detection signature from title and description"""
+        from app.utils.dedup import text_signature
+        self.text_signature = text_signature(self.title, self.description)
+    
+    def refresh_scores(self, now=None):
+        """Recompute the trending and urgency sort keys"""
+        from app.utils.ranking import scores_for
+        self.trending_score, self.urgency_score = scores_for(self, now)
     
     def get_vote_count(self):
         """Get net vote count"""
@@ -94,21 +225,19 @@ class Incident(db.Model):
         self.assigned_to = admin_id
         db.session.commit()
     
-    def add_vote(self, vote_type):
-        """Add a vote to the incident"""
-        if vote_type == 'upvote':
-            self.upvotes += 1
-        elif vote_type == 'downvote':
-            self.downvotes += 1
-        else:
+    def add_vote(self, vote_type, user_id):
+        """Record a user's vote (one per user, voting again changes it; None retracts it)"""
+        from app.models.vote import IncidentVote
+        
+        if vote_type not in ('upvote', 'downvote', None):
             raise ValueError("Vote type must be 'upvote' or 'downvote'")
-        db.session.commit()
+        return IncidentVote.cast(self.id, user_id, vote_type, self.created_at)
     
     def get_location(self):
         """Get location information"""
         return {
-            'latitude': float(self.latitude) if self.latitude else None,
-            'longitude': float(self.longitude) if self.longitude else None,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
             'address': self.address,
             'city': self.city,
             'state': self.state,
@@ -116,25 +245,40 @@ class Incident(db.Model):
         }
     
     @staticmethod
-    def get_stats():
-        """Get incident statistics"""
-        from sqlalchemy import func
+    def stats_statements():
+        """Per status/category count queries for live and archived incidents"""
+        from sqlalchemy import func, select
+        from app.models.archive import ArchivedIncident
         
-        stats = db.session.query(
-            Incident.status,
-            Incident.category,
-            func.count(Incident.id).label('count')
-        ).group_by(Incident.status, Incident.category).all()
+        return [
+            select(model.status, model.category, func.count(model.id)).group_by(model.status, model.category)
+            for model in (Incident, ArchivedIncident)
+        ]
+    
+    @staticmethod
+    def combine_stats(results):
+        """Merge (status, category, count) rows from several stats queries"""
+        counts = {}
+        for rows in results:
+            for status, category, count in rows:
+                counts[(status, category)] = counts.get((status, category), 0) + count
         
         return [
             {
-                'status': stat.status,
-                'category': stat.category,
-                'count': stat.count
+                'status': status,
+                'category': category,
+                'count': count
             }
-            for stat in stats
+            for (status, category), count in counts.items()
         ]
     
+    @staticmethod
+    def get_stats():
+        """Get incident statistics across live and archived incidents"""
+        return Incident.combine_stats(
+            db.session.execute(statement).all() for statement in Incident.stats_statements()
+        )
+    
     @staticmethod
     def find_by_location(lat, lng, radius=10):
         """Find incidents near a location"""
@@ -149,5 +293,64 @@ class Incident(db.Model):
             Incident.longitude.between(lng_min, lng_max)
         ).all()
     
+    @staticmethod
+    def get_clusters(lat_min, lng_min, lat_max, lng_max, cell_size, filters=None, rows=None):
+        """Aggregate incidents in a bounding box into grid cells of cell_size degrees; with rows,
+        the latitude span is instead split into that many equal cells (for Web Mercator tiles,
+        whose edges do not fall on a global latitude grid)"""
+        from sqlalchemy import func, case, type_coerce, Integer
+        
+        # Cells are anchored to a global grid (or the tile's edges) so a cell is identical across
+        # tiles and requests and never straddles a tile edge; computed on the raw microdegree
+        # integers, floored explicitly because PostgreSQL rounds when casting a float to an
+        # integer where SQLite truncates
+        lat_cell_size = (lat_max - lat_min) / rows if rows else cell_size
+        lat_origin = lat_min if rows else -90
+        cell_degrees = cell_size * 1000000
+        cell_x = db.cast(func.floor((type_coerce(Incident.longitude, Integer) + 180000000) / cell_degrees), Integer).label('cell_x')
+        cell_y = db.cast(func.floor(
+            (type_coerce(Incident.latitude, Integer) - round(lat_origin * 1000000)) / (lat_cell_size * 1000000)
+        ), Integer).label('cell_y')
+        status_columns = [
+            func.sum(case((Incident.status == status, 1), else_=0)).label(status)
+            for status in Incident.STATUSES
+        ]
+        
+        query = db.session.query(
+            cell_x,
+            cell_y,
+            func.count(Incident.id).label('count'),
+            # Averaged as microdegrees, converted back to degrees on the way out
+            type_coerce(func.avg(type_coerce(Incident.latitude, Integer)), MicroDegrees).label('latitude'),
+            type_coerce(func.avg(type_coerce(Incident.longitude, Integer)), MicroDegrees).label('longitude'),
+            *status_columns
+        ).filter(
+            # A tile's northern edge belongs to the tile above
+            Incident.latitude >= lat_min,
+            Incident.latitude < lat_max if rows else Incident.latitude <= lat_max,
+            Incident.longitude.between(lng_min, lng_max)
+        )
+        
+        for field, value in (filters or {}).items():
+            query = query.filter(getattr(Incident, field) == value)
+        
+        cells = query.group_by(cell_x, cell_y).all()
+        
+        return [
+            {
+                'count': row.count,
+                'latitude': row.latitude,
+                'longitude': row.longitude,
+                'status_counts': {status: int(getattr(row, status) or 0) for status in Incident.STATUSES},
+                'bounds': {
+                    'south': lat_origin + row.cell_y * lat_cell_size,
+                    'west': row.cell_x * cell_size - 180,
+                    'north': lat_origin + (row.cell_y + 1) * lat_cell_size,
+                    'east': (row.cell_x + 1) * cell_size - 180
+                }
+            }
+            for row in cells
+        ]
+    
     def __repr__(self):
         return f'<Incident {self.title}>' 
\ No newline at end of file
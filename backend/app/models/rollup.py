@@ -0,0 +1,137 @@
+from datetime import datetime
+from sqlalchemy import event
+from app.models.incident import Incident
+from app import db
+
+class IncidentDailyRollup(db.Model):
+    """Daily incident aggregates per city, category, priority and status"""
+    __tablename__ = 'incident_daily_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'city', 'category', 'priority', 'status',
+                            name='uq_incident_daily_rollups_dims'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    city = db.Column(db.String(100), nullable=False, default='')  # '' when the incident has no city
+    category = db.Column(db.String(50), nullable=False)
+    priority = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+
+    # Incidents created on this day (bucketed by their current status)
+    created_count = db.Column(db.Integer, default=0, nullable=False)
+    # How many of those have been resolved, and the whole days each took to resolve, summed
+    resolved_count = db.Column(db.Integer, default=0, nullable=False)
+    resolution_days = db.Column(db.BigInteger, default=0, nullable=False)
+
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert rollup row to dictionary"""
+        return {
+            'day': self.day.isoformat(),
+            'city': self.city or None,
+            'category': self.category,
+            'priority': self.priority,
+            'status': self.status,
+            'created_count': self.created_count,
+            'resolved_count': self.resolved_count,
+            'resolution_days': self.resolution_days
+        }
+
+    @staticmethod
+    def totals_by(dimension, start_day=None, end_day=None, **filters):
+        """Sum created incidents per value of a dimension over an optional day range"""
+        from sqlalchemy import func
+
+        column = getattr(IncidentDailyRollup, dimension)
+        query = db.session.query(
+            column,
+            func.sum(IncidentDailyRollup.created_count).label('count')
+        )
+        if start_day:
+            query = query.filter(IncidentDailyRollup.day >= start_day)
+        if end_day:
+            query = query.filter(IncidentDailyRollup.day <= end_day)
+        if filters:
+            query = query.filter_by(**filters)
+
+        return {
+            value: int(count)
+            for value, count in query.group_by(column).all()
+            if count
+        }
+
+    @staticmethod
+    def resolution_totals(start_day=None, end_day=None, **filters):
+        """Resolved incidents and their total whole days to resolution, for incidents created
+        over an optional day range"""
+        from sqlalchemy import func
+
+        query = db.session.query(
+            func.coalesce(func.sum(IncidentDailyRollup.resolved_count), 0),
+            func.coalesce(func.sum(IncidentDailyRollup.resolution_days), 0)
+        )
+        if start_day:
+            query = query.filter(IncidentDailyRollup.day >= start_day)
+        if end_day:
+            query = query.filter(IncidentDailyRollup.day <= end_day)
+        if filters:
+            query = query.filter_by(**filters)
+
+        resolved, seconds = query.one()
+        return int(resolved), int(seconds)
+
+    def __repr__(self):
+        return f'<IncidentDailyRollup {self.day} {self.category}/{self.status}>'
+
+class RollupDirtyDay(db.Model):
+    """Days whose rollups are stale and must be recomputed by the next refresh"""
+    __tablename__ = 'rollup_dirty_days'
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<RollupDirtyDay {self.day}>'
+
+# Incident attributes that move an incident between rollup buckets
+ROLLUP_ATTRIBUTES = ('city', 'category', 'priority', 'status', 'created_at', 'resolved_at')
+
+def _mark_dirty(connection, days):
+    days = {day for day in days if day}
+    if days:
+        connection.execute(
+            RollupDirtyDay.__table__.insert(),
+            [{'day': day, 'created_at': datetime.utcnow()} for day in days]
+        )
+
+@event.listens_for(Incident, 'after_insert')
+def _incident_inserted(mapper, connection, target):
+    _mark_dirty(connection, [
+        target.created_at.date() if target.created_at else datetime.utcnow().date(),
+        target.resolved_at.date() if target.resolved_at else None
+    ])
+
+@event.listens_for(Incident, 'after_update')
+def _incident_updated(mapper, connection, target):
+    state = db.inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in ROLLUP_ATTRIBUTES):
+        return
+
+    days = [target.created_at.date() if target.created_at else None]
+    for name in ('created_at', 'resolved_at'):
+        history = state.attrs[name].history
+        days.extend(value.date() for value in history.deleted if value)
+        days.extend(value.date() for value in history.added if value)
+    if target.resolved_at:
+        days.append(target.resolved_at.date())
+    _mark_dirty(connection, days)
+
+@event.listens_for(Incident, 'after_delete')
+def _incident_deleted(mapper, connection, target):
+    _mark_dirty(connection, [
+        target.created_at.date() if target.created_at else None,
+        target.resolved_at.date() if target.resolved_at else None
+    ])
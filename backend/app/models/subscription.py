@@ -0,0 +1,53 @@
+from datetime import datetime
+from app import db
+
+class AreaSubscription(db.Model):
+    """A user's request to hear about incidents inside a circle or polygon, optionally by category"""
+    __tablename__ = 'area_subscriptions'
+    __table_args__ = (
+        db.Index('ix_area_subscriptions_updated', 'updated_at', 'id'),
+    )
+    
+    SHAPES = ('circle', 'polygon')
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    name = db.Column(db.String(100))
+    shape = db.Column(db.String(10), nullable=False)  # circle, polygon
+    
+    # Circle
+    center_latitude = db.Column(db.Float)
+    center_longitude = db.Column(db.Float)
+    radius_meters = db.Column(db.Float)
+    
+    # Polygon: [[latitude, longitude], ...]
+    polygon = db.Column(db.JSON)
+    
+    categories = db.Column(db.JSON)  # list of categories, null for all
+    
+    # Soft-deleted so other processes' indexes see the removal when they poll for changes
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def to_dict(self):
+        """Convert subscription to dictionary"""
+        data = {
+            'id': self.id,
+            'name': self.name,
+            'shape': self.shape,
+            'categories': self.categories,
+            'created_at': self.created_at.isoformat()
+        }
+        if self.shape == 'circle':
+            data.update({
+                'latitude': self.center_latitude,
+                'longitude': self.center_longitude,
+                'radius_meters': self.radius_meters
+            })
+        else:
+            data['polygon'] = self.polygon
+        return data
+    
+    def __repr__(self):
+        return f'<AreaSubscription {self.id} {self.shape} user={self.user_id}>'
@@ -0,0 +1,50 @@
+from datetime import datetime
+from sqlalchemy import event
+from app.models.incident import Incident
+from app import db
+
+class IncidentTombstone(db.Model):
+    """Record of an incident leaving the live table, read by the delta sync feed"""
+    __tablename__ = 'incident_tombstones'
+    __table_args__ = (
+        db.Index('ix_incident_tombstones_removed_id', 'removed_at', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    incident_id = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(10), nullable=False)  # deleted, archived
+    removed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def to_dict(self):
+        """Convert tombstone to dictionary"""
+        return {
+            'id': self.incident_id,
+            'reason': self.reason,
+            'removed_at': self.removed_at.isoformat()
+        }
+    
+    @staticmethod
+    def record(connection, incident_ids, reason):
+        """Insert tombstones for incidents removed through `connection`"""
+        now = datetime.utcnow()
+        if incident_ids:
+            connection.execute(IncidentTombstone.__table__.insert(), [
+                {'incident_id': incident_id, 'reason': reason, 'removed_at': now}
+                for incident_id in incident_ids
+            ])
+    
+    @staticmethod
+    def purge_before(cutoff):
+        """Delete tombstones older than cutoff and return how many were removed"""
+        removed = IncidentTombstone.query.filter(
+            IncidentTombstone.removed_at < cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return removed
+    
+    def __repr__(self):
+        return f'<IncidentTombstone {self.incident_id} {self.reason}>'
+
+@event.listens_for(Incident, 'after_delete')
+def _incident_deleted(mapper, connection, target):
+    IncidentTombstone.record(connection, [target.id], 'deleted')
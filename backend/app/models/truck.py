@@ -0,0 +1,85 @@
+from datetime import datetime
+from app.models.incident import MicroDegrees
+from app import db
+
+class Truck(db.Model):
+    """A response vehicle; its live position is held in the fleet index and saved with each trail flush"""
+    __tablename__ = 'trucks'
+    __table_args__ = (
+        db.Index('ix_trucks_updated', 'updated_at', 'id'),
+    )
+    
+    STATUSES = ('available', 'dispatched', 'maintenance', 'offline')
+    
+    id = db.Column(db.Integer, primary_key=True)
+    license_plate = db.Column(db.String(20), unique=True, nullable=False)
+    driver_name = db.Column(db.String(100))
+    driver_phone = db.Column(db.String(20))
+    model = db.Column(db.String(100))
+    capacity_tons = db.Column(db.Float)
+    status = db.Column(db.String(20), default='available', nullable=False)  # available, dispatched, maintenance, offline
+    incident_id = db.Column(db.Integer, db.ForeignKey('incidents.id', ondelete='SET NULL'))
+    
+    # Last known position, as of the last trail flush
+    latitude = db.Column(MicroDegrees)
+    longitude = db.Column(MicroDegrees)
+    speed_kph = db.Column(db.Float)
+    heading = db.Column(db.Float)
+    located_at = db.Column(db.DateTime)
+    
+    # Soft-deleted so other processes' indexes see the removal when they poll for changes
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def to_dict(self, position=None):
+        """Convert truck to dictionary; position is a fresher (lat, lng, recorded_at) from the fleet index"""
+        latitude, longitude, located_at = position or (self.latitude, self.longitude, self.located_at)
+        return {
+            'id': self.id,
+            'license_plate': self.license_plate,
+            'driver_name': self.driver_name,
+            'driver_phone': self.driver_phone,
+            'model': self.model,
+            'capacity_tons': self.capacity_tons,
+            'status': self.status,
+            'incident_id': self.incident_id,
+            'location': {
+                'latitude': latitude,
+                'longitude': longitude,
+                'recorded_at': located_at.isoformat()
+            } if located_at else None,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+    
+    def __repr__(self):
+        return f'<Truck {self.license_plate}>'
+
+class TruckPosition(db.Model):
+    """One position ping in a truck's trail; written in batches by the fleet module"""
+    __tablename__ = 'truck_positions'
+    __table_args__ = (
+        db.Index('ix_truck_positions_trail', 'truck_id', 'recorded_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    truck_id = db.Column(db.Integer, db.ForeignKey('trucks.id', ondelete='CASCADE'), nullable=False)
+    latitude = db.Column(MicroDegrees, nullable=False)
+    longitude = db.Column(MicroDegrees, nullable=False)
+    speed_kph = db.Column(db.Float)
+    heading = db.Column(db.Float)
+    recorded_at = db.Column(db.DateTime, nullable=False)
+    
+    def to_dict(self):
+        """Convert trail point to dictionary"""
+        return {
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'speed_kph': self.speed_kph,
+            'heading': self.heading,
+            'recorded_at': self.recorded_at.isoformat()
+        }
+    
+    def __repr__(self):
+        return f'<TruckPosition {self.truck_id} {self.recorded_at}>'
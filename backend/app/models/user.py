@@ -1,21 +1,38 @@
 from datetime import datetime
-from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
+from sqlalchemy import DDL, event
+from sqlalchemy.orm import validates
 from app import db, bcrypt
 
+def normalize_email(email):
+    """Case- and whitespace-insensitive form of an email address, used for uniqueness and lookups"""
+    return (email or '').strip().lower()
+
 class User(db.Model):
     """User model for authentication and role management"""
     __tablename__ = 'users'
+    # Named as PostgreSQL names them by default, so registration can tell which one an insert violated
+    __table_args__ = (
+        db.UniqueConstraint('username', name='users_username_key'),
+        db.UniqueConstraint('email', name='users_email_key'),
+        db.UniqueConstraint('email_normalized', name='users_email_normalized_key'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(50), unique=True, nullable=False)
-    email = db.Column(db.String(100), unique=True, nullable=False)
+    username = db.Column(db.String(50), nullable=False)
+    email = db.Column(db.String(100), nullable=False)
+    # Kept in sync by the validator below; unique so registration needs no pre-check query
+    email_normalized = db.Column(db.String(100))
     password_hash = db.Column(db.String(255), nullable=False)
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=False)
     role = db.Column(db.String(20), default='user', nullable=False)  # user, admin
     is_active = db.Column(db.Boolean, default=True, nullable=False)
     last_login = db.Column(db.DateTime)
+    
+    # Auto-dispatch (admins): open/in-progress incidents assigned to them and optional home area
+    open_assignments = db.Column(db.Integer, default=0, nullable=False)
+    home_latitude = db.Column(db.Float)
+    home_longitude = db.Column(db.Float)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -26,9 +43,15 @@ class User(db.Model):
                                        foreign_keys='Incident.assigned_to')
     
     def __init__(self, **kwargs):
+        password = kwargs.pop('password', None)
         super(User, self).__init__(**kwargs)
-        if kwargs.get('password'):
-            self.set_password(kwargs['password'])
+        if password:
+            self.set_password(password)
+    
+    @validates('email')
+    def _normalize_email(self, key, email):
+        self.email_normalized = normalize_email(email)
+        return email
     
     def set_password(self, password):
         """Hash and set password"""
@@ -64,8 +87,16 @@ class User(db.Model):
     
     @staticmethod
     def find_by_email(email):
-        """Find user by email"""
-        return User.query.filter_by(email=email).first()
+        """Find user by email, ignoring case (index lookup on email_normalized)"""
+        normalized = normalize_email(email)
+        user = User.query.filter_by(email_normalized=normalized).first()
+        if user is None:
+            # Accounts created before email_normalized existed, until `flask users normalize-emails` runs
+            user = User.query.filter(
+                User.email_normalized.is_(None),
+                db.func.lower(db.func.trim(User.email)) == normalized
+            ).first()
+        return user
     
     @staticmethod
     def find_by_username(username):
@@ -73,4 +104,27 @@ class User(db.Model):
         return User.query.filter_by(username=username).first()
     
     def __repr__(self):
-        return f'<User {self.username}>' 
\ No newline at end of file
+        return f'<User {self.username}>' 
+
+# Admin user search (app/utils/user_search.py) matches lower-cased names and the normalized email:
+# trigram indexes serve substring matches on PostgreSQL, expression indexes serve prefix ranges on SQLite
+SEARCH_COLUMNS = (
+    ('username', db.func.lower(User.username)),
+    ('email', User.email_normalized),
+    ('first_name', db.func.lower(User.first_name)),
+    ('last_name', db.func.lower(User.last_name))
+)
+SEARCH_INDEXES = {
+    'postgresql': [
+        db.Index(f'ix_users_{name}_trgm', expression.label(f'{name}_search'), postgresql_using='gin',
+                 postgresql_ops={f'{name}_search': 'gin_trgm_ops'}).ddl_if(dialect='postgresql')
+        for name, expression in SEARCH_COLUMNS
+    ],
+    'sqlite': [
+        db.Index(f'ix_users_{name}_prefix', expression).ddl_if(dialect='sqlite')
+        for name, expression in SEARCH_COLUMNS if name != 'email'  # email_normalized already has its unique index
+    ]
+}
+
+event.listen(User.__table__, 'before_create',
+             DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
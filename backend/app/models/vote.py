@@ -0,0 +1,157 @@
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from app.utils.ranking import score_params, score_sql
+from app import db
+
+VOTE_VALUES = {'upvote': 1, 'downvote': -1}
+VOTE_TYPES = {value: vote_type for vote_type, value in VOTE_VALUES.items()}
+
+# PostgreSQL: upsert the ledger row and adjust the denormalized counters in one statement.
+# ON CONFLICT checks against the latest committed row (waiting for a concurrent first vote to
+# commit), locks it, and only rewrites it when the value differs. Votes are +1 or -1, so a returned
+# row was either inserted (no previous vote) or flipped (previous was -value), and no returned row
+# means the same vote again; that is enough to compute the counter deltas without reading the
+# previous value first. (xmax is 0 only for a tuple this statement inserted.)
+_PG_UPSERT_VOTE = text("""
+    WITH vote AS (
+        INSERT INTO incident_votes (incident_id, user_id, value, created_at, updated_at)
+        VALUES (:incident_id, :user_id, :value, :now, :now)
+        ON CONFLICT (incident_id, user_id) DO UPDATE
+            SET value = EXCLUDED.value, updated_at = EXCLUDED.updated_at
+            WHERE incident_votes.value <> EXCLUDED.value
+        RETURNING value, xmax = 0 AS inserted
+    )
+    UPDATE incidents SET
+        upvotes = COALESCE(upvotes, 0) + COALESCE(
+            (SELECT (value = 1)::int - (NOT inserted AND value = -1)::int FROM vote), 0),
+        downvotes = COALESCE(downvotes, 0) + COALESCE(
+            (SELECT (value = -1)::int - (NOT inserted AND value = 1)::int FROM vote), 0),
+        {scores},
+        updated_at = :now
+    WHERE id = :incident_id
+    RETURNING upvotes, downvotes
+""".format(scores=score_sql(
+    '(COALESCE(upvotes, 0) - COALESCE(downvotes, 0)'
+    ' + COALESCE((SELECT CASE WHEN inserted THEN value ELSE 2 * value END FROM vote), 0))'
+)))
+
+_PG_RETRACT_VOTE = text("""
+    WITH removed AS (
+        DELETE FROM incident_votes
+        WHERE incident_id = :incident_id AND user_id = :user_id
+        RETURNING value
+    )
+    UPDATE incidents SET
+        upvotes = COALESCE(upvotes, 0) - COALESCE((SELECT (value = 1)::int FROM removed), 0),
+        downvotes = COALESCE(downvotes, 0) - COALESCE((SELECT (value = -1)::int FROM removed), 0),
+        {scores},
+        updated_at = :now
+    WHERE id = :incident_id
+    RETURNING upvotes, downvotes
+""".format(scores=score_sql(
+    '(COALESCE(upvotes, 0) - COALESCE(downvotes, 0) - COALESCE((SELECT value FROM removed), 0))'
+)))
+
+# Other databases: the counter change of _cast_generic
+_UPDATE_COUNTERS = text("""
+    UPDATE incidents SET
+        upvotes = COALESCE(upvotes, 0) + :up,
+        downvotes = COALESCE(downvotes, 0) + :down,
+        {scores},
+        updated_at = :now
+    WHERE id = :incident_id
+""".format(scores=score_sql('(COALESCE(upvotes, 0) + :up - COALESCE(downvotes, 0) - :down)')))
+
+class IncidentVote(db.Model):
+    """One user's vote on one incident"""
+    __tablename__ = 'incident_votes'
+
+    incident_id = db.Column(db.Integer, db.ForeignKey('incidents.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True, index=True)
+    value = db.Column(db.SmallInteger, nullable=False)  # 1 upvote, -1 downvote
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    incident = db.relationship('Incident', backref=db.backref(
+        'votes', lazy='dynamic', cascade='all, delete-orphan'
+    ))
+
+    @staticmethod
+    def cast(incident_id, user_id, vote_type, created_at):
+        """Record, change or retract (vote_type None) a user's vote, rescoring the incident
+        (created at created_at) in the same statement; returns (upvotes, downvotes)"""
+        value = VOTE_VALUES[vote_type] if vote_type else None
+        now = datetime.utcnow()
+        params = dict(score_params(created_at or now, now),
+                      incident_id=incident_id, user_id=user_id, value=value, now=now)
+
+        if db.session.get_bind().dialect.name == 'postgresql':
+            return IncidentVote._cast_postgresql(params)
+
+        try:
+            return IncidentVote._cast_generic(params)
+        except IntegrityError:
+            # Another request inserted this user's first vote meanwhile; it is a change now
+            db.session.rollback()
+            return IncidentVote._cast_generic(params)
+
+    @staticmethod
+    def _cast_postgresql(params):
+        statement = _PG_RETRACT_VOTE if params['value'] is None else _PG_UPSERT_VOTE
+        counts = db.session.execute(statement, params).one()
+        db.session.commit()
+        return tuple(counts)
+
+    @staticmethod
+    def _cast_generic(params):
+        """Fallback for databases without data-modifying CTEs: ledger and counters in one transaction"""
+        from app.models.incident import Incident
+
+        vote = db.session.get(IncidentVote, (params['incident_id'], params['user_id']), with_for_update=True)
+        previous = vote.value if vote else None
+        value = params['value']
+
+        if value is None and vote:
+            db.session.delete(vote)
+        elif value is not None and vote:
+            vote.value = value
+        elif value is not None:
+            db.session.add(IncidentVote(
+                incident_id=params['incident_id'], user_id=params['user_id'], value=value
+            ))
+
+        up_delta = (value == 1) - (previous == 1)
+        down_delta = (value == -1) - (previous == -1)
+        if up_delta or down_delta:
+            db.session.execute(_UPDATE_COUNTERS, dict(params, up=up_delta, down=down_delta))
+
+        db.session.commit()
+        return db.session.query(Incident.upvotes, Incident.downvotes).filter(
+            Incident.id == params['incident_id']
+        ).one()
+
+    @staticmethod
+    def votes_for_user(user_id, incident_ids):
+        """Map incident id -> 'upvote'/'downvote' for a user's votes on the given incidents"""
+        if not incident_ids:
+            return {}
+        rows = db.session.query(IncidentVote.incident_id, IncidentVote.value).filter(
+            IncidentVote.user_id == user_id,
+            IncidentVote.incident_id.in_(incident_ids)
+        ).all()
+        return {incident_id: VOTE_TYPES[value] for incident_id, value in rows}
+
+    def __repr__(self):
+        return f'<IncidentVote {self.incident_id}/{self.user_id} {self.value}>'
+
+class DuplicateReport(db.Model):
+    """A user's near-duplicate report of an incident; counted into duplicate_reports once per user"""
+    __tablename__ = 'incident_duplicate_reports'
+
+    incident_id = db.Column(db.Integer, db.ForeignKey('incidents.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DuplicateReport {self.incident_id}/{self.user_id}>'
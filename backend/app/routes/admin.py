@@ -1,14 +1,23 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import get_jwt_identity
 from app.models.user import User
 from app.models.incident import Incident
+from app.models.rollup import IncidentDailyRollup
+from app.models.job import Job
+from app.models.history import IncidentStatusChange
 from app.utils.auth import admin_required
+from app.utils.jobs import retry_job
+from app.utils.notifications import notify_incident_changes
+from app.utils.replicas import use_replica
+from app.utils.dispatch import pick_admin, invalidate_dispatch_index
+from app.utils.sla import sla_summary
+from app.utils.request_log import record_exception
 from app import db
-from sqlalchemy import func
 
 admin_bp = Blueprint('admin', __name__)
 
 @admin_bp.route('/dashboard', methods=['GET'])
+@use_replica()
 @admin_required()
 def admin_dashboard():
     """Get admin dashboard statistics"""
@@ -18,23 +27,19 @@ def admin_dashboard():
         active_users = User.query.filter_by(is_active=True).count()
         admin_users = User.query.filter_by(role='admin').count()
         
-        # Incident statistics
-        total_incidents = Incident.query.count()
-        open_incidents = Incident.query.filter_by(status='open').count()
-        in_progress_incidents = Incident.query.filter_by(status='in_progress').count()
-        resolved_incidents = Incident.query.filter_by(status='resolved').count()
+        # Incident statistics (from daily rollups, refreshed by `flask rollups refresh`)
+        status_totals = IncidentDailyRollup.totals_by('status')
+        total_incidents = sum(status_totals.values())
+        open_incidents = status_totals.get('open', 0)
+        in_progress_incidents = status_totals.get('in_progress', 0)
+        resolved_incidents = status_totals.get('resolved', 0)
         
-        # Category statistics
-        category_stats = db.session.query(
-            Incident.category,
-            func.count(Incident.id).label('count')
-        ).group_by(Incident.category).all()
+        # Category and priority statistics
+        category_stats = IncidentDailyRollup.totals_by('category')
+        priority_stats = IncidentDailyRollup.totals_by('priority')
         
-        # Priority statistics
-        priority_stats = db.session.query(
-            Incident.priority,
-            func.count(Incident.id).label('count')
-        ).group_by(Incident.priority).all()
+        # SLA breaches and upcoming deadlines (partial-index counts, no table scan)
+        sla_stats = sla_summary()
         
         # Recent incidents
         recent_incidents = Incident.query.order_by(
@@ -54,19 +59,21 @@ def admin_dashboard():
                 'resolved': resolved_incidents
             },
             'category_stats': [
-                {'category': stat.category, 'count': stat.count}
-                for stat in category_stats
+                {'category': category, 'count': count}
+                for category, count in category_stats.items()
             ],
             'priority_stats': [
-                {'priority': stat.priority, 'count': stat.count}
-                for stat in priority_stats
+                {'priority': priority, 'count': count}
+                for priority, count in priority_stats.items()
             ],
+            'sla_stats': sla_stats,
             'recent_incidents': [
                 incident.to_dict() for incident in recent_incidents
             ]
         }), 200
         
     except Exception as e:
+        record_exception(e)
         return jsonify({
             'error': 'Dashboard retrieval failed',
             'message': 'Unable to get dashboard data'
@@ -95,6 +102,7 @@ def toggle_user_status(user_id):
         
         user.is_active = not user.is_active
         db.session.commit()
+        invalidate_dispatch_index()
         
         return jsonify({
             'message': f'User {"activated" if user.is_active else "deactivated"} successfully',
@@ -102,12 +110,96 @@ def toggle_user_status(user_id):
         }), 200
         
     except Exception as e:
+        record_exception(e)
         db.session.rollback()
         return jsonify({
             'error': 'Status update failed',
             'message': 'Unable to update user status'
         }), 500
 
+@admin_bp.route('/users/<int:user_id>/home-area', methods=['PUT'])
+@admin_required()
+def set_home_area(user_id):
+    """Set (or clear with nulls) the home area an admin is auto-dispatched incidents around"""
+    try:
+        user = User.query.get(user_id)
+        
+        if not user or not user.is_admin():
+            return jsonify({
+                'error': 'Invalid admin',
+                'message': 'Specified user is not an admin'
+            }), 404
+        
+        data = request.get_json() or {}
+        latitude = data.get('latitude')
+        longitude = data.get('longitude')
+        
+        if (latitude is None) != (longitude is None):
+            return jsonify({
+                'error': 'Invalid home area',
+                'message': 'Latitude and longitude must be given together'
+            }), 400
+        if latitude is not None:
+            try:
+                latitude, longitude = float(latitude), float(longitude)
+            except (TypeError, ValueError):
+                latitude = None
+            if latitude is None or not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                return jsonify({
+                    'error': 'Invalid home area',
+                    'message': 'Latitude must be within -90..90 and longitude within -180..180'
+                }), 400
+        
+        user.home_latitude = latitude
+        user.home_longitude = longitude
+        db.session.commit()
+        invalidate_dispatch_index()
+        
+        return jsonify({
+            'message': 'Home area updated successfully',
+            'home_area': {'latitude': latitude, 'longitude': longitude} if latitude is not None else None
+        }), 200
+        
+    except Exception as e:
+        record_exception(e)
+        db.session.rollback()
+        return jsonify({
+            'error': 'Home area update failed',
+            'message': 'Unable to update home area'
+        }), 500
+
+@admin_bp.route('/workload', methods=['GET'])
+@use_replica()
+@admin_required()
+def admin_workload():
+    """Open incidents assigned to each active admin, least loaded first"""
+    try:
+        admins = User.query.filter_by(role='admin', is_active=True).order_by(
+            User.open_assignments, User.id
+        ).all()
+        
+        return jsonify({
+            'admins': [
+                {
+                    'id': admin.id,
+                    'username': admin.username,
+                    'open_assignments': admin.open_assignments,
+                    'home_area': {
+                        'latitude': admin.home_latitude,
+                        'longitude': admin.home_longitude
+                    } if admin.home_latitude is not None else None
+                }
+                for admin in admins
+            ]
+        }), 200
+        
+    except Exception as e:
+        record_exception(e)
+        return jsonify({
+            'error': 'Workload retrieval failed',
+            'message': 'Unable to get admin workload'
+        }), 500
+
 @admin_bp.route('/incidents/bulk-update', methods=['PUT'])
 @admin_required()
 def bulk_update_incidents():
@@ -133,13 +225,29 @@ def bulk_update_incidents():
                 }), 400
         
         # Update incidents
+        current_user_id = get_jwt_identity()
         updated_count = 0
-        for incident_id in incident_ids:
-            incident = Incident.query.get(incident_id)
-            if incident:
-                for field, value in updates.items():
-                    setattr(incident, field, value)
-                updated_count += 1
+        # Load them in one query, so the history rows are written in one flush at commit
+        incidents = Incident.query.filter(Incident.id.in_(incident_ids)).order_by(Incident.id).all()
+        for incident in incidents:
+            previous_status = incident.status
+            previous_assignee = incident.assigned_to
+            for field, value in updates.items():
+                if field == 'assigned_to' and value == 'auto':
+                    value = pick_admin(incident.latitude, incident.longitude)
+                    if value is None:
+                        db.session.rollback()
+                        return jsonify({
+                            'error': 'No admin available',
+                            'message': 'There are no active admins to assign'
+                        }), 409
+                setattr(incident, field, value)
+            incident.refresh_scores()
+            if updates.get('assigned_to') == 'auto':
+                # Flush so workload counters see this assignment before the next pick
+                db.session.flush()
+            notify_incident_changes(incident, previous_status, previous_assignee, current_user_id)
+            updated_count += 1
         
         db.session.commit()
         
@@ -149,6 +257,7 @@ def bulk_update_incidents():
         }), 200
         
     except Exception as e:
+        record_exception(e)
         db.session.rollback()
         return jsonify({
             'error': 'Bulk update failed',
@@ -156,6 +265,7 @@ def bulk_update_incidents():
         }), 500
 
 @admin_bp.route('/reports/incident-summary', methods=['GET'])
+@use_replica()
 @admin_required()
 def incident_summary_report():
     """Generate incident summary report (admin only)"""
@@ -167,41 +277,27 @@ def incident_summary_report():
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        # Get incidents in date range
-        incidents = Incident.query.filter(
-            Incident.created_at.between(start_date, end_date)
-        ).all()
+        # Read the window from daily rollups so the cost is independent of `days`; the window
+        # is the last `days` calendar days, today included
+        end_day = end_date.date()
+        start_day = end_day - timedelta(days=max(days, 1) - 1)
+        start_date = datetime.combine(start_day, datetime.min.time())
+        category_breakdown = IncidentDailyRollup.totals_by('category', start_day, end_day)
+        priority_breakdown = IncidentDailyRollup.totals_by('priority', start_day, end_day)
         
         # Calculate statistics
-        total_incidents = len(incidents)
-        resolved_incidents = len([i for i in incidents if i.status == 'resolved'])
-        avg_resolution_time = None
-        
-        if resolved_incidents > 0:
-            resolution_times = []
-            for incident in incidents:
-                if incident.status == 'resolved' and incident.resolved_at:
-                    resolution_time = (incident.resolved_at - incident.created_at).days
-                    resolution_times.append(resolution_time)
-            
-            if resolution_times:
-                avg_resolution_time = sum(resolution_times) / len(resolution_times)
-        
-        # Category breakdown
-        category_breakdown = {}
-        for incident in incidents:
-            category = incident.category
-            if category not in category_breakdown:
-                category_breakdown[category] = 0
-            category_breakdown[category] += 1
+        total_incidents = sum(category_breakdown.values())
+        resolved_incidents = IncidentDailyRollup.totals_by(
+            'status', start_day, end_day, status='resolved'
+        ).get('resolved', 0)
         
-        # Priority breakdown
-        priority_breakdown = {}
-        for incident in incidents:
-            priority = incident.priority
-            if priority not in priority_breakdown:
-                priority_breakdown[priority] = 0
-            priority_breakdown[priority] += 1
+        # Whole days to resolution, averaged over the window's resolved incidents
+        avg_resolution_time = None
+        resolved_count, resolution_days = IncidentDailyRollup.resolution_totals(
+            start_day, end_day, status='resolved'
+        )
+        if resolved_count > 0:
+            avg_resolution_time = resolution_days / resolved_count
         
         return jsonify({
             'period': {
@@ -220,7 +316,149 @@ def incident_summary_report():
         }), 200
         
     except Exception as e:
+        record_exception(e)
         return jsonify({
             'error': 'Report generation failed',
             'message': 'Unable to generate report'
-        }), 500 
\ No newline at end of file
+        }), 500
+
+@admin_bp.route('/reports/time-in-state', methods=['GET'])
+@use_replica()
+@admin_required()
+def time_in_state_report():
+    """Hours incidents spent in each status, from the status history (admin only)"""
+    try:
+        from datetime import datetime, timedelta
+        
+        days = request.args.get('days', 30, type=int)
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=days)
+        
+        return jsonify({
+            'period': {
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat(),
+                'days': days
+            },
+            'statuses': IncidentStatusChange.time_in_state(start_date, end_date)
+        }), 200
+        
+    except Exception as e:
+        record_exception(e)
+        return jsonify({
+            'error': 'Report generation failed',
+            'message': 'Unable to generate report'
+        }), 500
+
+@admin_bp.route('/incidents/<int:incident_id>/history', methods=['GET'])
+@admin_required()
+def incident_history(incident_id):
+    """Status, priority and assignee changes of one incident, oldest first (admin only)"""
+    try:
+        return jsonify({
+            'incident_id': incident_id,
+            'history': [change.to_dict() for change in IncidentStatusChange.timeline(incident_id)]
+        }), 200
+        
+    except Exception as e:
+        record_exception(e)
+        return jsonify({
+            'error': 'History retrieval failed',
+            'message': 'Unable to get incident history'
+        }), 500
+
+@admin_bp.route('/analytics/hotspots', methods=['GET'])
+@use_replica()
+@admin_required()
+def hotspot_analytics():
+    """Hotspot density grid, category trends and resolution times (admin only)"""
+    try:
+        from app.utils.analytics import hotspot_report
+        
+        days = request.args.get('days', 30, type=int)
+        cell_size = request.args.get('cell_size', 0.01, type=float)
+        top = request.args.get('top', 20, type=int)
+        
+        if days < 1 or not 0 < cell_size <= 180 or top < 1:
+            return jsonify({
+                'error': 'Invalid parameters',
+                'message': 'days, cell_size and top must be positive, cell_size at most 180'
+            }), 400
+        
+        return jsonify(hotspot_report(days, cell_size, top)), 200
+        
+    except Exception as e:
+        record_exception(e)
+        return jsonify({
+            'error': 'Analytics generation failed',
+            'message': 'Unable to generate hotspot analytics'
+        }), 500
+
+@admin_bp.route('/jobs', methods=['GET'])
+@admin_required()
+def list_jobs():
+    """List background jobs, dead-lettered ones by default (admin only)"""
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('limit', 20, type=int)
+        status = request.args.get('status', 'dead')
+        
+        if status not in Job.STATUSES:
+            return jsonify({
+                'error': 'Invalid status',
+                'message': f'Status must be one of: {", ".join(Job.STATUSES)}'
+            }), 400
+        
+        pagination = Job.query.filter_by(status=status).order_by(Job.id.desc()).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+        
+        return jsonify({
+            'jobs': [job.to_dict() for job in pagination.items],
+            'pagination': {
+                'current_page': page,
+                'total_pages': pagination.pages,
+                'total_items': pagination.total,
+                'items_per_page': per_page
+            }
+        }), 200
+        
+    except Exception as e:
+        record_exception(e)
+        return jsonify({
+            'error': 'Job retrieval failed',
+            'message': 'Unable to get jobs'
+        }), 500
+
+@admin_bp.route('/jobs/<int:job_id>/retry', methods=['POST'])
+@admin_required()
+def retry_dead_job(job_id):
+    """Requeue a dead-lettered job (admin only)"""
+    try:
+        job = Job.query.get(job_id)
+        if not job:
+            return jsonify({
+                'error': 'Job not found',
+                'message': 'Job does not exist'
+            }), 404
+        
+        if job.status != 'dead':
+            return jsonify({
+                'error': 'Invalid job',
+                'message': 'Only dead jobs can be retried'
+            }), 400
+        
+        retry_job(job)
+        
+        return jsonify({
+            'message': 'Job requeued successfully',
+            'job': job.to_dict()
+        }), 200
+        
+    except Exception as e:
+        record_exception(e)
+        db.session.rollback()
+        return jsonify({
+            'error': 'Job retry failed',
+            'message': 'Unable to retry job'
+        }), 500
@@ -1,7 +1,12 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from sqlalchemy.exc import IntegrityError
 from app.models.user import User
-from app.utils.auth import admin_required, validate_user_data, get_current_user
+from app.utils.auth import admin_required, validate_user_data, get_current_user, unique_violation
+from app.utils.replicas import use_replica
+from app.utils.user_search import search_users, incident_counts, decode_cursor, CursorError
+from app.utils.dispatch import invalidate_dispatch_index
+from app.utils.request_log import record_exception
 from app import db
 
 auth_bp = Blueprint('auth', __name__)
@@ -21,22 +26,7 @@ def register():
                 'details': errors
             }), 400
         
-        # Check if user already exists
-        existing_user = User.find_by_email(data['email'])
-        if existing_user:
-            return jsonify({
-                'error': 'User already exists',
-                'message': 'Email is already registered'
-            }), 400
-        
-        existing_username = User.find_by_username(data['username'])
-        if existing_username:
-            return jsonify({
-                'error': 'Username taken',
-                'message': 'Username is already taken'
-            }), 400
-        
-        # Create new user
+        # Create new user; the unique indexes on username and normalized email reject duplicates
         user = User(
             username=data['username'],
             email=data['email'],
@@ -47,7 +37,19 @@ def register():
         )
         
         db.session.add(user)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            if unique_violation(e) == 'username':
+                return jsonify({
+                    'error': 'Username taken',
+                    'message': 'Username is already taken'
+                }), 400
+            return jsonify({
+                'error': 'User already exists',
+                'message': 'Email is already registered'
+            }), 400
         
         # Generate JWT token
         access_token = create_access_token(identity=user.id)
@@ -59,6 +61,7 @@ def register():
         }), 201
         
     except Exception as e:
+        record_exception(e)
         db.session.rollback()
         return jsonify({
             'error': 'Registration failed',
@@ -115,6 +118,7 @@ def login():
         }), 200
         
     except Exception as e:
+        record_exception(e)
         return jsonify({
             'error': 'Login failed',
             'message': 'Unable to log in'
@@ -139,6 +143,7 @@ def get_profile():
         }), 200
         
     except Exception as e:
+        record_exception(e)
         return jsonify({
             'error': 'Profile retrieval failed',
             'message': 'Unable to get user profile'
@@ -169,7 +174,7 @@ def update_profile():
             # Check if email is being changed and if it's already taken
             if data['email'] != user.email:
                 existing_user = User.find_by_email(data['email'])
-                if existing_user:
+                if existing_user and existing_user.id != user.id:
                     return jsonify({
                         'error': 'Email already exists',
                         'message': 'This email is already registered'
@@ -184,6 +189,7 @@ def update_profile():
         }), 200
         
     except Exception as e:
+        record_exception(e)
         db.session.rollback()
         return jsonify({
             'error': 'Profile update failed',
@@ -228,6 +234,7 @@ def change_password():
         }), 200
         
     except Exception as e:
+        record_exception(e)
         db.session.rollback()
         return jsonify({
             'error': 'Password change failed',
@@ -235,39 +242,67 @@ def change_password():
         }), 500
 
 @auth_bp.route('/users', methods=['GET'])
+@use_replica()
 @admin_required()
 def get_all_users():
-    """Get all users (admin only)"""
+    """List users with offset pagination, or search them (`q`) with cursor pagination (admin only)"""
     try:
-        page = request.args.get('page', 1, type=int)
         per_page = request.args.get('limit', 20, type=int)
         role = request.args.get('role')
         is_active = request.args.get('is_active')
-        
-        query = User.query
-        
-        if role:
-            query = query.filter_by(role=role)
-        if is_active is not None:
-            query = query.filter_by(is_active=is_active == 'true')
-        
-        pagination = query.paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-        
-        users = [user.to_dict() for user in pagination.items]
-        
-        return jsonify({
-            'users': users,
-            'pagination': {
+        is_active = is_active == 'true' if is_active is not None else None
+        with_counts = request.args.get('include_counts') == 'true'
+        
+        if 'q' not in request.args and 'cursor' not in request.args:
+            page = request.args.get('page', 1, type=int)
+            query = User.query
+            
+            if role:
+                query = query.filter_by(role=role)
+            if is_active is not None:
+                query = query.filter_by(is_active=is_active)
+            
+            pagination = query.order_by(User.id).paginate(
+                page=page, per_page=per_page, error_out=False
+            )
+            users = pagination.items
+            page_info = {
                 'current_page': page,
                 'total_pages': pagination.pages,
                 'total_items': pagination.total,
                 'items_per_page': per_page
             }
+        else:
+            per_page = max(1, min(per_page, 100))
+            users, next_cursor = search_users(
+                search=request.args.get('q'),
+                role=role,
+                is_active=is_active,
+                after_id=decode_cursor(request.args.get('cursor')),
+                limit=per_page
+            )
+            page_info = {'next_cursor': next_cursor, 'items_per_page': per_page}
+        
+        counts = incident_counts([user.id for user in users]) if with_counts else {}
+        results = []
+        for user in users:
+            user_data = user.to_dict()
+            if with_counts:
+                user_data['incident_counts'] = counts[user.id]
+            results.append(user_data)
+        
+        return jsonify({
+            'users': results,
+            'pagination': page_info
         }), 200
         
+    except CursorError as e:
+        return jsonify({
+            'error': 'Invalid cursor',
+            'message': str(e)
+        }), 400
     except Exception as e:
+        record_exception(e)
         return jsonify({
             'error': 'User retrieval failed',
             'message': 'Unable to get users'
@@ -296,6 +331,7 @@ def update_user_role(user_id):
         
         user.role = new_role
         db.session.commit()
+        invalidate_dispatch_index()
         
         return jsonify({
             'message': 'User role updated successfully',
@@ -303,6 +339,7 @@ def update_user_role(user_id):
         }), 200
         
     except Exception as e:
+        record_exception(e)
         db.session.rollback()
         return jsonify({
             'error': 'Role update failed',
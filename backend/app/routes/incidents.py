@@ -1,92 +1,175 @@
-from flask import Blueprint, request, jsonify
+import math
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import or_
+from sqlalchemy import or_, select
 from app.models.incident import Incident
+from app.models.archive import ArchivedIncident
 from app.models.user import User
+from app.models.vote import IncidentVote
 from app.utils.auth import admin_required, optional_auth, validate_incident_data, get_current_user
+from app.utils.notifications import notify_incident_changes
+from app.utils.dedup import find_duplicates, text_signature
+from app.utils.ranking import record_duplicate_report
+from app.utils.replicas import use_replica
+from app.utils.idempotency import idempotent
+from app.utils.dispatch import pick_admin
+from app.utils.sync import changes_since, WatermarkError, WatermarkExpired
+from app.utils.geofence import queue_area_alerts
+from app.utils.geocoder import fill_location
+from app.utils.request_log import record_exception
 from app import db
 from datetime import datetime
 
 incidents_bp = Blueprint('incidents', __name__)
 
+SORT_ORDERS = {
+    'newest': (Incident.created_at.desc(),),
+    'trending': (Incident.trending_score.desc(), Incident.id.desc()),
+    'urgent': (Incident.urgency_score.desc(), Incident.id.desc())
+}
+
+def listing_statement(args):
+    """SELECT for an incident listing request plus its fields and page; raises ValueError(error, message)"""
+    page = max(args.get('page', 1, type=int), 1)
+    per_page = args.get('limit', 20, type=int)
+    if per_page < 1:
+        per_page = 20
+    status = args.get('status')
+    category = args.get('category')
+    priority = args.get('priority')
+    search = args.get('search')
+    lat = args.get('lat', type=float)
+    lng = args.get('lng', type=float)
+    radius = args.get('radius', 10, type=float)
+    
+    # Sparse fieldsets: ?fields=id,title or ?view=compact|map|full
+    try:
+        fields = Incident.resolve_fields(args.get('fields'), args.get('view'))
+    except ValueError as e:
+        raise ValueError('Invalid fields', str(e))
+    
+    statement = select(Incident).options(*Incident.load_options(fields))
+    
+    # Apply filters
+    if status:
+        statement = statement.filter_by(status=status)
+    if category:
+        statement = statement.filter_by(category=category)
+    if priority:
+        statement = statement.filter_by(priority=priority)
+    
+    # Search functionality
+    if search:
+        search_filter = or_(
+            Incident.title.ilike(f'%{search}%'),
+            Incident.description.ilike(f'%{search}%'),
+            Incident.address.ilike(f'%{search}%')
+        )
+        statement = statement.filter(search_filter)
+    
+    # Location-based filtering
+    if lat and lng:
+        lat_min = lat - radius/111
+        lat_max = lat + radius/111
+        lng_min = lng - radius/111
+        lng_max = lng + radius/111
+        
+        statement = statement.filter(
+            Incident.latitude.between(lat_min, lat_max),
+            Incident.longitude.between(lng_min, lng_max)
+        )
+    
+    # Ordering: newest first by default, or by a precomputed (indexed) score
+    sort = args.get('sort', 'newest')
+    if sort not in SORT_ORDERS:
+        raise ValueError('Invalid sort', f'Sort must be one of: {", ".join(SORT_ORDERS)}')
+    statement = statement.order_by(*SORT_ORDERS[sort])
+    
+    return statement, fields, page, per_page
+
+def listing_response(items, fields, page, per_page, total):
+    """JSON body for a page of incidents"""
+    return jsonify({
+        'incidents': [incident.to_dict(fields) for incident in items],
+        'pagination': {
+            'current_page': page,
+            'total_pages': math.ceil(total / per_page),
+            'total_items': total,
+            'items_per_page': per_page
+        }
+    })
+
 @incidents_bp.route('/', methods=['GET'])
+@use_replica()
 @optional_auth()
 def get_all_incidents():
     """Get all incidents with optional filtering"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('limit', 20, type=int)
-        status = request.args.get('status')
-        category = request.args.get('category')
-        priority = request.args.get('priority')
-        search = request.args.get('search')
-        lat = request.args.get('lat', type=float)
-        lng = request.args.get('lng', type=float)
-        radius = request.args.get('radius', 10, type=float)
-        
-        query = Incident.query
-        
-        # Apply filters
-        if status:
-            query = query.filter_by(status=status)
-        if category:
-            query = query.filter_by(category=category)
-        if priority:
-            query = query.filter_by(priority=priority)
-        
-        # Search functionality
-        if search:
-            search_filter = or_(
-                Incident.title.ilike(f'%{search}%'),
-                Incident.description.ilike(f'%{search}%'),
-                Incident.address.ilike(f'%{search}%')
-            )
-            query = query.filter(search_filter)
-        
-        # Location-based filtering
-        if lat and lng:
-            lat_min = lat - radius/111
-            lat_max = lat + radius/111
-            lng_min = lng - radius/111
-            lng_max = lng + radius/111
-            
-            query = query.filter(
-                Incident.latitude.between(lat_min, lat_max),
-                Incident.longitude.between(lng_min, lng_max)
-            )
-        
-        # Order by creation date (newest first)
-        query = query.order_by(Incident.created_at.desc())
+        try:
+            statement, fields, page, per_page = listing_statement(request.args)
+        except ValueError as e:
+            error, message = e.args
+            return jsonify({
+                'error': error,
+                'message': message
+            }), 400
         
         # Pagination
-        pagination = query.paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        pagination = db.paginate(statement, page=page, per_page=per_page, error_out=False)
         
-        incidents = [incident.to_dict() for incident in pagination.items]
-        
-        return jsonify({
-            'incidents': incidents,
-            'pagination': {
-                'current_page': page,
-                'total_pages': pagination.pages,
-                'total_items': pagination.total,
-                'items_per_page': per_page
-            }
-        }), 200
+        return listing_response(pagination.items, fields, page, per_page, pagination.total), 200
         
     except Exception as e:
+        record_exception(e)
         return jsonify({
             'error': 'Incident retrieval failed',
             'message': 'Unable to get incidents'
         }), 500
 
+@incidents_bp.route('/sync', methods=['GET'])
+@optional_auth()
+def sync_incidents():
+    """Incidents changed or removed since a watermark, for offline-capable clients"""
+    # Served from the primary: a lagging replica could let the watermark skip rows
+    try:
+        limit = min(max(request.args.get('limit', 500, type=int), 1), current_app.config['SYNC_MAX_BATCH'])
+        try:
+            fields = Incident.resolve_fields(request.args.get('fields'), request.args.get('view'))
+        except ValueError as e:
+            return jsonify({
+                'error': 'Invalid fields',
+                'message': str(e)
+            }), 400
+        
+        try:
+            payload = changes_since(request.args.get('since'), fields, limit)
+        except WatermarkExpired as e:
+            return jsonify({
+                'error': 'Watermark expired',
+                'message': str(e)
+            }), 410
+        except WatermarkError as e:
+            return jsonify({
+                'error': 'Invalid watermark',
+                'message': str(e)
+            }), 400
+        
+        return jsonify(payload), 200
+        
+    except Exception as e:
+        record_exception(e)
+        return jsonify({
+            'error': 'Sync failed',
+            'message': 'Unable to get incident changes'
+        }), 500
+
 @incidents_bp.route('/<int:incident_id>', methods=['GET'])
+@use_replica()
 @optional_auth()
 def get_incident(incident_id):
-    """Get incident by ID"""
+    """Get incident by ID (archived incidents included)"""
     try:
-        incident = Incident.query.get(incident_id)
+        incident = ArchivedIncident.find(incident_id)
         
         if not incident:
             return jsonify({
@@ -99,6 +182,7 @@ def get_incident(incident_id):
         }), 200
         
     except Exception as e:
+        record_exception(e)
         return jsonify({
             'error': 'Incident retrieval failed',
             'message': 'Unable to get incident'
@@ -106,6 +190,7 @@ def get_incident(incident_id):
 
 @incidents_bp.route('/', methods=['POST'])
 @jwt_required()
+@idempotent()
 def create_incident():
     """Create new incident"""
     try:
@@ -129,6 +214,23 @@ def create_incident():
                 'details': errors
             }), 400
         
+        # Suggest voting on an existing report instead of filing a near-duplicate; clients that
+        # send "check_duplicates": true get a 409 to confirm against before anything is created
+        signature = text_signature(data['title'], data['description'])
+        duplicates = []
+        if not data.get('confirm_new'):
+            duplicates = find_duplicates(
+                data['category'], float(data['latitude']), float(data['longitude']), signature
+            )
+            if duplicates and data.get('check_duplicates'):
+                record_duplicate_report(duplicates[0]['id'], current_user_id)
+                return jsonify({
+                    'error': 'Possible duplicate',
+                    'message': 'Similar incidents were already reported nearby. Vote on an '
+                               'existing incident or resubmit with "confirm_new": true',
+                    'duplicates': duplicates
+                }), 409
+        
         # Create incident
         incident = Incident(
             title=data['title'],
@@ -145,21 +247,40 @@ def create_incident():
             contact_info=data.get('contact_info', {}),
             estimated_cost=data.get('estimated_cost'),
             estimated_timeframe=data.get('estimated_timeframe'),
-            reported_by=current_user_id
+            reported_by=current_user_id,
+            text_signature=signature
         )
+        incident.refresh_scores()
+        
+        # Fill address fields the client left out from the offline gazetteer
+        fill_location(incident)
+        
+        # Route to the least-loaded admin covering this area
+        if current_app.config['DISPATCH_AUTO_ASSIGN']:
+            incident.assigned_to = pick_admin(incident.latitude, incident.longitude)
         
         db.session.add(incident)
+        db.session.flush()
+        notify_incident_changes(incident, incident.status, None, current_user_id)
+        queue_area_alerts(incident, 'area_reported')
         db.session.commit()
         
+        if duplicates:
+            record_duplicate_report(duplicates[0]['id'], current_user_id)
+        
         # Get incident with reporter info
         incident_with_reporter = Incident.query.get(incident.id)
         
-        return jsonify({
+        response = {
             'message': 'Incident reported successfully',
             'incident': incident_with_reporter.to_dict()
-        }), 201
+        }
+        if duplicates:
+            response['possible_duplicates'] = duplicates
+        return jsonify(response), 201
         
     except Exception as e:
+        record_exception(e)
         db.session.rollback()
         return jsonify({
             'error': 'Incident creation failed',
@@ -181,18 +302,22 @@ def update_incident(incident_id):
         
         data = request.get_json()
         current_user_id = get_jwt_identity()
+        previous_status = incident.status
+        previous_assignee = incident.assigned_to
         
         # Update fields
         if 'title' in data:
             incident.title = data['title']
         if 'description' in data:
             incident.description = data['description']
+        if 'title' in data or 'description' in data:
+            incident.refresh_signature()
         if 'status' in data:
-            incident.status = data['status']
             # Handle status change to resolved
             if data['status'] == 'resolved' and incident.status != 'resolved':
                 incident.resolved_at = datetime.utcnow()
                 incident.assigned_to = current_user_id
+            incident.status = data['status']
         if 'priority' in data:
             incident.priority = data['priority']
         if 'assigned_to' in data:
@@ -200,6 +325,13 @@ def update_incident(incident_id):
         if 'resolution_notes' in data:
             incident.resolution_notes = data['resolution_notes']
         
+        incident.refresh_scores()
+        
+        # Notifications are queued in this transaction and sent by the job worker
+        notify_incident_changes(incident, previous_status, previous_assignee, current_user_id)
+        if incident.status != previous_status:
+            queue_area_alerts(incident, 'area_updated')
+        
         db.session.commit()
         
         # Get updated incident with associations
@@ -211,6 +343,7 @@ def update_incident(incident_id):
         }), 200
         
     except Exception as e:
+        record_exception(e)
         db.session.rollback()
         return jsonify({
             'error': 'Incident update failed',
@@ -238,6 +371,7 @@ def delete_incident(incident_id):
         }), 200
         
     except Exception as e:
+        record_exception(e)
         db.session.rollback()
         return jsonify({
             'error': 'Incident deletion failed',
@@ -245,6 +379,7 @@ def delete_incident(incident_id):
         }), 500
 
 @incidents_bp.route('/user/incidents', methods=['GET'])
+@use_replica()
 @jwt_required()
 def get_user_incidents():
     """Get current user's reported incidents"""
@@ -254,7 +389,17 @@ def get_user_incidents():
         per_page = request.args.get('limit', 20, type=int)
         status = request.args.get('status')
         
-        query = Incident.query.filter_by(reported_by=current_user_id)
+        try:
+            fields = Incident.resolve_fields(request.args.get('fields'), request.args.get('view'))
+        except ValueError as e:
+            return jsonify({
+                'error': 'Invalid fields',
+                'message': str(e)
+            }), 400
+        
+        query = Incident.query.options(*Incident.load_options(fields)).filter_by(
+            reported_by=current_user_id
+        )
         
         if status:
             query = query.filter_by(status=status)
@@ -265,7 +410,7 @@ def get_user_incidents():
             page=page, per_page=per_page, error_out=False
         )
         
-        incidents = [incident.to_dict() for incident in pagination.items]
+        incidents = [incident.to_dict(fields) for incident in pagination.items]
         
         return jsonify({
             'incidents': incidents,
@@ -278,15 +423,17 @@ def get_user_incidents():
         }), 200
         
     except Exception as e:
+        record_exception(e)
         return jsonify({
             'error': 'Incident retrieval failed',
             'message': 'Unable to get user incidents'
         }), 500
 
-@incidents_bp.route('/<int:incident_id>/vote', methods=['POST'])
+@incidents_bp.route('/<int:incident_id>/vote', methods=['POST', 'DELETE'])
 @jwt_required()
+@idempotent()
 def vote_incident(incident_id):
-    """Vote on incident"""
+    """Vote on incident (one vote per user; POST again to change, DELETE to retract)"""
     try:
         incident = Incident.query.get(incident_id)
         
@@ -296,60 +443,203 @@ def vote_incident(incident_id):
                 'message': 'Incident does not exist'
             }), 404
         
-        data = request.get_json()
-        vote_type = data.get('vote_type')
-        
-        if not vote_type or vote_type not in ['upvote', 'downvote']:
-            return jsonify({
-                'error': 'Invalid vote type',
-                'message': 'Vote type must be "upvote" or "downvote"'
-            }), 400
+        vote_type = None
+        if request.method == 'POST':
+            data = request.get_json()
+            vote_type = data.get('vote_type')
+            
+            if not vote_type or vote_type not in ['upvote', 'downvote']:
+                return jsonify({
+                    'error': 'Invalid vote type',
+                    'message': 'Vote type must be "upvote" or "downvote"'
+                }), 400
         
-        incident.add_vote(vote_type)
+        upvotes, downvotes = incident.add_vote(vote_type, get_jwt_identity())
         
         return jsonify({
-            'message': 'Vote recorded successfully',
+            'message': 'Vote recorded successfully' if vote_type else 'Vote retracted successfully',
             'incident': {
-                'id': incident.id,
-                'upvotes': incident.upvotes,
-                'downvotes': incident.downvotes,
-                'vote_count': incident.get_vote_count()
+                'id': incident_id,
+                'upvotes': upvotes,
+                'downvotes': downvotes,
+                'vote_count': upvotes - downvotes,
+                'my_vote': vote_type
             }
         }), 200
         
     except Exception as e:
+        record_exception(e)
+        db.session.rollback()
         return jsonify({
             'error': 'Vote recording failed',
             'message': 'Unable to record vote'
         }), 500
 
+@incidents_bp.route('/votes/mine', methods=['GET'])
+@jwt_required()
+def get_my_votes():
+    """Get the current user's votes for a page of incidents (?ids=1,2,3)"""
+    try:
+        try:
+            incident_ids = [int(value) for value in request.args.get('ids', '').split(',') if value]
+        except ValueError:
+            return jsonify({
+                'error': 'Invalid ids',
+                'message': 'ids must be a comma-separated list of incident IDs'
+            }), 400
+        
+        if len(incident_ids) > 200:
+            return jsonify({
+                'error': 'Too many ids',
+                'message': 'At most 200 incident IDs can be requested at once'
+            }), 400
+        
+        votes = IncidentVote.votes_for_user(get_jwt_identity(), incident_ids)
+        
+        return jsonify({
+            'votes': {str(incident_id): vote_type for incident_id, vote_type in votes.items()}
+        }), 200
+        
+    except Exception as e:
+        record_exception(e)
+        return jsonify({
+            'error': 'Vote retrieval failed',
+            'message': 'Unable to get votes'
+        }), 500
+
+def stats_response(stats):
+    """JSON body for incident statistics, summarizing the grouped counts per status"""
+    status_totals = {}
+    for stat in stats:
+        status_totals[stat['status']] = status_totals.get(stat['status'], 0) + stat['count']
+    
+    return jsonify({
+        'stats': stats,
+        'summary': {
+            'total': sum(status_totals.values()),
+            'open': status_totals.get('open', 0),
+            'resolved': status_totals.get('resolved', 0),
+            'in_progress': status_totals.get('in_progress', 0)
+        }
+    })
+
 @incidents_bp.route('/stats', methods=['GET'])
+@use_replica()
 @optional_auth()
 def get_incident_stats():
     """Get incident statistics"""
     try:
-        stats = Incident.get_stats()
+        return stats_response(Incident.get_stats()), 200
         
-        # Calculate additional statistics
-        total_incidents = Incident.query.count()
-        open_incidents = Incident.query.filter_by(status='open').count()
-        resolved_incidents = Incident.query.filter_by(status='resolved').count()
-        in_progress_incidents = Incident.query.filter_by(status='in_progress').count()
+    except Exception as e:
+        record_exception(e)
+        return jsonify({
+            'error': 'Statistics retrieval failed',
+            'message': 'Unable to get incident statistics'
+        }), 500
+
+def _map_payload(lat_min, lng_min, lat_max, lng_max, zoom, tile=False):
+    """Clusters (or raw points at high zoom) for a bounding box or a tile, as a cacheable response"""
+    filters = {
+        field: request.args.get(field)
+        for field in ('status', 'category', 'priority')
+        if request.args.get(field)
+    }
+    
+    cell_size = 360 / (2 ** zoom) / current_app.config['MAP_CLUSTER_GRID']
+    payload = {
+        'zoom': zoom,
+        'bbox': [lng_min, lat_min, lng_max, lat_max],
+        'cell_size': cell_size
+    }
+    
+    if zoom >= current_app.config['MAP_POINT_ZOOM']:
+        fields = Incident.VIEWS['map']
+        query = Incident.query.options(*Incident.load_options(fields)).filter(
+            Incident.latitude.between(lat_min, lat_max),
+            Incident.longitude.between(lng_min, lng_max)
+        ).filter_by(**filters)
+        limit = current_app.config['MAP_MAX_POINTS']
+        incidents = query.order_by(Incident.id).limit(limit + 1).all()
+        payload['mode'] = 'points'
+        payload['points'] = [incident.to_dict(fields) for incident in incidents[:limit]]
+        payload['truncated'] = len(incidents) > limit
+    else:
+        # Tiles split their Mercator latitude span into grid rows, so no cell crosses a tile edge
+        rows = current_app.config['MAP_CLUSTER_GRID'] if tile else None
+        payload['mode'] = 'clusters'
+        payload['clusters'] = Incident.get_clusters(
+            lat_min, lng_min, lat_max, lng_max, cell_size, filters, rows
+        )
+    
+    response = jsonify(payload)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['MAP_TILE_CACHE_SECONDS']
+    response.add_etag()
+    return response.make_conditional(request)
+
+@incidents_bp.route('/map', methods=['GET'])
+@use_replica()
+def get_incident_map():
+    """Get clustered incidents for a bounding box (bbox=west,south,east,north) and zoom"""
+    try:
+        bbox = request.args.get('bbox', '')
+        zoom = request.args.get('zoom', type=int)
+        
+        try:
+            lng_min, lat_min, lng_max, lat_max = [float(value) for value in bbox.split(',')]
+        except ValueError:
+            return jsonify({
+                'error': 'Invalid bounding box',
+                'message': 'bbox must be "west,south,east,north"'
+            }), 400
+        
+        if zoom is None or zoom < 0 or zoom > 22:
+            return jsonify({
+                'error': 'Invalid zoom',
+                'message': 'Zoom must be an integer between 0 and 22'
+            }), 400
+        
+        # Snap the box outwards to the cluster grid so identical cells come back for nearby views
+        cell_size = 360 / (2 ** zoom) / current_app.config['MAP_CLUSTER_GRID']
+        lat_min = math.floor((lat_min + 90) / cell_size) * cell_size - 90
+        lng_min = math.floor((lng_min + 180) / cell_size) * cell_size - 180
+        lat_max = math.ceil((lat_max + 90) / cell_size) * cell_size - 90
+        lng_max = math.ceil((lng_max + 180) / cell_size) * cell_size - 180
         
+        return _map_payload(lat_min, lng_min, lat_max, lng_max, zoom)
+        
+    except Exception as e:
+        record_exception(e)
         return jsonify({
-            'stats': stats,
-            'summary': {
-                'total': total_incidents,
-                'open': open_incidents,
-                'resolved': resolved_incidents,
-                'in_progress': in_progress_incidents
-            }
-        }), 200
+            'error': 'Map retrieval failed',
+            'message': 'Unable to get map data'
+        }), 500
+
+@incidents_bp.route('/map/tiles/<int:zoom>/<int:x>/<int:y>', methods=['GET'])
+@use_replica()
+def get_incident_map_tile(zoom, x, y):
+    """Get clustered incidents for a z/x/y web map tile"""
+    try:
+        tiles = 2 ** zoom
+        if zoom > 22 or x >= tiles or y >= tiles:
+            return jsonify({
+                'error': 'Invalid tile',
+                'message': 'Tile coordinates are out of range'
+            }), 400
+        
+        lng_min = x / tiles * 360 - 180
+        lng_max = (x + 1) / tiles * 360 - 180
+        lat_max = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / tiles))))
+        lat_min = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / tiles))))
+        
+        return _map_payload(lat_min, lng_min, lat_max, lng_max, zoom, tile=True)
         
     except Exception as e:
+        record_exception(e)
         return jsonify({
-            'error': 'Statistics retrieval failed',
-            'message': 'Unable to get incident statistics'
+            'error': 'Map retrieval failed',
+            'message': 'Unable to get map tile'
         }), 500
 
 @incidents_bp.route('/<int:incident_id>/assign', methods=['POST'])
@@ -374,6 +664,15 @@ def assign_incident(incident_id):
                 'message': 'Admin ID is required'
             }), 400
         
+        # "auto" picks the least-loaded admin for the incident's location
+        if admin_id == 'auto':
+            admin_id = pick_admin(incident.latitude, incident.longitude)
+            if admin_id is None:
+                return jsonify({
+                    'error': 'No admin available',
+                    'message': 'There are no active admins to assign'
+                }), 409
+        
         # Verify admin exists
         admin = User.query.get(admin_id)
         if not admin or not admin.is_admin():
@@ -382,7 +681,9 @@ def assign_incident(incident_id):
                 'message': 'Specified user is not an admin'
             }), 400
         
+        previous_assignee = incident.assigned_to
         incident.assigned_to = admin_id
+        notify_incident_changes(incident, incident.status, previous_assignee, get_jwt_identity())
         db.session.commit()
         
         return jsonify({
@@ -394,6 +695,7 @@ def assign_incident(incident_id):
         }), 200
         
     except Exception as e:
+        record_exception(e)
         db.session.rollback()
         return jsonify({
             'error': 'Assignment failed',
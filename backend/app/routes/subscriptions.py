@@ -0,0 +1,113 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.models.subscription import AreaSubscription
+from app.utils.auth import validate_subscription_data
+from app.utils.geofence import subscription_index
+from app.utils.request_log import record_exception
+from app import db
+
+subscriptions_bp = Blueprint('subscriptions', __name__)
+
+@subscriptions_bp.route('/', methods=['GET'])
+@jwt_required()
+def get_subscriptions():
+    """List the current user's area subscriptions"""
+    try:
+        subscriptions = AreaSubscription.query.filter_by(
+            user_id=get_jwt_identity(), is_active=True
+        ).order_by(AreaSubscription.id).all()
+        
+        return jsonify({
+            'subscriptions': [subscription.to_dict() for subscription in subscriptions]
+        }), 200
+        
+    except Exception as e:
+        record_exception(e)
+        return jsonify({
+            'error': 'Subscription retrieval failed',
+            'message': 'Unable to get subscriptions'
+        }), 500
+
+@subscriptions_bp.route('/', methods=['POST'])
+@jwt_required()
+def create_subscription():
+    """Subscribe to new incidents inside a circle or polygon"""
+    try:
+        data = request.get_json() or {}
+        current_user_id = get_jwt_identity()
+        
+        errors = validate_subscription_data(data, current_app.config)
+        if errors:
+            return jsonify({
+                'error': 'Validation failed',
+                'message': 'Please check your input',
+                'details': errors
+            }), 400
+        
+        existing = AreaSubscription.query.filter_by(user_id=current_user_id, is_active=True).count()
+        if existing >= current_app.config['SUBSCRIPTIONS_PER_USER']:
+            return jsonify({
+                'error': 'Too many subscriptions',
+                'message': f'You can have at most {current_app.config["SUBSCRIPTIONS_PER_USER"]} area subscriptions'
+            }), 400
+        
+        subscription = AreaSubscription(
+            user_id=current_user_id,
+            name=data.get('name'),
+            shape=data['shape'],
+            categories=data.get('categories') or None
+        )
+        if subscription.shape == 'circle':
+            subscription.center_latitude = float(data['latitude'])
+            subscription.center_longitude = float(data['longitude'])
+            subscription.radius_meters = float(data['radius_meters'])
+        else:
+            subscription.polygon = [[float(latitude), float(longitude)] for latitude, longitude in data['polygon']]
+        
+        db.session.add(subscription)
+        db.session.commit()
+        subscription_index().apply([subscription])
+        
+        return jsonify({
+            'message': 'Subscription created successfully',
+            'subscription': subscription.to_dict()
+        }), 201
+        
+    except Exception as e:
+        record_exception(e)
+        db.session.rollback()
+        return jsonify({
+            'error': 'Subscription creation failed',
+            'message': 'Unable to create subscription'
+        }), 500
+
+@subscriptions_bp.route('/<int:subscription_id>', methods=['DELETE'])
+@jwt_required()
+def delete_subscription(subscription_id):
+    """Remove one of the current user's area subscriptions"""
+    try:
+        subscription = AreaSubscription.query.filter_by(
+            id=subscription_id, user_id=get_jwt_identity(), is_active=True
+        ).first()
+        
+        if not subscription:
+            return jsonify({
+                'error': 'Subscription not found',
+                'message': 'Subscription does not exist'
+            }), 404
+        
+        subscription.is_active = False
+        db.session.commit()
+        subscription_index().apply([subscription])
+        
+        return jsonify({
+            'message': 'Subscription deleted successfully'
+        }), 200
+        
+    except Exception as e:
+        record_exception(e)
+        db.session.rollback()
+        return jsonify({
+            'error': 'Subscription deletion failed',
+            'message': 'Unable to delete subscription'
+        }), 500
@@ -0,0 +1,284 @@
+from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy.exc import IntegrityError
+from app.models.incident import Incident
+from app.models.truck import Truck, TruckPosition
+from app.utils.auth import admin_required, validate_truck_data, parse_ping
+from app.utils.fleet import fleet_index, record_pings, flush_trail, nearest_trucks
+from app.utils.request_log import record_exception
+from app import db
+
+trucks_bp = Blueprint('trucks', __name__)
+
+TRUCK_FIELDS = ('license_plate', 'driver_name', 'driver_phone', 'model', 'capacity_tons', 'status', 'incident_id')
+
+@trucks_bp.route('/', methods=['GET'])
+@admin_required()
+def get_trucks():
+    """List trucks with their live positions (admin only)"""
+    try:
+        query = Truck.query.filter_by(is_active=True)
+        status = request.args.get('status')
+        if status:
+            query = query.filter_by(status=status)
+        
+        index = fleet_index()
+        return jsonify({
+            'trucks': [truck.to_dict(index.position(truck.id)) for truck in query.order_by(Truck.id).all()]
+        }), 200
+    
+    except Exception as e:
+        record_exception(e)
+        return jsonify({
+            'error': 'Truck retrieval failed',
+            'message': 'Unable to get trucks'
+        }), 500
+
+@trucks_bp.route('/', methods=['POST'])
+@admin_required()
+def create_truck():
+    """Register a truck (admin only)"""
+    try:
+        data = request.get_json() or {}
+        
+        errors = validate_truck_data(data)
+        if errors:
+            return jsonify({
+                'error': 'Validation failed',
+                'message': 'Please check your input',
+                'details': errors
+            }), 400
+        
+        truck = Truck(**{field: data[field] for field in TRUCK_FIELDS if field in data})
+        truck.license_plate = truck.license_plate.strip()
+        db.session.add(truck)
+        db.session.commit()
+        fleet_index().apply([truck])
+        
+        return jsonify({
+            'message': 'Truck created successfully',
+            'truck': truck.to_dict()
+        }), 201
+    
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({
+            'error': 'Truck already exists',
+            'message': 'A truck with this license plate is already registered'
+        }), 400
+    except Exception as e:
+        record_exception(e)
+        db.session.rollback()
+        return jsonify({
+            'error': 'Truck creation failed',
+            'message': 'Unable to create truck'
+        }), 500
+
+@trucks_bp.route('/<int:truck_id>', methods=['PUT'])
+@admin_required()
+def update_truck(truck_id):
+    """Update a truck's details, status or assignment (admin only)"""
+    try:
+        truck = Truck.query.filter_by(id=truck_id, is_active=True).first()
+        if not truck:
+            return jsonify({
+                'error': 'Truck not found',
+                'message': 'Truck does not exist'
+            }), 404
+        
+        data = request.get_json() or {}
+        errors = validate_truck_data(data, partial=True)
+        if errors:
+            return jsonify({
+                'error': 'Validation failed',
+                'message': 'Please check your input',
+                'details': errors
+            }), 400
+        
+        for field in TRUCK_FIELDS:
+            if field in data:
+                setattr(truck, field, data[field])
+        db.session.commit()
+        fleet_index().apply([truck])
+        
+        return jsonify({
+            'message': 'Truck updated successfully',
+            'truck': truck.to_dict(fleet_index().position(truck.id))
+        }), 200
+    
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({
+            'error': 'Truck already exists',
+            'message': 'A truck with this license plate is already registered'
+        }), 400
+    except Exception as e:
+        record_exception(e)
+        db.session.rollback()
+        return jsonify({
+            'error': 'Truck update failed',
+            'message': 'Unable to update truck'
+        }), 500
+
+@trucks_bp.route('/<int:truck_id>', methods=['DELETE'])
+@admin_required()
+def delete_truck(truck_id):
+    """Retire a truck (admin only)"""
+    try:
+        truck = Truck.query.filter_by(id=truck_id, is_active=True).first()
+        if not truck:
+            return jsonify({
+                'error': 'Truck not found',
+                'message': 'Truck does not exist'
+            }), 404
+        
+        truck.is_active = False
+        db.session.commit()
+        fleet_index().apply([truck])
+        
+        return jsonify({'message': 'Truck deleted successfully'}), 200
+    
+    except Exception as e:
+        record_exception(e)
+        db.session.rollback()
+        return jsonify({
+            'error': 'Truck deletion failed',
+            'message': 'Unable to delete truck'
+        }), 500
+
+@trucks_bp.route('/<int:truck_id>/location', methods=['PUT'])
+@admin_required()
+def update_truck_location(truck_id):
+    """Record one position ping for a truck"""
+    try:
+        ping, error = parse_ping(request.get_json() or {}, truck_id)
+        if error:
+            return jsonify({
+                'error': 'Validation failed',
+                'message': error
+            }), 400
+        
+        if not record_pings([ping]):
+            if truck_id not in fleet_index():
+                return jsonify({
+                    'error': 'Truck not found',
+                    'message': 'Truck does not exist'
+                }), 404
+            return jsonify({'message': 'Older than the last recorded location, ignored'}), 202
+        
+        return jsonify({'message': 'Location recorded'}), 202
+    
+    except Exception as e:
+        record_exception(e)
+        return jsonify({
+            'error': 'Location update failed',
+            'message': 'Unable to record location'
+        }), 500
+
+@trucks_bp.route('/locations', methods=['POST'])
+@admin_required()
+def ingest_locations():
+    """Record a batch of position pings from several trucks"""
+    try:
+        data = request.get_json() or {}
+        pings = data.get('pings')
+        if not isinstance(pings, list) or not 0 < len(pings) <= current_app.config['FLEET_MAX_PINGS_PER_REQUEST']:
+            return jsonify({
+                'error': 'Validation failed',
+                'message': f'Send 1 to {current_app.config["FLEET_MAX_PINGS_PER_REQUEST"]} pings'
+            }), 400
+        
+        parsed = []
+        for item in pings:
+            ping, error = parse_ping(item if isinstance(item, dict) else {})
+            if error:
+                return jsonify({
+                    'error': 'Validation failed',
+                    'message': error
+                }), 400
+            parsed.append(ping)
+        
+        accepted = record_pings(parsed)
+        return jsonify({
+            'accepted': accepted,
+            'ignored': len(parsed) - accepted
+        }), 202
+    
+    except Exception as e:
+        record_exception(e)
+        return jsonify({
+            'error': 'Location update failed',
+            'message': 'Unable to record locations'
+        }), 500
+
+@trucks_bp.route('/<int:truck_id>/trail', methods=['GET'])
+@admin_required()
+def get_truck_trail(truck_id):
+    """A truck's recorded positions, newest first (admin only)"""
+    try:
+        limit = max(1, min(request.args.get('limit', 500, type=int), 5000))
+        since = request.args.get('since')
+        
+        # Write this process's buffered pings first so the trail is current
+        flush_trail()
+        query = TruckPosition.query.filter_by(truck_id=truck_id)
+        if since:
+            query = query.filter(TruckPosition.recorded_at >= datetime.fromisoformat(since))
+        positions = query.order_by(TruckPosition.recorded_at.desc()).limit(limit).all()
+        
+        return jsonify({
+            'trail': [position.to_dict() for position in positions]
+        }), 200
+    
+    except ValueError:
+        return jsonify({
+            'error': 'Validation failed',
+            'message': 'since must be an ISO timestamp'
+        }), 400
+    except Exception as e:
+        record_exception(e)
+        return jsonify({
+            'error': 'Trail retrieval failed',
+            'message': 'Unable to get trail'
+        }), 500
+
+@trucks_bp.route('/nearest', methods=['GET'])
+@admin_required()
+def get_nearest_trucks():
+    """Available trucks closest to an incident or to a latitude/longitude (admin only)"""
+    try:
+        incident_id = request.args.get('incident_id', type=int)
+        if incident_id:
+            incident = Incident.query.get(incident_id)
+            if not incident:
+                return jsonify({
+                    'error': 'Incident not found',
+                    'message': 'Incident does not exist'
+                }), 404
+            latitude, longitude = incident.latitude, incident.longitude
+        else:
+            latitude = request.args.get('latitude', type=float)
+            longitude = request.args.get('longitude', type=float)
+            if latitude is None or longitude is None:
+                return jsonify({
+                    'error': 'Validation failed',
+                    'message': 'Pass incident_id, or latitude and longitude'
+                }), 400
+        
+        limit = max(1, min(request.args.get('limit', 5, type=int), 50))
+        max_distance = request.args.get('max_distance', type=float)
+        matches = nearest_trucks(latitude, longitude, limit, max_distance)
+        
+        return jsonify({
+            'trucks': [
+                dict(truck.to_dict(position), distance_meters=round(distance))
+                for truck, distance, position in matches
+            ]
+        }), 200
+    
+    except Exception as e:
+        record_exception(e)
+        return jsonify({
+            'error': 'Truck search failed',
+            'message': 'Unable to find nearby trucks'
+        }), 500
@@ -0,0 +1,183 @@
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+from app.models.incident import Incident
+from app.models.archive import ArchivedIncident
+from app import db
+
+# Memoized reports keyed by (end_date, days, cell_size, top), oldest first
+_report_cache = {}
+
+# Smallest grid cell in degrees (about 11 m); finer grids would overflow int64 cell keys
+MIN_CELL_SIZE = 0.0001
+
+def load_incident_columns(start_date, end_date, batch_size=10000):
+    """Load incident coordinates, categories and timestamps (live and archived) as NumPy arrays"""
+    batches = {'latitude': [], 'longitude': [], 'category': [], 'created_at': [], 'resolved_at': []}
+    for model in (Incident, ArchivedIncident):
+        stmt = select(
+            model.latitude,
+            model.longitude,
+            model.category,
+            model.created_at,
+            model.resolved_at
+        ).where(
+            model.created_at.between(start_date, end_date)
+        ).execution_options(yield_per=batch_size)
+        
+        for partition in db.session.execute(stmt).partitions():
+            latitude, longitude, category, created_at, resolved_at = zip(*partition)
+            batches['latitude'].append(np.array(latitude, dtype=np.float64))
+            batches['longitude'].append(np.array(longitude, dtype=np.float64))
+            batches['category'].append(np.array(category, dtype=object))
+            batches['created_at'].append(np.array(created_at, dtype='datetime64[s]'))
+            batches['resolved_at'].append(np.array(resolved_at, dtype='datetime64[s]'))
+    
+    empty = {
+        'latitude': np.empty(0, dtype=np.float64),
+        'longitude': np.empty(0, dtype=np.float64),
+        'category': np.empty(0, dtype=object),
+        'created_at': np.empty(0, dtype='datetime64[s]'),
+        'resolved_at': np.empty(0, dtype='datetime64[s]')
+    }
+    return {
+        name: np.concatenate(arrays) if arrays else empty[name]
+        for name, arrays in batches.items()
+    }
+
+def grid_cells(latitude, longitude, cell_size):
+    """Map coordinates to integer grid cell keys on a global grid"""
+    cell_x = np.floor((longitude + 180) / cell_size).astype(np.int64)
+    cell_y = np.floor((latitude + 90) / cell_size).astype(np.int64)
+    columns = int(np.ceil(360 / cell_size))
+    return cell_y * columns + cell_x, columns
+
+def cell_center(keys, columns, cell_size):
+    """Centre coordinates of grid cell keys"""
+    latitude = (keys // columns + 0.5) * cell_size - 90
+    longitude = (keys % columns + 0.5) * cell_size - 180
+    return latitude, longitude
+
+def density_grid(latitude, longitude, cell_size, top=20):
+    """Densest grid cells, most incidents first"""
+    if latitude.size == 0:
+        return []
+    
+    keys, columns = grid_cells(latitude, longitude, cell_size)
+    cells, counts = np.unique(keys, return_counts=True)
+    order = np.argsort(counts, kind='stable')[::-1][:top]
+    center_lat, center_lng = cell_center(cells[order], columns, cell_size)
+    
+    return [
+        {'latitude': round(float(lat), 6), 'longitude': round(float(lng), 6), 'count': int(count)}
+        for lat, lng, count in zip(center_lat, center_lng, counts[order])
+    ]
+
+def category_trends(category, created_at, end_date, weeks):
+    """Weekly incident counts per category, oldest week first, with week-over-week change"""
+    end = np.datetime64(end_date, 's')
+    week_seconds = 7 * 24 * 3600
+    age = (end - created_at).astype(np.int64) // week_seconds
+    in_range = (age >= 0) & (age < weeks)
+    
+    names, codes = np.unique(category[in_range], return_inverse=True)
+    week_index = weeks - 1 - age[in_range]
+    counts = np.bincount(
+        week_index * len(names) + codes.reshape(-1),
+        minlength=weeks * len(names)
+    ).reshape(weeks, len(names)) if len(names) else np.zeros((weeks, 0), dtype=np.int64)
+    
+    week_starts = [
+        str(end - np.timedelta64((weeks - week) * week_seconds, 's'))
+        for week in range(weeks)
+    ]
+    
+    trends = {}
+    for index, name in enumerate(names):
+        current = int(counts[-1, index])
+        previous = int(counts[-2, index]) if weeks > 1 else 0
+        trends[str(name)] = {
+            'weekly_counts': counts[:, index].tolist(),
+            'current_week': current,
+            'previous_week': previous,
+            'change_pct': round((current - previous) / previous * 100, 1) if previous else None
+        }
+    
+    return {'week_starts': week_starts, 'categories': trends}
+
+def resolution_by_area(latitude, longitude, created_at, resolved_at, cell_size, top=20):
+    """Resolution-time distribution (hours) per grid cell for resolved incidents"""
+    resolved = ~np.isnat(resolved_at)
+    if not resolved.any():
+        return []
+    
+    hours = (resolved_at[resolved] - created_at[resolved]).astype(np.float64) / 3600
+    keys, columns = grid_cells(latitude[resolved], longitude[resolved], cell_size)
+    
+    # Sort by cell then duration so every cell is a contiguous, ordered slice
+    order = np.lexsort((hours, keys))
+    keys, hours = keys[order], hours[order]
+    cells, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+    
+    busiest = np.argsort(counts, kind='stable')[::-1][:top]
+    center_lat, center_lng = cell_center(cells[busiest], columns, cell_size)
+    
+    areas = []
+    for lat, lng, index in zip(center_lat, center_lng, busiest):
+        durations = hours[starts[index]:starts[index] + counts[index]]
+        areas.append({
+            'latitude': round(float(lat), 6),
+            'longitude': round(float(lng), 6),
+            'resolved_count': int(counts[index]),
+            'mean_hours': round(float(durations.mean()), 2),
+            'median_hours': round(float(np.percentile(durations, 50)), 2),
+            'p90_hours': round(float(np.percentile(durations, 90)), 2)
+        })
+    return areas
+
+def report_window(days):
+    """Time window ending at the start of the current cache bucket, so repeat requests share a key"""
+    ttl = current_app.config['ANALYTICS_CACHE_SECONDS']
+    end_date = datetime.utcnow().replace(microsecond=0)
+    if ttl > 0:
+        seconds = int((end_date - datetime(1970, 1, 1)).total_seconds())
+        end_date = datetime(1970, 1, 1) + timedelta(seconds=seconds - seconds % ttl)
+    return end_date - timedelta(days=days), end_date
+
+def hotspot_report(days=30, cell_size=0.01, top=20):
+    """Build the hotspot report for the last N days, memoized per time window"""
+    start_date, end_date = report_window(days)
+    cell_size = max(cell_size, MIN_CELL_SIZE)
+    key = (end_date, days, cell_size, top)
+    if key in _report_cache:
+        return _report_cache[key]
+    
+    columns = load_incident_columns(start_date, end_date, current_app.config['ANALYTICS_BATCH_SIZE'])
+    weeks = max(1, int(np.ceil(days / 7)))
+    
+    report = {
+        'period': {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'days': days
+        },
+        'total_incidents': int(columns['latitude'].size),
+        'hotspots': density_grid(columns['latitude'], columns['longitude'], cell_size, top),
+        'category_trends': category_trends(columns['category'], columns['created_at'], end_date, weeks),
+        'resolution_times': resolution_by_area(
+            columns['latitude'], columns['longitude'],
+            columns['created_at'], columns['resolved_at'],
+            cell_size, top
+        )
+    }
+    
+    if current_app.config['ANALYTICS_CACHE_SECONDS'] > 0:
+        # Older windows can never be requested again
+        for stale in [cached for cached in _report_cache if cached[0] != end_date]:
+            del _report_cache[stale]
+        # Bounded, since cell_size and top come from the query string
+        while len(_report_cache) >= current_app.config['ANALYTICS_CACHE_SIZE']:
+            del _report_cache[next(iter(_report_cache))]
+        _report_cache[key] = report
+    return report
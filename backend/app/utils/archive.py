@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select, literal, or_, and_
+from app.models.archive import ArchivedIncident, ARCHIVABLE_STATUSES
+from app.models.incident import Incident
+from app.models.vote import IncidentVote, DuplicateReport
+from app.models.tombstone import IncidentTombstone
+from app import db
+
+def archive_cutoff(days):
+    """Incidents resolved before this moment are due for archival"""
+    return datetime.utcnow() - timedelta(days=days)
+
+def archivable_query(cutoff):
+    """Resolved or closed incidents finished before cutoff (closed ones may lack resolved_at)"""
+    return Incident.query.filter(
+        Incident.status.in_(ARCHIVABLE_STATUSES),
+        or_(
+            Incident.resolved_at < cutoff,
+            and_(Incident.resolved_at.is_(None), Incident.updated_at < cutoff)
+        )
+    )
+
+def archive_batch(cutoff, batch_size, after_id=0):
+    """Move one batch of archivable incidents into the archive; returns the ids moved"""
+    ids = [
+        incident_id for incident_id, in archivable_query(cutoff).with_entities(Incident.id).filter(
+            Incident.id > after_id
+        ).order_by(Incident.id).limit(batch_size)
+    ]
+    if not ids:
+        return []
+    
+    # Copy and delete with set-based statements in one transaction: rows are either live or archived
+    names = [column.name for column in Incident.__table__.columns]
+    db.session.execute(ArchivedIncident.__table__.insert().from_select(
+        names + ['archived_at'],
+        select(
+            *[Incident.__table__.c[name] for name in names],
+            literal(datetime.utcnow(), db.DateTime)
+        ).where(Incident.id.in_(ids))
+    ))
+    # The vote and duplicate ledgers only guard against repeats; archived incidents keep their counters
+    IncidentVote.query.filter(IncidentVote.incident_id.in_(ids)).delete(synchronize_session=False)
+    DuplicateReport.query.filter(DuplicateReport.incident_id.in_(ids)).delete(synchronize_session=False)
+    Incident.query.filter(Incident.id.in_(ids)).delete(synchronize_session=False)
+    # Tell syncing clients to drop them from the live set
+    IncidentTombstone.record(db.session.connection(), ids, 'archived')
+    db.session.commit()
+    return ids
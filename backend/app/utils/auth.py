@@ -1,9 +1,13 @@
+from datetime import datetime, timezone
 from functools import wraps
 from flask import request, jsonify
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
 from app.models.user import User
+from app.models.truck import Truck
 from app import db
 
+INCIDENT_CATEGORIES = ('infrastructure', 'safety', 'environmental', 'traffic', 'public_service', 'other')
+
 def admin_required():
     """Decorator to require admin role"""
     def wrapper(fn):
@@ -90,7 +94,7 @@ def validate_incident_data(data):
     
     if not data.get('category'):
         errors.append('Category is required')
-    elif data['category'] not in ['infrastructure', 'safety', 'environmental', 'traffic', 'public_service', 'other']:
+    elif data['category'] not in INCIDENT_CATEGORIES:
         errors.append('Invalid category')
     
     if not data.get('latitude') or not data.get('longitude'):
@@ -106,4 +110,109 @@ def validate_incident_data(data):
         except ValueError:
             errors.append('Invalid coordinates')
     
-    return errors 
\ No newline at end of file
+    return errors 
+
+def validate_subscription_data(data, config):
+    """Validate an area subscription (circle or polygon plus optional categories)"""
+    errors = []
+    
+    def valid_point(latitude, longitude):
+        try:
+            return -90 <= float(latitude) <= 90 and -180 <= float(longitude) <= 180
+        except (TypeError, ValueError):
+            return False
+    
+    shape = data.get('shape')
+    if shape == 'circle':
+        if not valid_point(data.get('latitude'), data.get('longitude')):
+            errors.append('A valid latitude and longitude are required')
+        try:
+            radius = float(data.get('radius_meters'))
+            if not 0 < radius <= config['SUBSCRIPTION_MAX_RADIUS_METERS']:
+                errors.append(f'Radius must be between 0 and {config["SUBSCRIPTION_MAX_RADIUS_METERS"]} meters')
+        except (TypeError, ValueError):
+            errors.append('Radius in meters is required')
+    elif shape == 'polygon':
+        polygon = data.get('polygon')
+        if not isinstance(polygon, list) or not 3 <= len(polygon) <= config['SUBSCRIPTION_MAX_POLYGON_POINTS']:
+            errors.append(f'Polygon must have 3 to {config["SUBSCRIPTION_MAX_POLYGON_POINTS"]} points')
+        elif not all(isinstance(point, list) and len(point) == 2 and valid_point(*point) for point in polygon):
+            errors.append('Polygon points must be [latitude, longitude] pairs')
+    else:
+        errors.append('Shape must be "circle" or "polygon"')
+    
+    categories = data.get('categories')
+    if categories is not None and (
+        not isinstance(categories, list) or not all(category in INCIDENT_CATEGORIES for category in categories)
+    ):
+        errors.append('Invalid categories')
+    
+    return errors
+
+def unique_violation(error):
+    """Which users column ('username' or 'email') an IntegrityError from an insert violated"""
+    orig = getattr(error, 'orig', error)
+    table = User.__table__
+    columns = {
+        constraint.name: frozenset(column.name for column in constraint.columns)
+        for constraint in table.constraints if isinstance(constraint, db.UniqueConstraint)
+    }
+    # PostgreSQL reports the constraint by name; SQLite lists its columns instead:
+    # "UNIQUE constraint failed: users.email_normalized"
+    name = getattr(getattr(orig, 'diag', None), 'constraint_name', None)
+    if name is None:
+        message = str(orig)
+        prefix = 'UNIQUE constraint failed: '
+        if message.startswith(prefix):
+            failed = frozenset(column.strip() for column in message[len(prefix):].split(','))
+            name = next((constraint for constraint, names in columns.items()
+                         if failed == {f'{table.name}.{column}' for column in names}), None)
+    return {
+        'users_username_key': 'username',
+        'users_email_key': 'email',
+        'users_email_normalized_key': 'email'
+    }.get(name)
+
+def validate_truck_data(data, partial=False):
+    """Validate truck details; partial skips required fields for updates"""
+    errors = []
+    
+    if not partial or 'license_plate' in data:
+        plate = data.get('license_plate')
+        if not isinstance(plate, str) or not 0 < len(plate.strip()) <= 20:
+            errors.append('License plate is required (at most 20 characters)')
+    
+    if 'status' in data and data['status'] not in Truck.STATUSES:
+        errors.append(f'Status must be one of: {", ".join(Truck.STATUSES)}')
+    
+    if data.get('capacity_tons') is not None:
+        try:
+            if float(data['capacity_tons']) <= 0:
+                errors.append('Capacity must be positive')
+        except (TypeError, ValueError):
+            errors.append('Capacity must be a number')
+    
+    return errors
+
+def parse_ping(data, truck_id=None):
+    """Position ping from a request body as a dict for the fleet module, or (None, error)"""
+    try:
+        ping = {
+            'truck_id': int(truck_id if truck_id is not None else data['truck_id']),
+            'latitude': float(data['latitude']),
+            'longitude': float(data['longitude']),
+            'speed_kph': float(data['speed_kph']) if data.get('speed_kph') is not None else None,
+            'heading': float(data['heading']) % 360 if data.get('heading') is not None else None
+        }
+        recorded_at = datetime.fromisoformat(data['recorded_at']) if data.get('recorded_at') else None
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None, 'Each ping needs a truck_id, a numeric latitude and longitude and an ISO recorded_at'
+    if not (-90 <= ping['latitude'] <= 90 and -180 <= ping['longitude'] <= 180):
+        return None, 'Latitude or longitude out of range'
+    
+    # Device clocks drift: timestamps are stored naive UTC and never later than receipt
+    now = datetime.utcnow()
+    if recorded_at and recorded_at.tzinfo:
+        recorded_at = recorded_at.astimezone(timezone.utc).replace(tzinfo=None)
+    ping['recorded_at'] = min(recorded_at, now) if recorded_at else now
+    return ping, None
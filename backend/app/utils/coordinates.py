@@ -0,0 +1,92 @@
+import time
+from sqlalchemy import inspect, text, Integer
+from app import db
+
+COORDINATE_COLUMNS = ('latitude', 'longitude')
+COORDINATE_TABLES = ('incidents', 'incidents_archive')
+
+# Indexes that cover a coordinate column must be dropped before the column is swapped
+_COORDINATE_INDEXES = ('ix_incidents_lat_lng', 'ix_incidents_dedup')
+
+def needs_migration(table):
+    """True while a table still stores coordinates in the old decimal columns"""
+    inspector = inspect(db.engine)
+    if not inspector.has_table(table):
+        return False
+    columns = {column['name']: column['type'] for column in inspector.get_columns(table)}
+    return not isinstance(columns.get('latitude'), Integer)
+
+def prepare(table):
+    """Add the integer columns the decimal coordinates are copied into"""
+    existing = {column['name'] for column in inspect(db.engine).get_columns(table)}
+    with db.engine.begin() as connection:
+        for column in COORDINATE_COLUMNS:
+            if f'{column}_e6' not in existing:
+                connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column}_e6 INTEGER'))
+
+def _copy(table, condition):
+    return text(
+        f'UPDATE {table} SET latitude_e6 = ROUND(latitude * 1000000), '
+        f'longitude_e6 = ROUND(longitude * 1000000) WHERE {condition}'
+    )
+
+def copy_batch(table, after_id, batch_size):
+    """Convert the next batch of rows by id; returns (last id, rows), or (None, 0) when done"""
+    with db.engine.begin() as connection:
+        last_id, count = connection.execute(text(
+            f'SELECT MAX(id), COUNT(*) FROM '
+            f'(SELECT id FROM {table} WHERE id > :after_id ORDER BY id LIMIT :limit) batch'
+        ), {'after_id': after_id, 'limit': batch_size}).one()
+        if last_id is not None:
+            connection.execute(_copy(table, 'id > :after_id AND id <= :last_id'),
+                               {'after_id': after_id, 'last_id': last_id})
+    return last_id, count
+
+# Rows inserted after their batch ran, or updated after it copied them
+_STALE = (
+    'latitude_e6 IS NULL OR longitude_e6 IS NULL '
+    'OR latitude_e6 <> ROUND(latitude * 1000000) OR longitude_e6 <> ROUND(longitude * 1000000)'
+)
+
+def swap(table):
+    """Catch up rows written during the copy, then replace the decimal columns in one short transaction"""
+    with db.engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            # No writes between the catch-up and the column swap
+            connection.execute(text(f'LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE'))
+        connection.execute(_copy(table, _STALE))
+        if table == 'incidents':
+            for index in _COORDINATE_INDEXES:
+                connection.execute(text(f'DROP INDEX IF EXISTS {index}'))
+        for column in COORDINATE_COLUMNS:
+            connection.execute(text(f'ALTER TABLE {table} DROP COLUMN {column}'))
+            connection.execute(text(f'ALTER TABLE {table} RENAME COLUMN {column}_e6 TO {column}'))
+            if connection.dialect.name == 'postgresql':
+                connection.execute(text(f'ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL'))
+
+    from app.models.incident import Incident
+    if table == 'incidents':
+        for index in Incident.__table__.indexes:
+            if index.name in _COORDINATE_INDEXES:
+                index.create(db.engine, checkfirst=True)
+
+def migrate_coordinates(batch_size=5000, pause=0.0, progress=None):
+    """Move decimal coordinates to integer microdegrees in batches; returns rows converted per table"""
+    converted = {}
+    for table in COORDINATE_TABLES:
+        if not needs_migration(table):
+            continue
+        prepare(table)
+        total = 0
+        last_id = 0
+        while True:
+            last_id, count = copy_batch(table, last_id, batch_size)
+            if last_id is None:
+                break
+            total += count
+            if progress:
+                progress(table, total)
+            time.sleep(pause)
+        swap(table)
+        converted[table] = total
+    return converted
@@ -0,0 +1,94 @@
+import math
+import re
+import random
+import zlib
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app
+from sqlalchemy.orm import load_only
+from app.models.incident import Incident
+
+SIGNATURE_SIZE = 32
+_PRIME = (1 << 31) - 1
+
+# Fixed permutations so signatures are stable across processes and deploys
+_random = random.Random(20240101)
+_A = np.array([_random.randrange(1, _PRIME) for _ in range(SIGNATURE_SIZE)], dtype=np.uint64)
+_B = np.array([_random.randrange(0, _PRIME) for _ in range(SIGNATURE_SIZE)], dtype=np.uint64)
+
+STOPWORDS = frozenset((
+    'a', 'an', 'and', 'are', 'at', 'be', 'by', 'for', 'from', 'has', 'in', 'is', 'it',
+    'near', 'of', 'on', 'or', 'the', 'there', 'this', 'to', 'very', 'was', 'with'
+))
+
+def tokenize(text):
+    """Lower-case word tokens without stopwords, plus adjacent-word pairs"""
+    words = [word for word in re.findall(r'\w+', (text or '').lower()) if word not in STOPWORDS]
+    return set(words) | {f'{first} {second}' for first, second in zip(words, words[1:])}
+
+def text_signature(title, description):
+    """MinHash signature of an incident's title and description, packed as bytes"""
+    tokens = tokenize(f'{title} {description}')
+    if not tokens:
+        return None
+
+    hashes = np.array([zlib.crc32(token.encode()) for token in tokens], dtype=np.uint64)
+    permuted = (_A[:, None] * (hashes[None, :] % _PRIME) + _B[:, None]) % _PRIME
+    return permuted.min(axis=1).astype('<u4').tobytes()
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of two signatures"""
+    if not signature or not other:
+        return 0.0
+    return float(np.mean(np.frombuffer(signature, dtype='<u4') == np.frombuffer(other, dtype='<u4')))
+
+def distance_meters(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in meters"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 6371000 * 2 * math.asin(math.sqrt(a))
+
+def find_duplicates(category, latitude, longitude, signature, limit=5):
+    """Open, recent incidents of the same category nearby, ranked by text similarity"""
+    config = current_app.config
+    radius = config['DUPLICATE_RADIUS_METERS']
+    lat_delta = radius / 111320
+    lng_delta = radius / (111320 * max(math.cos(math.radians(latitude)), 0.01))
+
+    candidates = Incident.query.options(load_only(
+        Incident.id, Incident.title, Incident.status, Incident.latitude, Incident.longitude,
+        Incident.upvotes, Incident.downvotes, Incident.text_signature
+    )).filter(
+        Incident.category == category,
+        Incident.status.in_(('open', 'in_progress')),
+        Incident.latitude.between(latitude - lat_delta, latitude + lat_delta),
+        Incident.longitude.between(longitude - lng_delta, longitude + lng_delta),
+        Incident.created_at >= datetime.utcnow() - timedelta(days=config['DUPLICATE_WINDOW_DAYS'])
+    ).order_by(
+        # In a busy area keep the newest candidates, not whichever the database returns first
+        Incident.created_at.desc(), Incident.id.desc()
+    ).limit(config['DUPLICATE_MAX_CANDIDATES']).all()
+
+    matches = []
+    for candidate in candidates:
+        distance = distance_meters(latitude, longitude, float(candidate.latitude), float(candidate.longitude))
+        if distance > radius:
+            continue
+        score = similarity(signature, candidate.text_signature)
+        if score >= config['DUPLICATE_MIN_SIMILARITY']:
+            matches.append((score, distance, candidate))
+
+    matches.sort(key=lambda match: (-match[0], match[1]))
+    return [
+        {
+            'id': candidate.id,
+            'title': candidate.title,
+            'status': candidate.status,
+            'similarity': round(score, 2),
+            'distance_meters': round(distance, 1),
+            'vote_count': candidate.get_vote_count(),
+            'vote_url': f'/api/incidents/{candidate.id}/vote'
+        }
+        for score, distance, candidate in matches[:limit]
+    ]
@@ -0,0 +1,228 @@
+import heapq
+import math
+import threading
+import time
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from app.models.incident import Incident
+from app.models.user import User
+from app.utils.dedup import distance_meters
+from app.utils.ranking import ACTIVE_STATUSES
+from app import db
+
+class DispatchIndex:
+    """Admins keyed by open workload: a global min-heap plus one min-heap per home-area grid cell.
+
+    Heap entries are (load, admin_id) and are never updated in place; a load change pushes a
+    new entry and stale ones are discarded when they reach the top, so every operation is
+    O(log n) in the number of admins.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.built_at = None
+        self._lock = threading.Lock()
+        self._load = {}
+        self._home = {}
+        self._all = []
+        self._cells = {}
+
+    def _cell(self, latitude, longitude):
+        return math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size)
+
+    def _push(self, admin_id):
+        entry = (self._load[admin_id], admin_id)
+        heapq.heappush(self._all, entry)
+        home = self._home[admin_id]
+        if home:
+            heapq.heappush(self._cells.setdefault(self._cell(*home), []), entry)
+
+    def _top(self, heap):
+        """Current least-loaded entry of a heap, dropping stale entries on the way"""
+        while heap:
+            load, admin_id = heap[0]
+            if self._load.get(admin_id) == load:
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    def _ordered(self, heap):
+        """Live entries of a heap in ascending order, walked without popping"""
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier:
+            entry, position = heapq.heappop(frontier)
+            if self._load.get(entry[1]) == entry[0]:
+                yield entry
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+
+    def _least(self, heap, pending, admins):
+        """Least-loaded entry of a heap counting uncommitted changes; admins are the pending ones it holds"""
+        if not admins:
+            return self._top(heap)
+        best = next((entry for entry in self._ordered(heap) if entry[1] not in pending), None)
+        for admin_id in admins:
+            entry = (max(self._load[admin_id] + pending[admin_id], 0), admin_id)
+            if best is None or entry < best:
+                best = entry
+        return best
+
+    def rebuild(self, admins):
+        """Reload from (admin_id, open_assignments, home_latitude, home_longitude) rows"""
+        with self._lock:
+            self._load = {}
+            self._home = {}
+            self._all = []
+            self._cells = {}
+            for admin_id, load, latitude, longitude in admins:
+                self._load[admin_id] = load or 0
+                self._home[admin_id] = (latitude, longitude) if latitude is not None and longitude is not None else None
+                self._push(admin_id)
+            self.built_at = time.monotonic()
+
+    def adjust(self, admin_id, delta):
+        """Apply a workload change for an admin we are tracking"""
+        with self._lock:
+            if admin_id not in self._load:
+                return
+            self._load[admin_id] = max(self._load[admin_id] + delta, 0)
+            self._push(admin_id)
+            # Compact once stale entries outnumber live ones
+            if len(self._all) > 4 * len(self._load) + 64:
+                self._all = []
+                self._cells = {}
+                for tracked_id in self._load:
+                    self._push(tracked_id)
+
+    def pick(self, latitude, longitude, slack=0, pending=None):
+        """Admin for an incident: least loaded nearby (within slack of the global minimum), else global.
+
+        pending holds workload changes of the caller's uncommitted transaction, which the index
+        itself only applies on commit.
+        """
+        with self._lock:
+            pending = {admin_id: delta for admin_id, delta in (pending or {}).items() if admin_id in self._load}
+            best = self._least(self._all, pending, pending)
+            if best is None:
+                return None
+
+            row, column = self._cell(latitude, longitude)
+            local = []
+            for cell in ((row + dr, column + dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1)):
+                admins = [admin_id for admin_id in pending
+                          if self._home[admin_id] and self._cell(*self._home[admin_id]) == cell]
+                top = self._least(self._cells.get(cell, []), pending, admins)
+                if top:
+                    load, admin_id = top
+                    distance = distance_meters(latitude, longitude, *self._home[admin_id])
+                    local.append((load, distance, admin_id))
+            if local:
+                load, distance, admin_id = min(local)
+                if load <= best[0] + slack:
+                    return admin_id
+            return best[1]
+
+    def load_of(self, admin_id):
+        return self._load.get(admin_id)
+
+def init_dispatch(app):
+    """Attach an (empty) dispatch index; it is loaded from the database on first use"""
+    app.extensions['dispatch'] = DispatchIndex(app.config['DISPATCH_CELL_DEGREES'])
+
+def _active_admins():
+    return db.session.query(
+        User.id, User.open_assignments, User.home_latitude, User.home_longitude
+    ).filter(User.role == 'admin', User.is_active.is_(True)).all()
+
+def dispatch_index():
+    """The app's dispatch index, rebuilt from the database when missing or older than the rebuild interval"""
+    index = current_app.extensions['dispatch']
+    if index.built_at is None or \
+            time.monotonic() - index.built_at > current_app.config['DISPATCH_REBUILD_SECONDS']:
+        index.rebuild(_active_admins())
+    return index
+
+def invalidate_dispatch_index():
+    """Force a rebuild on next use (admin added, deactivated or home area changed)"""
+    current_app.extensions['dispatch'].built_at = None
+
+def pick_admin(latitude, longitude):
+    """Admin id to auto-assign an incident at this location to, or None if there are no admins"""
+    return dispatch_index().pick(
+        float(latitude), float(longitude), slack=current_app.config['DISPATCH_LOAD_SLACK'],
+        pending=db.session.info.get('dispatch_workload')
+    )
+
+def recount_open_assignments():
+    """Recompute every admin's open workload counter from the incidents table"""
+    from sqlalchemy import func
+
+    counts = dict(db.session.query(Incident.assigned_to, func.count(Incident.id)).filter(
+        Incident.assigned_to.isnot(None),
+        Incident.status.in_(ACTIVE_STATUSES)
+    ).group_by(Incident.assigned_to).all())
+    users = User.query.filter(db.or_(User.id.in_(counts), User.open_assignments != 0)).all()
+    for user in users:
+        user.open_assignments = counts.get(user.id, 0)
+    db.session.commit()
+    invalidate_dispatch_index()
+    return len(users)
+
+# Workload counters follow every ORM change to an incident's assignee or status
+def _apply_workload(target, connection, changes):
+    users = User.__table__
+    pending = None
+    for admin_id, delta in changes.items():
+        if not admin_id or not delta:
+            continue
+        connection.execute(users.update().where(users.c.id == admin_id).values(
+            open_assignments=users.c.open_assignments + delta
+        ))
+        # The in-memory index only follows once the transaction commits
+        if pending is None:
+            pending = object_session(target).info.setdefault('dispatch_workload', {})
+        pending[admin_id] = pending.get(admin_id, 0) + delta
+
+@event.listens_for(Session, 'after_commit')
+def _workload_committed(session):
+    pending = session.info.pop('dispatch_workload', None)
+    if pending and has_app_context() and 'dispatch' in current_app.extensions:
+        index = current_app.extensions['dispatch']
+        for admin_id, delta in pending.items():
+            index.adjust(admin_id, delta)
+
+@event.listens_for(Session, 'after_rollback')
+def _workload_rolled_back(session):
+    session.info.pop('dispatch_workload', None)
+
+def _workload_of(assignee, status):
+    return {assignee: 1} if assignee and status in ACTIVE_STATUSES else {}
+
+@event.listens_for(Incident, 'after_insert')
+def _incident_inserted(mapper, connection, target):
+    _apply_workload(target, connection, _workload_of(target.assigned_to, target.status))
+
+@event.listens_for(Incident, 'after_update')
+def _incident_updated(mapper, connection, target):
+    state = db.inspect(target)
+    assignee_history = state.attrs.assigned_to.history
+    status_history = state.attrs.status.history
+    if not assignee_history.has_changes() and not status_history.has_changes():
+        return
+
+    previous_assignee = assignee_history.deleted[0] if assignee_history.deleted else target.assigned_to
+    previous_status = status_history.deleted[0] if status_history.deleted else target.status
+    changes = {}
+    for admin_id, count in _workload_of(previous_assignee, previous_status).items():
+        changes[admin_id] = changes.get(admin_id, 0) - count
+    for admin_id, count in _workload_of(target.assigned_to, target.status).items():
+        changes[admin_id] = changes.get(admin_id, 0) + count
+    _apply_workload(target, connection, changes)
+
+@event.listens_for(Incident, 'after_delete')
+def _incident_deleted(mapper, connection, target):
+    _apply_workload(target, connection, {
+        admin_id: -count for admin_id, count in _workload_of(target.assigned_to, target.status).items()
+    })
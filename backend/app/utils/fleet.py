@@ -0,0 +1,272 @@
+import atexit
+import heapq
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from flask import current_app
+from sqlalchemy import and_, bindparam, or_
+from app.models.truck import Truck, TruckPosition
+from app.utils.dedup import distance_meters
+from app import db
+
+TRAIL_FIELDS = ('truck_id', 'latitude', 'longitude', 'speed_kph', 'heading', 'recorded_at')
+
+class FleetIndex:
+    """Latest position and status of every active truck, on a uniform grid.
+
+    A ping moves a truck between cells with two set operations, and a nearest-trucks query
+    scans rings of cells outwards from the point, stopping once no unvisited cell can hold
+    anything closer than the trucks already found.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.built_at = None
+        self.synced_to = None
+        self._lock = threading.Lock()
+        self._trucks = {}
+        self._cells = {}
+
+    def _cell(self, latitude, longitude):
+        return math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size)
+
+    def _place(self, truck_id, status, latitude, longitude, recorded_at):
+        previous = self._trucks.get(truck_id)
+        if previous and previous[1] is not None:
+            cell = self._cell(previous[1], previous[2])
+            if latitude is None or cell != self._cell(latitude, longitude):
+                members = self._cells.get(cell)
+                if members:
+                    members.discard(truck_id)
+                    if not members:
+                        del self._cells[cell]
+        self._trucks[truck_id] = (status, latitude, longitude, recorded_at)
+        if latitude is not None:
+            self._cells.setdefault(self._cell(latitude, longitude), set()).add(truck_id)
+
+    def _remove(self, truck_id):
+        if truck_id in self._trucks:
+            self._place(truck_id, None, None, None, None)
+            del self._trucks[truck_id]
+
+    def _apply(self, truck):
+        if not truck.is_active:
+            self._remove(truck.id)
+            return
+        current = self._trucks.get(truck.id)
+        # A newer ping seen by this process wins over the position saved by the last flush
+        if current and current[3] and (truck.located_at is None or truck.located_at < current[3]):
+            self._place(truck.id, truck.status, *current[1:])
+        else:
+            self._place(truck.id, truck.status, truck.latitude, truck.longitude, truck.located_at)
+
+    def apply(self, trucks):
+        """Add, update or (inactive ones) remove trucks from database rows"""
+        with self._lock:
+            for truck in trucks:
+                self._apply(truck)
+
+    def rebuild(self, trucks, synced_to):
+        with self._lock:
+            self._trucks = {}
+            self._cells = {}
+            for truck in trucks:
+                self._apply(truck)
+            self.built_at = time.monotonic()
+            self.synced_to = synced_to
+
+    def move(self, truck_id, latitude, longitude, recorded_at):
+        """Record a ping; False for unknown trucks and pings older than the position we hold"""
+        with self._lock:
+            current = self._trucks.get(truck_id)
+            if current is None or (current[3] and recorded_at < current[3]):
+                return False
+            self._place(truck_id, current[0], latitude, longitude, recorded_at)
+            return True
+
+    def position(self, truck_id):
+        """(latitude, longitude, recorded_at) of a truck, or None if it has not reported one"""
+        entry = self._trucks.get(truck_id)
+        return entry[1:] if entry and entry[1] is not None else None
+
+    def nearest(self, latitude, longitude, limit, max_distance, statuses=('available',)):
+        """Up to limit (distance in meters, truck id) pairs within max_distance, closest first"""
+        cell_meters = self.cell_size * 111320 * max(math.cos(math.radians(latitude)), 0.01)
+        max_ring = math.ceil(max_distance / cell_meters) + 1
+        row, column = self._cell(latitude, longitude)
+        found = []
+        with self._lock:
+            for ring in range(max_ring + 1):
+                for cell in _ring_cells(row, column, ring):
+                    for truck_id in self._cells.get(cell, ()):
+                        status, truck_latitude, truck_longitude, _ = self._trucks[truck_id]
+                        if status not in statuses:
+                            continue
+                        distance = distance_meters(latitude, longitude, truck_latitude, truck_longitude)
+                        if distance <= max_distance:
+                            found.append((distance, truck_id))
+                # Every cell beyond this ring is at least ring cell widths away
+                if len(found) >= limit and heapq.nsmallest(limit, found)[-1][0] <= ring * cell_meters:
+                    break
+        return heapq.nsmallest(limit, found)
+
+    def __contains__(self, truck_id):
+        return truck_id in self._trucks
+
+    def __len__(self):
+        return len(self._trucks)
+
+def _ring_cells(row, column, ring):
+    """Cells at Chebyshev distance ring from (row, column)"""
+    if ring == 0:
+        yield row, column
+        return
+    for offset in range(-ring, ring + 1):
+        yield row - ring, column + offset
+        yield row + ring, column + offset
+    for offset in range(-ring + 1, ring):
+        yield row + offset, column - ring
+        yield row + offset, column + ring
+
+class TrailBuffer:
+    """Pings waiting to be written to the trail table in one batch"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = []
+        self._oldest = None
+        self._flusher = None
+
+    def start_flusher(self, flush, interval):
+        """Call flush every interval seconds from a daemon thread of this process (once per buffer),
+        so the last pings of a quiet truck are written without waiting for the next ping; and at exit"""
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, args=(flush, interval),
+                                             name='fleet-trail-flush', daemon=True)
+            self._flusher.start()
+        atexit.register(flush)
+
+    def _flush_loop(self, flush, interval):
+        while True:
+            time.sleep(interval)
+            if self.age():
+                flush()
+
+    def add(self, rows):
+        with self._lock:
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.extend(rows)
+            return len(self._rows)
+
+    def age(self):
+        with self._lock:
+            return time.monotonic() - self._oldest if self._rows else 0
+
+    def drain(self):
+        with self._lock:
+            rows, self._rows = self._rows, []
+            return rows
+
+def init_fleet(app):
+    """Attach an (empty) fleet index and trail buffer; the index loads from the database on first use"""
+    app.extensions['fleet'] = FleetIndex(app.config['FLEET_CELL_DEGREES'])
+    app.extensions['fleet_trail'] = TrailBuffer()
+
+def fleet_index():
+    """The app's fleet index: built on first use, then kept current by polling for changes"""
+    index = current_app.extensions['fleet']
+    now = datetime.utcnow()
+    if index.built_at is None:
+        index.rebuild(Truck.query.filter_by(is_active=True).yield_per(5000), now)
+    elif time.monotonic() - index.built_at > current_app.config['FLEET_REFRESH_SECONDS']:
+        # Positions flushed and trucks edited by other processes (the overlap covers late commits)
+        index.apply(Truck.query.filter(Truck.updated_at >= index.synced_to - timedelta(seconds=30)).all())
+        index.built_at = time.monotonic()
+        index.synced_to = now
+    return index
+
+def record_pings(pings):
+    """Apply validated pings (dicts with truck_id, latitude, longitude, recorded_at, speed_kph,
+    heading) to the index and buffer them for the trail; returns how many were accepted.
+
+    The buffer is written once it holds FLEET_TRAIL_BATCH_SIZE pings, or by this process's flush
+    thread every FLEET_TRAIL_FLUSH_SECONDS, so a burst of pings costs one INSERT instead of one
+    commit each.
+    """
+    index = fleet_index()
+    accepted = [
+        ping for ping in pings
+        if index.move(ping['truck_id'], ping['latitude'], ping['longitude'], ping['recorded_at'])
+    ]
+    if accepted:
+        buffer = current_app.extensions['fleet_trail']
+        buffer.start_flusher(partial(_flush_in, current_app._get_current_object()),
+                             current_app.config['FLEET_TRAIL_FLUSH_SECONDS'])
+        pending = buffer.add(accepted)
+        if pending >= current_app.config['FLEET_TRAIL_BATCH_SIZE'] or \
+                buffer.age() >= current_app.config['FLEET_TRAIL_FLUSH_SECONDS']:
+            flush_trail()
+    return len(accepted)
+
+def _flush_in(app):
+    with app.app_context():
+        try:
+            flush_trail()
+        except Exception:
+            app.logger.exception('Truck trail flush failed')
+
+def flush_trail():
+    """Write buffered pings to the trail and each truck's latest one to the trucks table"""
+    rows = current_app.extensions['fleet_trail'].drain()
+    if not rows:
+        return 0
+
+    latest = {}
+    for row in rows:
+        if row['truck_id'] not in latest or row['recorded_at'] >= latest[row['truck_id']]['recorded_at']:
+            latest[row['truck_id']] = row
+
+    trucks = Truck.__table__
+    try:
+        db.session.execute(TruckPosition.__table__.insert(), [
+            {field: row[field] for field in TRAIL_FIELDS} for row in rows
+        ])
+        # Skip trucks whose saved position is already newer (flushed by another process)
+        db.session.execute(trucks.update().where(and_(
+            trucks.c.id == bindparam('truck'),
+            or_(trucks.c.located_at.is_(None), trucks.c.located_at <= bindparam('at'))
+        )).values(
+            latitude=bindparam('lat'),
+            longitude=bindparam('lng'),
+            speed_kph=bindparam('speed'),
+            heading=bindparam('course'),
+            located_at=bindparam('at'),
+            updated_at=datetime.utcnow()
+        ), [
+            {'truck': truck_id, 'lat': row['latitude'], 'lng': row['longitude'],
+             'speed': row['speed_kph'], 'course': row['heading'], 'at': row['recorded_at']}
+            for truck_id, row in latest.items()
+        ])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        # The index already holds the latest positions; only this stretch of trail is lost
+        current_app.logger.exception('Dropped %d truck pings after a failed trail write', len(rows))
+        return 0
+    return len(rows)
+
+def nearest_trucks(latitude, longitude, limit=5, max_distance=None):
+    """Closest trucks available for dispatch, with their distances in meters"""
+    max_distance = max_distance or current_app.config['FLEET_NEAREST_MAX_METERS']
+    index = fleet_index()
+    matches = index.nearest(float(latitude), float(longitude), limit, max_distance)
+    trucks = {truck.id: truck for truck in Truck.query.filter(Truck.id.in_([truck_id for _, truck_id in matches]))}
+    return [
+        (trucks[truck_id], distance, index.position(truck_id))
+        for distance, truck_id in matches if truck_id in trucks
+    ]
@@ -0,0 +1,162 @@
+import csv
+import math
+import mmap
+import os
+import struct
+import numpy as np
+from flask import current_app
+from app.utils.dedup import distance_meters
+
+GEOCODED_FIELDS = ('address', 'city', 'state', 'zip_code')
+
+# magic, cell size (degrees), points, cells, strings, string blob bytes
+_HEADER = struct.Struct('<4sdIIIQ')
+_MAGIC = b'VGZ1'
+_ROW_STRIDE = 1 << 32
+
+def _cell_key(row, column):
+    """Cells of one grid row get consecutive keys, so a row's span of columns is one key range"""
+    return row * _ROW_STRIDE + column + (1 << 31)
+
+def _aligned(size):
+    return size + -size % 8
+
+def _padded(data):
+    return data + b'\0' * (_aligned(len(data)) - len(data))
+
+def build_gazetteer(rows, path, cell_size):
+    """Compile gazetteer rows (dicts with latitude, longitude and any GEOCODED_FIELDS) into an index file"""
+    strings = {}
+    points = []
+    for row in rows:
+        try:
+            latitude, longitude = float(row['latitude']), float(row['longitude'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        fields = [
+            strings.setdefault(value, len(strings)) if value else -1
+            for value in ((row.get(field) or '').strip() for field in GEOCODED_FIELDS)
+        ]
+        key = _cell_key(math.floor(latitude / cell_size), math.floor(longitude / cell_size))
+        points.append((key, latitude, longitude, fields))
+
+    # Points sorted by cell: each cell is a contiguous slice found through the cell table
+    points.sort(key=lambda point: point[0])
+    keys = np.array([point[0] for point in points], dtype='<i8')
+    cell_keys, cell_starts = np.unique(keys, return_index=True)
+    cell_offsets = np.append(cell_starts, len(points)).astype('<i8')
+    coordinates = np.array([point[1:3] for point in points], dtype='<f4').reshape(-1, 2)
+    fields = np.array([point[3] for point in points], dtype='<i4').reshape(-1, len(GEOCODED_FIELDS))
+
+    encoded = [value.encode() for value in strings]
+    string_offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+    string_offsets[1:] = np.cumsum([len(value) for value in encoded])
+    blob = b''.join(encoded)
+
+    # Write beside the target and rename, so processes mapping the old file keep a valid copy
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as handle:
+        handle.write(_padded(_HEADER.pack(_MAGIC, cell_size, len(points), len(cell_keys), len(encoded), len(blob))))
+        for array in (cell_keys, cell_offsets, coordinates, fields, string_offsets):
+            handle.write(_padded(array.tobytes()))
+        handle.write(blob)
+    os.replace(temporary, path)
+    return len(points)
+
+def load_gazetteer_csv(path):
+    """Rows of a gazetteer CSV with a header line"""
+    with open(path, newline='', encoding='utf-8') as handle:
+        yield from csv.DictReader(handle)
+
+class Gazetteer:
+    """Read-only, memory-mapped gazetteer; the OS page cache shares it between worker processes"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.cell_size, points, cells, strings, _ = _HEADER.unpack_from(self._map)
+        if magic != _MAGIC:
+            raise ValueError(f'{path} is not a gazetteer index')
+
+        offset = _aligned(_HEADER.size)
+
+        def section(dtype, count, shape=None):
+            nonlocal offset
+            array = np.frombuffer(self._map, dtype=dtype, count=count, offset=offset)
+            offset += _aligned(array.nbytes)
+            return array.reshape(shape) if shape else array
+
+        self._cell_keys = section('<i8', cells)
+        self._cell_offsets = section('<i8', cells + 1)
+        self._coordinates = section('<f4', points * 2, (points, 2))
+        self._fields = section('<i4', points * len(GEOCODED_FIELDS), (points, len(GEOCODED_FIELDS)))
+        self._string_offsets = section('<i8', strings + 1)
+        self._blob = offset
+
+    def __len__(self):
+        return len(self._coordinates)
+
+    def _string(self, index):
+        start, end = self._string_offsets[index], self._string_offsets[index + 1]
+        return self._map[self._blob + start:self._blob + end].decode()
+
+    def nearest(self, latitude, longitude, max_distance):
+        """Location fields of the closest gazetteer point within max_distance meters, or None"""
+        lat_delta = max_distance / 111320
+        lng_delta = max_distance / (111320 * max(math.cos(math.radians(latitude)), 0.01))
+        west = math.floor((longitude - lng_delta) / self.cell_size)
+        east = math.floor((longitude + lng_delta) / self.cell_size)
+
+        slices = []
+        for row in range(math.floor((latitude - lat_delta) / self.cell_size),
+                         math.floor((latitude + lat_delta) / self.cell_size) + 1):
+            first = int(np.searchsorted(self._cell_keys, _cell_key(row, west), side='left'))
+            last = int(np.searchsorted(self._cell_keys, _cell_key(row, east), side='right'))
+            if first < last:
+                slices.append((self._cell_offsets[first], self._cell_offsets[last]))
+        if not slices:
+            return None
+
+        # Equirectangular distances pick the candidate; the exact distance confirms the cut-off
+        best, best_distance = None, None
+        scale = math.cos(math.radians(latitude))
+        for start, end in slices:
+            candidates = self._coordinates[start:end]
+            squared = (candidates[:, 0] - latitude) ** 2 + ((candidates[:, 1] - longitude) * scale) ** 2
+            index = int(np.argmin(squared))
+            if best_distance is None or squared[index] < best_distance:
+                best, best_distance = start + index, squared[index]
+
+        point_latitude, point_longitude = self._coordinates[best]
+        if distance_meters(latitude, longitude, float(point_latitude), float(point_longitude)) > max_distance:
+            return None
+        return {
+            field: self._string(index)
+            for field, index in zip(GEOCODED_FIELDS, self._fields[best]) if index >= 0
+        }
+
+def gazetteer():
+    """The app's gazetteer, mapped on first use; None when no index file has been built"""
+    extensions = current_app.extensions
+    if 'geocoder' not in extensions:
+        path = current_app.config['GEOCODER_INDEX_PATH']
+        extensions['geocoder'] = Gazetteer(path) if path and os.path.exists(path) else None
+        if extensions['geocoder'] is None:
+            current_app.logger.info('No gazetteer index at %s, reverse geocoding is disabled', path)
+    return extensions['geocoder']
+
+def fill_location(incident):
+    """Fill an incident's empty address fields from the nearest gazetteer place; True if any changed"""
+    missing = [field for field in GEOCODED_FIELDS if not getattr(incident, field)]
+    index = gazetteer()
+    if not missing or index is None or incident.latitude is None or incident.longitude is None:
+        return False
+
+    place = index.nearest(float(incident.latitude), float(incident.longitude),
+                          current_app.config['GEOCODER_MAX_DISTANCE_METERS'])
+    changed = False
+    for field in missing:
+        if place and place.get(field):
+            setattr(incident, field, place[field])
+            changed = True
+    return changed
@@ -0,0 +1,188 @@
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from app.models.subscription import AreaSubscription
+from app.utils.dedup import distance_meters
+from app.utils.jobs import enqueue, job_handler
+
+def point_in_polygon(latitude, longitude, polygon):
+    """Ray casting test treating [[lat, lng], ...] as planar (fine at city scale)"""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lng_i = polygon[i]
+        lat_j, lng_j = polygon[j]
+        if (lat_i > latitude) != (lat_j > latitude):
+            crossing = lng_i + (latitude - lat_i) * (lng_j - lng_i) / (lat_j - lat_i)
+            if longitude < crossing:
+                inside = not inside
+        j = i
+    return inside
+
+class Region:
+    """Geometry and filter of one subscription, as held by the index"""
+    __slots__ = ('id', 'user_id', 'categories', 'circle', 'polygon', 'bbox')
+
+    def __init__(self, subscription):
+        self.id = subscription.id
+        self.user_id = subscription.user_id
+        self.categories = frozenset(subscription.categories) if subscription.categories else None
+        self.circle = None
+        self.polygon = None
+        if subscription.shape == 'circle':
+            latitude, longitude = subscription.center_latitude, subscription.center_longitude
+            radius = subscription.radius_meters
+            self.circle = (latitude, longitude, radius)
+            lat_delta = radius / 111320
+            lng_delta = radius / (111320 * max(math.cos(math.radians(latitude)), 0.01))
+            self.bbox = (latitude - lat_delta, longitude - lng_delta, latitude + lat_delta, longitude + lng_delta)
+        else:
+            self.polygon = [tuple(point) for point in subscription.polygon]
+            latitudes = [point[0] for point in self.polygon]
+            longitudes = [point[1] for point in self.polygon]
+            self.bbox = (min(latitudes), min(longitudes), max(latitudes), max(longitudes))
+
+    def matches(self, latitude, longitude, category):
+        if self.categories is not None and category not in self.categories:
+            return False
+        south, west, north, east = self.bbox
+        if not (south <= latitude <= north and west <= longitude <= east):
+            return False
+        if self.circle:
+            return distance_meters(latitude, longitude, self.circle[0], self.circle[1]) <= self.circle[2]
+        return point_in_polygon(latitude, longitude, self.polygon)
+
+class SubscriptionIndex:
+    """Uniform grid over subscription bounding boxes.
+
+    A region is registered in every cell its bounding box touches (very large regions go to a
+    short always-checked list instead), so matching a point costs one dict lookup plus exact
+    tests on the few regions sharing its cell.
+    """
+
+    def __init__(self, cell_size, max_cells):
+        self.cell_size = cell_size
+        self.max_cells = max_cells
+        self.built_at = None
+        self.synced_to = None
+        self._lock = threading.Lock()
+        self._regions = {}
+        self._cells = {}
+        self._large = set()
+
+    def _cell_range(self, bbox):
+        south, west, north, east = bbox
+        rows = range(math.floor(south / self.cell_size), math.floor(north / self.cell_size) + 1)
+        columns = range(math.floor(west / self.cell_size), math.floor(east / self.cell_size) + 1)
+        return rows, columns
+
+    def _remove(self, subscription_id):
+        region = self._regions.pop(subscription_id, None)
+        if region is None:
+            return
+        if subscription_id in self._large:
+            self._large.discard(subscription_id)
+            return
+        rows, columns = self._cell_range(region.bbox)
+        for row in rows:
+            for column in columns:
+                cell = self._cells.get((row, column))
+                if cell:
+                    cell.discard(subscription_id)
+                    if not cell:
+                        del self._cells[(row, column)]
+
+    def _add(self, region):
+        self._regions[region.id] = region
+        rows, columns = self._cell_range(region.bbox)
+        if len(rows) * len(columns) > self.max_cells:
+            self._large.add(region.id)
+            return
+        for row in rows:
+            for column in columns:
+                self._cells.setdefault((row, column), set()).add(region.id)
+
+    def apply(self, subscriptions):
+        """Add, replace or (inactive ones) remove subscriptions"""
+        with self._lock:
+            for subscription in subscriptions:
+                self._remove(subscription.id)
+                if subscription.is_active:
+                    self._add(Region(subscription))
+
+    def rebuild(self, subscriptions, synced_to):
+        with self._lock:
+            self._regions = {}
+            self._cells = {}
+            self._large = set()
+            for subscription in subscriptions:
+                self._add(Region(subscription))
+            self.built_at = time.monotonic()
+            self.synced_to = synced_to
+
+    def match(self, latitude, longitude, category):
+        """Regions containing the point whose category filter accepts category"""
+        cell = (math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size))
+        with self._lock:
+            candidates = self._cells.get(cell, set()) | self._large
+            return [
+                self._regions[subscription_id] for subscription_id in candidates
+                if self._regions[subscription_id].matches(latitude, longitude, category)
+            ]
+
+    def __len__(self):
+        return len(self._regions)
+
+def init_geofence(app):
+    """Attach an (empty) subscription index; it is loaded from the database on first use"""
+    app.extensions['geofence'] = SubscriptionIndex(
+        app.config['SUBSCRIPTION_CELL_DEGREES'], app.config['SUBSCRIPTION_MAX_CELLS']
+    )
+
+def subscription_index():
+    """The app's subscription index: built on first use, then kept current by polling for changes"""
+    index = current_app.extensions['geofence']
+    now = datetime.utcnow()
+    if index.built_at is None:
+        index.rebuild(AreaSubscription.query.filter_by(is_active=True).yield_per(5000), now)
+    elif time.monotonic() - index.built_at > current_app.config['SUBSCRIPTION_REFRESH_SECONDS']:
+        # Pick up subscriptions created or removed by other processes; the overlap covers rows
+        # whose transaction committed after our last poll (re-applying a row is harmless)
+        index.apply(AreaSubscription.query.filter(
+            AreaSubscription.updated_at >= index.synced_to - timedelta(seconds=30)
+        ).all())
+        index.built_at = time.monotonic()
+        index.synced_to = now
+    return index
+
+def match_subscribers(incident):
+    """Users (other than the reporter) with a subscription covering the incident"""
+    regions = subscription_index().match(float(incident.latitude), float(incident.longitude), incident.category)
+    return sorted({region.user_id for region in regions} - {incident.reported_by})
+
+def queue_area_alerts(incident, event):
+    """Hand matched subscribers to the job queue; delivery happens off the request path"""
+    user_ids = match_subscribers(incident)
+    if user_ids:
+        enqueue('area_alert', {
+            'incident_id': incident.id,
+            'title': incident.title,
+            'status': incident.status,
+            'event': event,
+            'user_ids': user_ids
+        })
+    return user_ids
+
+@job_handler('area_alert')
+def area_alert_job(payload):
+    """Job handler: fan an area alert out into each subscriber's notification digest"""
+    for user_id in payload['user_ids']:
+        enqueue('incident_notification', {
+            'user_id': user_id,
+            'incident_id': payload['incident_id'],
+            'title': payload['title'],
+            'status': payload['status'],
+            'event': payload['event']
+        }, batch_key=f'notify:{user_id}')
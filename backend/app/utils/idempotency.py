@@ -0,0 +1,118 @@
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, jsonify, current_app, make_response
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from app.models.idempotency import IdempotencyKey
+from app import db
+
+HEADER = 'Idempotency-Key'
+
+def _request_hash():
+    """Fingerprint of the request so a key cannot be reused for a different request"""
+    digest = hashlib.sha256()
+    for part in (request.method.encode(), request.path.encode(), request.get_data()):
+        digest.update(part)
+        digest.update(b'\0')
+    return digest.digest()
+
+def _claim(user_id, key, request_hash):
+    """Insert a pending record for the key; returns (claimed record, None) or (None, existing)"""
+    config = current_app.config
+    for _ in range(2):
+        now = datetime.utcnow()
+        record = IdempotencyKey(
+            user_id=user_id,
+            key=key,
+            request_hash=request_hash,
+            created_at=now,
+            expires_at=now + timedelta(seconds=config['IDEMPOTENCY_TTL_SECONDS'])
+        )
+        db.session.add(record)
+        try:
+            db.session.commit()
+            return record, None
+        except IntegrityError:
+            db.session.rollback()
+        
+        existing = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+        if existing is None:
+            continue
+        stale = existing.status == 'pending' and \
+            existing.created_at < now - timedelta(seconds=config['IDEMPOTENCY_LOCK_SECONDS'])
+        if existing.expires_at > now and not stale:
+            return None, existing
+        
+        # Expired, or abandoned by a crashed worker: only the request that deletes it retries
+        IdempotencyKey.query.filter_by(
+            id=existing.id, created_at=existing.created_at
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    return None, None
+
+def _replay(existing, request_hash):
+    """Response for a key that was already claimed"""
+    if existing is None or existing.status == 'pending':
+        response = jsonify({
+            'error': 'Request in progress',
+            'message': 'A request with this Idempotency-Key is still being processed'
+        })
+        response.status_code = 409
+        response.headers['Retry-After'] = '1'
+        return response
+    
+    if existing.request_hash != request_hash:
+        return jsonify({
+            'error': 'Idempotency key reused',
+            'message': 'This Idempotency-Key was already used for a different request'
+        }), 422
+    
+    response = current_app.response_class(
+        existing.response_body, status=existing.response_status, mimetype='application/json'
+    )
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def idempotent():
+    """Decorator storing a route's response per Idempotency-Key so retries replay it (use after jwt_required)"""
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return fn(*args, **kwargs)
+            if len(key) > 255:
+                return jsonify({
+                    'error': 'Invalid idempotency key',
+                    'message': f'{HEADER} must be at most 255 characters'
+                }), 400
+            
+            user_id = get_jwt_identity()
+            request_hash = _request_hash()
+            record, existing = _claim(user_id, key, request_hash)
+            if record is None:
+                return _replay(existing, request_hash)
+            record_id = record.id
+            
+            try:
+                response = make_response(fn(*args, **kwargs))
+            except Exception:
+                db.session.rollback()
+                IdempotencyKey.query.filter_by(id=record_id).delete(synchronize_session=False)
+                db.session.commit()
+                raise
+            
+            # Keep successful outcomes; release the key after errors so a corrected retry can run
+            if response.status_code < 400:
+                IdempotencyKey.query.filter_by(id=record_id).update({
+                    'status': 'done',
+                    'response_status': response.status_code,
+                    'response_body': response.get_data()
+                }, synchronize_session=False)
+            else:
+                IdempotencyKey.query.filter_by(id=record_id).delete(synchronize_session=False)
+            db.session.commit()
+            return response
+        return decorator
+    return wrapper
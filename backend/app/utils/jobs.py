@@ -0,0 +1,187 @@
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import or_, and_
+from app.models.job import Job
+from app import db
+
+# kind -> (handler, batched)
+_handlers = {}
+
+# name -> (task, config key holding its interval in seconds)
+_periodic = {}
+
+def job_handler(kind, batched=False):
+    """Register a job handler; batched handlers receive a list of payloads sharing a batch key"""
+    def wrapper(fn):
+        _handlers[kind] = (fn, batched)
+        return fn
+    return wrapper
+
+def periodic_task(name, interval_key):
+    """Register a task the worker runs every app.config[interval_key] seconds (SLA checks,
+    rollup refreshes, score decay); its module must be imported by create_app"""
+    def wrapper(fn):
+        _periodic[name] = (fn, interval_key)
+        return fn
+    return wrapper
+
+def enqueue(kind, payload, batch_key=None, delay=0, max_attempts=None):
+    """Add a job to the current session; it is queued when the caller commits"""
+    job = Job(
+        kind=kind,
+        payload=payload,
+        batch_key=batch_key,
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+        max_attempts=max_attempts or current_app.config['JOBS_MAX_ATTEMPTS']
+    )
+    db.session.add(job)
+    return job
+
+def _due_jobs(now, limit):
+    """Queued jobs that are due, plus running jobs whose worker appears to have died"""
+    stale = now - timedelta(seconds=current_app.config['JOBS_LOCK_TIMEOUT_SECONDS'])
+    return Job.query.filter(or_(
+        and_(Job.status == 'queued', Job.run_at <= now),
+        and_(Job.status == 'running', Job.locked_at < stale)
+    )).order_by(Job.run_at, Job.id).limit(limit).all()
+
+def _claim(jobs, now):
+    """Atomically mark jobs as running; returns only those this worker won"""
+    claimed = []
+    for job in jobs:
+        values = {'status': 'running', 'locked_at': now}
+        if job.status == 'running':
+            # Reclaiming from a worker that died mid-run counts as a failed attempt, so a job
+            # that kills its worker every time is dead-lettered instead of looping forever
+            values['attempts'] = job.attempts + 1
+            values['last_error'] = 'Worker stopped before the job finished'
+            if values['attempts'] >= job.max_attempts:
+                values.update(status='dead', finished_at=now, locked_at=None)
+        won = Job.query.filter(
+            Job.id == job.id,
+            Job.status == job.status,
+            Job.attempts == job.attempts,
+            Job.locked_at == job.locked_at
+        ).update(values, synchronize_session=False)
+        if won and values['status'] == 'running':
+            claimed.append(job.id)
+    db.session.commit()
+    return Job.query.filter(Job.id.in_(claimed)).order_by(Job.id).all() if claimed else []
+
+def _finish(jobs, error=None):
+    """Mark claimed jobs done, or schedule a retry with exponential backoff"""
+    now = datetime.utcnow()
+    for job in jobs:
+        if error is None:
+            job.status = 'done'
+            job.finished_at = now
+            job.last_error = None
+            continue
+
+        job.attempts += 1
+        job.last_error = error
+        if job.attempts >= job.max_attempts:
+            # Dead-lettered: kept for inspection and manual retry
+            job.status = 'dead'
+            job.finished_at = now
+        else:
+            backoff = current_app.config['JOBS_RETRY_BASE_SECONDS'] * 2 ** (job.attempts - 1)
+            job.status = 'queued'
+            job.run_at = now + timedelta(seconds=backoff)
+        job.locked_at = None
+    db.session.commit()
+
+def run_pending(limit=100):
+    """Run due jobs once and return how many were processed"""
+    now = datetime.utcnow()
+    jobs = _claim(_due_jobs(now, limit), now)
+
+    # Group batched kinds by batch key so e.g. one user's notifications become one email
+    groups = {}
+    for job in jobs:
+        handler, batched = _handlers.get(job.kind, (None, False))
+        key = (job.kind, job.batch_key) if batched and job.batch_key else (job.kind, job.id)
+        groups.setdefault(key, []).append(job)
+
+    for (kind, _), group in groups.items():
+        handler, batched = _handlers.get(kind, (None, False))
+        try:
+            if handler is None:
+                raise LookupError(f'No handler registered for job kind "{kind}"')
+            if batched:
+                handler([job.payload for job in group])
+            else:
+                handler(group[0].payload)
+        except Exception:
+            db.session.rollback()
+            _finish(group, traceback.format_exc(limit=5))
+        else:
+            _finish(group)
+
+    return len(jobs)
+
+def run_periodic(config, last_run):
+    """Run periodic tasks whose interval has elapsed; last_run maps task name -> monotonic time"""
+    now = time.monotonic()
+    for name, (task, interval_key) in _periodic.items():
+        if now - last_run.get(name, float('-inf')) < config[interval_key]:
+            continue
+        last_run[name] = now
+        try:
+            task()
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception('Periodic task %s failed', name)
+
+def retry_job(job):
+    """Requeue a dead job for immediate execution"""
+    job.status = 'queued'
+    job.attempts = 0
+    job.run_at = datetime.utcnow()
+    job.finished_at = None
+    job.locked_at = None
+    db.session.commit()
+
+def work(app, stop_event=None):
+    """Worker loop: poll for due jobs until stop_event is set"""
+    interval = app.config['JOBS_POLL_SECONDS']
+    last_run = {}
+    while not (stop_event and stop_event.is_set()):
+        with app.app_context():
+            try:
+                processed = run_pending()
+                run_periodic(app.config, last_run)
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('Job worker iteration failed')
+                processed = 0
+            finally:
+                db.session.remove()
+        if not processed:
+            if stop_event:
+                stop_event.wait(interval)
+            else:
+                time.sleep(interval)
+
+def start_worker_thread(app):
+    """Run the job worker on a daemon thread inside this process"""
+    stop_event = threading.Event()
+    thread = threading.Thread(target=work, args=(app, stop_event), name='job-worker', daemon=True)
+    thread.start()
+    app.extensions['job_worker'] = (thread, stop_event)
+    return thread
+
+def start_worker_on_first_request(app):
+    """Start the in-process worker when this process serves its first request: `flask run`,
+    gunicorn and uvicorn all do, while other CLI commands and the reloader's watcher never do"""
+    lock = threading.Lock()
+
+    @app.before_request
+    def start_job_worker():
+        if 'job_worker' not in app.extensions:
+            with lock:
+                if 'job_worker' not in app.extensions:
+                    start_worker_thread(app)
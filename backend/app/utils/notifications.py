@@ -0,0 +1,71 @@
+from flask import current_app
+from app.models.user import User
+from app.utils.jobs import enqueue, job_handler
+from app import db, get_mail
+
+EVENT_MESSAGES = {
+    'assigned': 'Incident #{incident_id} "{title}" has been assigned to you',
+    'resolved': 'Incident #{incident_id} "{title}" has been resolved',
+    'status_changed': 'Incident #{incident_id} "{title}" is now {status}',
+    'area_reported': 'New incident #{incident_id} "{title}" reported in your area',
+    'area_updated': 'Incident #{incident_id} "{title}" in your area is now {status}',
+    'sla_breached': 'Incident #{incident_id} "{title}" has passed its response deadline'
+}
+
+def notify_incident_event(incident, event, recipient_ids=None):
+    """Queue a notification about an incident for its reporter (or the given users)"""
+    if recipient_ids is None:
+        recipient_ids = [incident.reported_by]
+
+    for user_id in {user_id for user_id in recipient_ids if user_id}:
+        enqueue('incident_notification', {
+            'user_id': user_id,
+            'incident_id': incident.id,
+            'title': incident.title,
+            'status': incident.status,
+            'event': event
+        }, batch_key=f'notify:{user_id}')
+
+def notify_incident_changes(incident, previous_status, previous_assignee, actor_id=None):
+    """Queue notifications for status and assignment changes made by actor_id"""
+    if incident.status != previous_status:
+        event = 'resolved' if incident.status == 'resolved' else 'status_changed'
+        notify_incident_event(incident, event)
+    
+    if incident.assigned_to and incident.assigned_to != previous_assignee \
+            and str(incident.assigned_to) != str(actor_id):
+        notify_incident_event(incident, 'assigned', [incident.assigned_to])
+
+def send_email(recipients, subject, body):
+    """Send a plain-text email through Flask-Mail"""
+    from flask_mail import Message
+
+    message = Message(
+        subject=subject,
+        recipients=recipients,
+        body=body,
+        sender=current_app.config['MAIL_DEFAULT_SENDER']
+    )
+    get_mail().send(message)
+
+@job_handler('send_email')
+def send_email_job(payload):
+    """Job handler: send a single email"""
+    send_email(payload['recipients'], payload['subject'], payload['body'])
+
+@job_handler('incident_notification', batched=True)
+def incident_notification_job(payloads):
+    """Job handler: send one digest email for all of a user's pending incident notifications"""
+    user = db.session.get(User, payloads[0]['user_id'])
+    if not user or not user.is_active:
+        return
+
+    lines = [EVENT_MESSAGES[payload['event']].format(**payload) for payload in payloads]
+    if len(lines) == 1:
+        subject = lines[0]
+    else:
+        subject = f'{len(lines)} updates on your incidents'
+
+    send_email([user.email], subject, '\n'.join(
+        [f'Hello {user.first_name},', ''] + [f'- {line}' for line in lines]
+    ))
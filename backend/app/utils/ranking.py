@@ -0,0 +1,144 @@
+import math
+import sqlite3
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import bindparam, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from app.models.incident import Incident
+from app.utils.jobs import periodic_task
+from app import db
+
+PRIORITY_WEIGHTS = {'low': 1, 'medium': 2, 'high': 4, 'critical': 8}
+ACTIVE_STATUSES = ('open', 'in_progress')
+
+# Trending scores are anchored in time rather than decayed: log engagement plus the creation time
+# in half-lives, so scores written at different times compare directly and never need refreshing.
+# Orders exactly like engagement halved every half-life of age.
+EPOCH = datetime(1970, 1, 1)
+
+def score_params(created_at, now):
+    """The time-dependent terms of both scores, shared by the Python and SQL forms"""
+    half_lives = (created_at - EPOCH).total_seconds() / 3600 / current_app.config['TRENDING_HALF_LIFE_HOURS']
+    age_days = max((now - created_at).total_seconds() / 86400, 0)
+    return {
+        'trending_anchor': half_lives * math.log(2),
+        'urgency_growth': 1 + age_days / 7
+    }
+
+def trending_score(vote_count, priority, duplicate_reports, created_at, now):
+    """Log engagement (votes, priority, duplicate reports) plus creation time in half-lives"""
+    engagement = 1 + max(vote_count, 0) + PRIORITY_WEIGHTS.get(priority, 2) + 2 * duplicate_reports
+    return math.log(engagement) + score_params(created_at, now)['trending_anchor']
+
+def urgency_score(vote_count, priority, duplicate_reports, created_at, now):
+    """Priority first, then community signal, growing slowly while the incident waits"""
+    signal = max(vote_count, 0) + 3 * duplicate_reports
+    return PRIORITY_WEIGHTS.get(priority, 2) * 100 + signal * score_params(created_at, now)['urgency_growth']
+
+def score_sql(net_votes, trending_anchor=':trending_anchor', urgency_growth=':urgency_growth'):
+    """SET clauses recomputing both scores in the statement that changes an incident's vote
+    counters (so a vote costs one UPDATE); net_votes is SQL for the net count after the change.
+    Mirrors trending_score and urgency_score; the time terms bind the parameters from
+    score_params unless SQL computing them per row is passed"""
+    votes = f'CASE WHEN {net_votes} > 0 THEN {net_votes} ELSE 0 END'
+    weight = 'CASE priority {} ELSE 2 END'.format(
+        ' '.join(f"WHEN '{priority}' THEN {weight}" for priority, weight in PRIORITY_WEIGHTS.items())
+    )
+    active = 'status IN ({})'.format(', '.join(f"'{status}'" for status in ACTIVE_STATUSES))
+    duplicates = 'COALESCE(duplicate_reports, 0)'
+    return (
+        f'trending_score = CASE WHEN {active} '
+        f'THEN ln(1 + {votes} + {weight} + 2 * {duplicates}) + {trending_anchor} ELSE 0 END, '
+        f'urgency_score = CASE WHEN {active} '
+        f'THEN {weight} * 100 + ({votes} + 3 * {duplicates}) * {urgency_growth} ELSE 0 END'
+    )
+
+@event.listens_for(Engine, 'connect')
+def _sqlite_ln(dbapi_connection, connection_record):
+    """SQLite builds without the math functions have no ln()"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function('ln', 1, math.log, deterministic=True)
+
+def scores_for(incident, now=None):
+    """Trending and urgency scores for an incident (zero once it is resolved or closed)"""
+    if incident.status not in ACTIVE_STATUSES:
+        return 0.0, 0.0
+
+    now = now or datetime.utcnow()
+    args = (
+        (incident.upvotes or 0) - (incident.downvotes or 0),
+        incident.priority,
+        incident.duplicate_reports or 0,
+        incident.created_at or now,
+        now
+    )
+    return trending_score(*args), urgency_score(*args)
+
+def refresh_incident_scores(incident_id):
+    """Recompute one incident's scores after a change to its counters"""
+    incident = db.session.get(Incident, incident_id)
+    if incident:
+        incident.refresh_scores()
+        db.session.commit()
+
+def record_duplicate_report(incident_id, user_id):
+    """Count a near-duplicate report against the incident it duplicates, at most once per user
+    (so resubmitting the same report does not inflate the count); True if it was counted"""
+    from app.models.vote import DuplicateReport
+
+    db.session.add(DuplicateReport(incident_id=incident_id, user_id=user_id))
+    try:
+        Incident.query.filter_by(id=incident_id).update(
+            {'duplicate_reports': Incident.duplicate_reports + 1}, synchronize_session=False
+        )
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    refresh_incident_scores(incident_id)
+    return True
+
+def _epoch_seconds_sql(column):
+    """SQL for a timestamp as seconds since EPOCH"""
+    if db.engine.dialect.name == 'sqlite':
+        return f'(julianday({column}) - 2440587.5) * 86400'
+    return f'EXTRACT(EPOCH FROM {column})'
+
+@periodic_task('score_decay', 'SCORE_DECAY_SECONDS')
+def decay_scores(batch_size=1000):
+    """Recompute scores for every active incident (and zero newly closed ones) in batches of
+    ids, one UPDATE each with the time terms computed per row. Only urgency changes with age;
+    trending scores are rewritten unchanged, except those stored before they were time-anchored"""
+    now = datetime.utcnow()
+    created = _epoch_seconds_sql('COALESCE(created_at, :now)')
+    age_days = f'CASE WHEN :now_epoch > {created} THEN (:now_epoch - {created}) / 86400 ELSE 0 END'
+    scores = score_sql(
+        'COALESCE(upvotes, 0) - COALESCE(downvotes, 0)',
+        trending_anchor=f'{created} / 3600 / :half_life_hours * {math.log(2)!r}',
+        urgency_growth=f'(1 + ({age_days}) / 7.0)'
+    )
+    scored = db.or_(Incident.status.in_(ACTIVE_STATUSES), Incident.trending_score > 0)
+    # Rescoring is not a change clients care about: keep updated_at so delta sync skips it
+    rescore = text(f"""
+        UPDATE incidents SET {scores}
+        WHERE id > :last_id AND id <= :upto AND (status IN :active OR trending_score > 0)
+    """).bindparams(bindparam('active', expanding=True))
+    params = {
+        'active': list(ACTIVE_STATUSES),
+        'now': now,
+        'now_epoch': (now - EPOCH).total_seconds(),
+        'half_life_hours': current_app.config['TRENDING_HALF_LIFE_HOURS']
+    }
+    processed = 0
+    last_id = 0
+    while True:
+        batch = db.session.query(Incident.id).filter(Incident.id > last_id, scored) \
+            .order_by(Incident.id).limit(batch_size).subquery()
+        upto = db.session.query(db.func.max(batch.c.id)).scalar()
+        if upto is None:
+            break
+        processed += db.session.execute(rescore, dict(params, last_id=last_id, upto=upto)).rowcount
+        db.session.commit()
+        last_id = upto
+    return processed
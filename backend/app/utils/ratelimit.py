@@ -0,0 +1,208 @@
+import math
+import threading
+import time
+from flask import request, jsonify, current_app
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Atomic token bucket shared by every worker: refill, take one token, report what is left
+_REDIS_TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - ts, 0) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+def parse_budget(budget):
+    """Parse '10/minute' into (capacity, tokens refilled per second)"""
+    count, period = budget.split('/')
+    count = int(count)
+    return count, count / PERIODS[period.strip()]
+
+class MemoryBackend:
+    """Per-process token buckets. A bucket that has refilled to capacity is the same as a
+    missing one, so those are swept out every sweep_seconds to keep memory bounded by the
+    clients seen recently rather than every client ever seen"""
+
+    def __init__(self, sweep_seconds=60):
+        self.sweep_seconds = sweep_seconds
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._swept = None
+
+    def take(self, key, capacity, rate, now):
+        with self._lock:
+            tokens, ts, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + max(now - ts, 0) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if self._swept is None or now - self._swept >= self.sweep_seconds:
+                self._sweep(now)
+            return allowed, tokens
+
+    def _sweep(self, now):
+        self._swept = now
+        for key in [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+            del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+class RedisBackend:
+    """Token buckets in Redis so all workers share one budget"""
+
+    def __init__(self, url):
+        import redis
+        self._client = redis.Redis.from_url(url, socket_timeout=0.05)
+        self._script = self._client.register_script(_REDIS_TOKEN_BUCKET)
+
+    def take(self, key, capacity, rate, now):
+        allowed, tokens = self._script(keys=[f'ratelimit:{key}'], args=[capacity, rate, now])
+        return bool(allowed), float(tokens)
+
+# When the current thread last asked its session for a connection (read by the pool checkout hook)
+_connection_requested = threading.local()
+
+@event.listens_for(Session, 'do_orm_execute')
+def _mark_connection_request(orm_execute_state):
+    _connection_requested.at = time.perf_counter()
+
+class PoolWaitMonitor:
+    """Average of how long requests wait for a pooled DB connection, decaying while no
+    checkouts are measured (so shedding stops once traffic, and the samples, fall away)"""
+
+    def __init__(self, alpha=0.2, half_life=5.0):
+        self.alpha = alpha
+        self.half_life = half_life
+        self.average = 0.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._pools = set()
+
+    def install(self, engine):
+        pool = engine.pool
+        if id(pool) in self._pools:
+            return
+        self._pools.add(id(pool))
+        event.listen(pool, 'checkout', self._checked_out)
+        event.listen(pool, 'checkin', self._checked_in)
+
+    def _checked_out(self, dbapi_connection, connection_record, connection_proxy):
+        requested = getattr(_connection_requested, 'at', None)
+        if requested is not None:
+            _connection_requested.at = None
+            self.record(time.perf_counter() - requested)
+
+    def _checked_in(self, dbapi_connection, connection_record):
+        # Statements run on a connection the session already held leave a mark with no checkout
+        _connection_requested.at = None
+
+    def current(self):
+        """The average decayed by the time since it was last updated"""
+        with self._lock:
+            now = time.monotonic()
+            self.average *= 0.5 ** ((now - self.updated) / self.half_life)
+            self.updated = now
+            return self.average
+
+    def record(self, seconds):
+        average = self.current()
+        with self._lock:
+            self.average = average + self.alpha * (seconds - average)
+
+    def should_shed(self, threshold_ms):
+        return self.current() * 1000 > threshold_ms
+
+class RateLimiter:
+    """Per-user/per-IP token-bucket rate limiting and adaptive load shedding"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        url = app.config.get('RATELIMIT_STORAGE_URL')
+        state = {
+            'memory': MemoryBackend(),
+            'shared': RedisBackend(url) if url else None,
+            'pool_wait': PoolWaitMonitor(half_life=app.config['LOAD_SHED_DECAY_SECONDS'])
+        }
+        app.extensions['ratelimit'] = state
+        app.before_request(self._before_request)
+
+    def _identity(self):
+        """user:<id> for authenticated requests, ip:<address> otherwise; the address is the peer
+        as rewritten by ProxyFix for PROXY_FIX_HOPS trusted proxies, never a client-supplied header"""
+        try:
+            verify_jwt_in_request(optional=True)
+            user_id = get_jwt_identity()
+        except Exception:
+            user_id = None
+        if user_id is not None:
+            return f'user:{user_id}'
+        return f'ip:{request.remote_addr}'
+
+    def _take(self, state, key, capacity, rate):
+        now = time.time()
+        if state['shared'] is not None:
+            try:
+                return state['shared'].take(key, capacity, rate, now)
+            except Exception:
+                # Shared store unavailable: keep limiting per process rather than failing open
+                current_app.logger.warning('Rate limit store unavailable, using in-memory buckets')
+        return state['memory'].take(key, capacity, rate, now)
+
+    def _before_request(self):
+        config = current_app.config
+        if not config['RATELIMIT_ENABLED'] or request.method == 'OPTIONS' or not request.endpoint:
+            return None
+        if request.endpoint in config['RATELIMIT_EXEMPT']:
+            return None
+
+        state = current_app.extensions['ratelimit']
+        identity = self._identity()
+
+        # Shed low-priority anonymous traffic first when the database is saturated
+        from app import db
+        state['pool_wait'].install(db.engine)
+        if identity.startswith('ip:') and request.endpoint in config['LOAD_SHED_ENDPOINTS'] \
+                and state['pool_wait'].should_shed(config['LOAD_SHED_POOL_WAIT_MS']):
+            response = jsonify({
+                'error': 'Service busy',
+                'message': 'The service is under heavy load, please retry shortly'
+            })
+            response.status_code = 503
+            response.headers['Retry-After'] = str(config['LOAD_SHED_RETRY_AFTER'])
+            return response
+
+        budget = config['RATELIMIT_BUDGETS'].get(request.endpoint, config['RATELIMIT_DEFAULT'])
+        capacity, rate = parse_budget(budget)
+        allowed, tokens = self._take(state, f'{request.endpoint}:{identity}', capacity, rate)
+        if allowed:
+            return None
+
+        response = jsonify({
+            'error': 'Too many requests',
+            'message': f'Rate limit of {budget} exceeded'
+        })
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, math.ceil((1 - tokens) / rate)))
+        return response
+
+limiter = RateLimiter()
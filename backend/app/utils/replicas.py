@@ -0,0 +1,80 @@
+import random
+import time
+from functools import wraps
+from flask import g, current_app, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, text
+from sqlalchemy.sql import Select
+
+REPLICA_PREFIX = 'replica_'
+
+def init_replicas(app):
+    """Create an engine per configured read replica, kept beside (not in) the SQLAlchemy binds"""
+    options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    app.extensions['replicas'] = {
+        f'{REPLICA_PREFIX}{index}': create_engine(uri, **options)
+        for index, uri in enumerate(app.config['SQLALCHEMY_REPLICA_URIS'])
+    }
+
+def use_replica():
+    """Decorator routing a read-only route's SELECTs to a read replica when one is healthy"""
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            g.use_replica = True
+            return fn(*args, **kwargs)
+        return decorator
+    return wrapper
+
+def _replica_lag(engine):
+    """Replication lag in seconds (0 for databases without a replay position)"""
+    with engine.connect() as connection:
+        if engine.dialect.name != 'postgresql':
+            connection.execute(text('SELECT 1'))
+            return 0.0
+        return float(connection.execute(text(
+            'SELECT CASE WHEN pg_is_in_recovery() '
+            'THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) '
+            'ELSE 0 END'
+        )).scalar())
+
+def healthy_replicas(engines):
+    """Replica names whose (cached) lag is within REPLICA_MAX_LAG_SECONDS"""
+    config = current_app.config
+    cache = current_app.extensions.setdefault('replica_lag', {})
+    now = time.monotonic()
+
+    healthy = []
+    for name, engine in engines.items():
+        checked_at, lag = cache.get(name, (None, None))
+        if checked_at is None or now - checked_at > config['REPLICA_LAG_CHECK_SECONDS']:
+            try:
+                lag = _replica_lag(engine)
+            except Exception:
+                current_app.logger.warning('Read replica %s is unreachable', name)
+                lag = float('inf')
+            cache[name] = (now, lag)
+        if lag <= config['REPLICA_MAX_LAG_SECONDS']:
+            healthy.append(name)
+    return healthy
+
+class RoutingSession(Session):
+    """Session sending plain SELECTs of replica-routed requests to a read replica.
+
+    Anything else (flushes, UPDATE/DELETE, SELECT ... FOR UPDATE, raw SQL) goes to the
+    primary and pins the rest of the request there, so reads after a write see it.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engines = current_app.extensions.get('replicas') if has_app_context() else None
+        if bind is None and engines and g.get('use_replica'):
+            is_read = isinstance(clause, Select) and clause._for_update_arg is None
+            if not is_read:
+                g.use_replica = False
+            else:
+                if 'replica_bind' not in g:
+                    replicas = healthy_replicas(engines)
+                    g.replica_bind = random.choice(replicas) if replicas else None
+                if g.replica_bind is not None:
+                    return engines[g.replica_bind]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
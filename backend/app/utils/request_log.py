@@ -0,0 +1,165 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import secrets
+import sys
+import time
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+from flask import g, has_request_context, request, got_request_exception
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+REQUEST_LOGGER = 'velomanage.requests'
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: request records carry their fields in record.request"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name
+        }
+        entry.update(getattr(record, 'request', None) or {'message': record.getMessage()})
+        if getattr(record, 'traceback', None):
+            entry['traceback'] = record.traceback
+        if getattr(record, 'dropped', 0):
+            entry['dropped_records'] = record.dropped
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue handler for request threads: drops records when the queue is full instead of waiting,
+    and keeps tracebacks as their own field (exc_info cannot cross to the writer thread)"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.traceback = ''.join(traceback.format_exception(*record.exc_info))
+        record.exc_info = None
+        record.exc_text = None
+        record.dropped, self.dropped = self.dropped, 0
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += record.dropped + 1
+
+def _target_handler(path):
+    """Where the writer thread sends lines: a file that logrotate may move, or stdout"""
+    handler = WatchedFileHandler(path) if path else logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+def record_exception(error):
+    """Attach an exception a route handled itself to the current request's log line"""
+    if has_request_context():
+        g.request_log_error = error
+
+def _user_id():
+    try:
+        from flask_jwt_extended import get_jwt_identity
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+def _sampled(config, endpoint, status, latency_ms):
+    """Errors and slow requests are always logged; the rest at the endpoint's sample rate"""
+    if status >= 500 or latency_ms >= config['REQUEST_LOG_SLOW_MS'] or 'request_log_error' in g:
+        return True
+    rate = config['REQUEST_LOG_SAMPLE_RATES'].get(endpoint, config['REQUEST_LOG_SAMPLE_RATE'])
+    return rate >= 1 or random.random() < rate
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'request_log_start' in g:
+        g.request_log_sql += 1
+
+def _install(logger, handler):
+    """Add a queue handler, replacing one left by an earlier app in this process (tests, reloader)"""
+    for existing in [existing for existing in logger.handlers if isinstance(existing, NonBlockingQueueHandler)]:
+        logger.removeHandler(existing)
+    logger.addHandler(handler)
+
+def stop_request_logging(app):
+    """Write out queued records and stop the writer thread"""
+    listener = app.extensions.pop('request_log', None)
+    if listener is not None:
+        listener.stop()
+
+def init_request_logging(app):
+    """Log one JSON line per request through a queue drained by a background thread"""
+    if not app.config['REQUEST_LOG_ENABLED']:
+        return
+
+    log_queue = queue.Queue(app.config['REQUEST_LOG_QUEUE_SIZE'])
+    handler = NonBlockingQueueHandler(log_queue)
+    listener = QueueListener(log_queue, _target_handler(app.config['REQUEST_LOG_PATH']))
+    listener.start()
+    app.extensions['request_log'] = listener
+    atexit.register(stop_request_logging, app)
+
+    logger = logging.getLogger(REQUEST_LOGGER)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    _install(logger, handler)
+
+    # The app's own log calls go through the same queue instead of writing to stderr inline
+    from flask.logging import default_handler
+    app.logger.removeHandler(default_handler)
+    _install(app.logger, handler)
+
+    @app.before_request
+    def start_request_log():
+        g.request_log_start = time.perf_counter()
+        g.request_log_sql = 0
+        g.request_id = request.headers.get('X-Request-ID') or secrets.token_hex(8)
+
+    @app.after_request
+    def write_request_log(response):
+        if 'request_log_start' not in g:
+            return response
+        latency_ms = (time.perf_counter() - g.request_log_start) * 1000
+        response.headers['X-Request-ID'] = g.request_id
+        endpoint = request.endpoint
+        if not _sampled(app.config, endpoint, response.status_code, latency_ms):
+            return response
+
+        entry = {
+            'request_id': g.request_id,
+            'method': request.method,
+            'path': request.path,
+            'route': request.url_rule.rule if request.url_rule else None,
+            'endpoint': endpoint,
+            'status': response.status_code,
+            'latency_ms': round(latency_ms, 2),
+            'user_id': _user_id(),
+            'sql_count': g.request_log_sql
+        }
+        error = g.get('request_log_error')
+        if error is not None:
+            entry['error'] = {
+                'type': type(error).__name__,
+                'message': str(error),
+                'traceback': ''.join(traceback.format_exception(type(error), error, error.__traceback__))
+            }
+        level = logging.ERROR if response.status_code >= 500 else logging.INFO
+        logger.log(level, 'request', extra={'request': entry})
+        return response
+
+    def unhandled(sender, exception, **extra):
+        record_exception(exception)
+
+    got_request_exception.connect(unhandled, app, weak=False)
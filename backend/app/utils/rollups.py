@@ -0,0 +1,102 @@
+from datetime import datetime, time, timedelta
+from sqlalchemy import case, func
+from app.models.incident import Incident
+from app.models.archive import ArchivedIncident
+from app.models.rollup import IncidentDailyRollup, RollupDirtyDay
+from app.utils.jobs import periodic_task
+from app import db
+
+DIMENSIONS = ('city', 'category', 'priority', 'status')
+
+def _seconds_between(start, end):
+    """Portable SQL expression for the number of seconds from start to end"""
+    if db.engine.dialect.name == 'sqlite':
+        return (func.julianday(end) - func.julianday(start)) * 86400
+    return func.extract('epoch', end - start)
+
+def recompute_day(day):
+    """Rebuild every rollup row for a single day from the live and archived incidents"""
+    start = datetime.combine(day, time.min)
+    end = start + timedelta(days=1)
+
+    rows = {}
+    for model in (Incident, ArchivedIncident):
+        dimensions = (
+            func.coalesce(model.city, '').label('city'),
+            model.category,
+            model.priority,
+            model.status
+        )
+
+        is_resolved = model.resolved_at.isnot(None)
+        created = db.session.query(
+            *dimensions,
+            func.count(model.id),
+            func.sum(case((is_resolved, 1), else_=0)),
+            # Whole days per incident, as the summary report has always averaged them
+            func.sum(case((is_resolved, func.floor(_seconds_between(model.created_at, model.resolved_at) / 86400)),
+                          else_=0))
+        ).filter(
+            model.created_at >= start, model.created_at < end
+        ).group_by(*dimensions).all()
+        for city, category, priority, status, count, resolved, days in created:
+            row = rows.setdefault((city, category, priority, status), {})
+            row['created_count'] = row.get('created_count', 0) + count
+            row['resolved_count'] = row.get('resolved_count', 0) + int(resolved or 0)
+            row['resolution_days'] = row.get('resolution_days', 0) + int(days or 0)
+
+    IncidentDailyRollup.query.filter_by(day=day).delete(synchronize_session=False)
+    refreshed_at = datetime.utcnow()
+    db.session.bulk_insert_mappings(IncidentDailyRollup, [
+        dict(
+            zip(DIMENSIONS, key),
+            day=day,
+            created_count=values.get('created_count', 0),
+            resolved_count=values.get('resolved_count', 0),
+            resolution_days=values.get('resolution_days', 0),
+            refreshed_at=refreshed_at
+        )
+        for key, values in rows.items()
+    ])
+
+def _all_days():
+    """Every day that has incidents (live or archived) created or resolved, or existing rollups"""
+    days = set()
+    columns = (Incident.created_at, Incident.resolved_at,
+               ArchivedIncident.created_at, ArchivedIncident.resolved_at)
+    for column in columns:
+        days.update(
+            value for value, in db.session.query(func.date(column)).filter(column.isnot(None)).distinct()
+        )
+    days = {datetime.strptime(day, '%Y-%m-%d').date() if isinstance(day, str) else day for day in days}
+    days.update(day for day, in db.session.query(IncidentDailyRollup.day).distinct())
+    return days
+
+@periodic_task('rollups', 'ROLLUP_REFRESH_SECONDS')
+def refresh_rollups(full=False):
+    """Recompute rollups for dirty days (or every day when full) and return the days processed"""
+    high_water = db.session.query(func.max(RollupDirtyDay.id)).scalar()
+
+    if full:
+        days = _all_days()
+    elif high_water is None:
+        return []
+    else:
+        days = {
+            day for day, in db.session.query(RollupDirtyDay.day).filter(
+                RollupDirtyDay.id <= high_water
+            ).distinct()
+        }
+
+    processed = []
+    for day in sorted(days):
+        recompute_day(day)
+        processed.append(day)
+        # Commit per day so a long backfill makes progress and keeps transactions short
+        db.session.commit()
+
+    # Only clear marks we have seen; days dirtied during the refresh stay queued
+    if high_water is not None:
+        RollupDirtyDay.query.filter(RollupDirtyDay.id <= high_water).delete(synchronize_session=False)
+        db.session.commit()
+    return processed
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, func, text
+from app.models.incident import Incident, SLA_PENDING, SLA_BREACHED
+from app.models.user import User
+from app.utils.jobs import periodic_task
+from app.utils.notifications import notify_incident_event
+from app import db
+
+def sla_due_at(priority, reported_at):
+    """Response deadline for an incident of the given priority reported at reported_at"""
+    hours = current_app.config['SLA_TARGET_HOURS'].get(priority)
+    return reported_at + timedelta(hours=hours) if hours else None
+
+@event.listens_for(Incident, 'before_insert')
+def _set_due_at(mapper, connection, target):
+    if target.due_at is None:
+        target.due_at = sla_due_at(target.priority or 'medium', target.created_at or datetime.utcnow())
+
+@event.listens_for(Incident, 'before_update')
+def _reset_due_at(mapper, connection, target):
+    if not db.inspect(target).attrs.priority.history.has_changes():
+        return
+    # Targets run from the report time; a breach against the old target no longer counts
+    # once the new deadline is still ahead
+    target.due_at = sla_due_at(target.priority, target.created_at or datetime.utcnow())
+    if target.due_at and target.due_at > datetime.utcnow():
+        target.sla_breached_at = None
+
+def _breach_recipients(incident):
+    if incident.assigned_to:
+        return [incident.assigned_to]
+    return [admin_id for admin_id, in db.session.query(User.id).filter_by(role='admin', is_active=True)]
+
+@periodic_task('sla_breaches', 'SLA_CHECK_SECONDS')
+def check_breaches(now=None, limit=500):
+    """Mark active incidents whose deadline has passed as breached and notify; returns their ids.
+
+    A range scan of the pending-SLA partial index finds them. Each one is claimed with a
+    conditional update, so concurrent workers never report the same breach twice.
+    """
+    now = now or datetime.utcnow()
+    due = db.session.query(Incident.id).filter(
+        text(SLA_PENDING), Incident.due_at <= now
+    ).order_by(Incident.due_at).limit(limit).all()
+
+    breached = []
+    for incident_id, in due:
+        won = Incident.query.filter(
+            Incident.id == incident_id, Incident.sla_breached_at.is_(None)
+        ).update({'sla_breached_at': now}, synchronize_session=False)
+        if won:
+            breached.append(incident_id)
+
+    for incident in Incident.query.filter(Incident.id.in_(breached)).all() if breached else []:
+        current_app.logger.warning('Incident %s breached its %s SLA (due %s)',
+                                   incident.id, incident.priority, incident.due_at.isoformat())
+        notify_incident_event(incident, 'sla_breached', _breach_recipients(incident))
+    db.session.commit()
+    return breached
+
+def sla_summary(now=None):
+    """Dashboard counts from the SLA partial indexes: open breaches by priority and deadlines due soon"""
+    now = now or datetime.utcnow()
+    breached = dict(db.session.query(Incident.priority, func.count()).filter(
+        text(SLA_BREACHED)
+    ).group_by(Incident.priority).all())
+    due_soon = db.session.query(func.count()).select_from(Incident).filter(
+        text(SLA_PENDING),
+        Incident.due_at <= now + timedelta(hours=current_app.config['SLA_DUE_SOON_HOURS'])
+    ).scalar()
+    return {
+        'breached': sum(breached.values()),
+        'breached_by_priority': breached,
+        'due_soon': due_soon
+    }
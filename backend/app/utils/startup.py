@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def _run_fresh(code, *args):
+    """Run code in a fresh interpreter from the backend directory, as a worker would start"""
+    env = dict(os.environ)
+    # Profile worker startup, not the CLI (which also loads Flask-Migrate)
+    env.pop('FLASK_RUN_FROM_CLI', None)
+    return subprocess.run(
+        [sys.executable, *args, '-c', code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+
+def measure_startup(config_name='production'):
+    """Seconds spent importing the app package and running create_app in a fresh interpreter"""
+    result = _run_fresh(
+        'import time; start = time.perf_counter(); '
+        'from app import create_app; '
+        f'create_app({config_name!r}); '
+        'print(time.perf_counter() - start)'
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+def profile_imports(config_name='production'):
+    """Import-time profile of create_app as (module, self_us, cumulative_us, depth) tuples"""
+    result = _run_fresh(f'from app import create_app; create_app({config_name!r})', '-X', 'importtime')
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
@@ -0,0 +1,81 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, or_, and_
+from app.models.incident import Incident
+from app.models.tombstone import IncidentTombstone
+from app import db
+
+class WatermarkError(ValueError):
+    """Watermark that cannot be parsed"""
+
+class WatermarkExpired(WatermarkError):
+    """Watermark older than the tombstone retention; the client must resync from scratch"""
+
+def encode_watermark(incidents, tombstones):
+    """Opaque watermark from the (timestamp, id) position reached in each stream"""
+    state = {
+        'i': [incidents[0].isoformat(), incidents[1]],
+        't': [tombstones[0].isoformat(), tombstones[1]]
+    }
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def decode_watermark(watermark):
+    """(incident position, tombstone position) from a watermark; (None, None) for a first sync"""
+    if not watermark:
+        return None, None
+    try:
+        padded = watermark + '=' * (-len(watermark) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return tuple(
+            (datetime.fromisoformat(state[key][0]), int(state[key][1])) for key in ('i', 't')
+        )
+    except (ValueError, TypeError, KeyError, IndexError):
+        raise WatermarkError('Invalid watermark')
+
+def _after(timestamp_column, id_column, position):
+    """Keyset condition: strictly after (timestamp, id)"""
+    timestamp, last_id = position
+    return or_(timestamp_column > timestamp, and_(timestamp_column == timestamp, id_column > last_id))
+
+def changes_since(watermark, fields, limit):
+    """Incidents changed and removed after the watermark, in (timestamp, id) order.
+
+    Rows newer than SYNC_SETTLE_SECONDS are held back until the next call, so a transaction
+    that commits after a later one with an earlier updated_at is still delivered.
+    """
+    config = current_app.config
+    incident_position, tombstone_position = decode_watermark(watermark)
+    now = datetime.utcnow()
+    if tombstone_position and tombstone_position[0] < now - timedelta(days=config['SYNC_TOMBSTONE_DAYS']):
+        raise WatermarkExpired('Watermark is older than the deletion log; resync from scratch')
+    bound = now - timedelta(seconds=config['SYNC_SETTLE_SECONDS'])
+    
+    statement = select(Incident).options(*Incident.load_options(tuple(fields) + ('updated_at',))).where(
+        Incident.updated_at < bound
+    )
+    if incident_position:
+        statement = statement.where(_after(Incident.updated_at, Incident.id, incident_position))
+    incidents = db.session.scalars(statement.order_by(Incident.updated_at, Incident.id).limit(limit)).all()
+    
+    # A first sync is a snapshot of live incidents; earlier deletions are irrelevant to it
+    tombstones = []
+    if tombstone_position:
+        statement = select(IncidentTombstone).where(
+            IncidentTombstone.removed_at < bound,
+            _after(IncidentTombstone.removed_at, IncidentTombstone.id, tombstone_position)
+        ).order_by(IncidentTombstone.removed_at, IncidentTombstone.id).limit(limit)
+        tombstones = db.session.scalars(statement).all()
+    
+    # A short batch means everything before the bound has been seen, so the watermark can move
+    # up to it; this keeps watermarks fresh when nothing changes (and within tombstone retention)
+    incident_position = (incidents[-1].updated_at, incidents[-1].id) if len(incidents) == limit else (bound, 0)
+    tombstone_position = (tombstones[-1].removed_at, tombstones[-1].id) if len(tombstones) == limit else (bound, 0)
+    
+    return {
+        'incidents': [incident.to_dict(fields) for incident in incidents],
+        'deleted': [tombstone.to_dict() for tombstone in tombstones],
+        'watermark': encode_watermark(incident_position, tombstone_position),
+        'has_more': len(incidents) == limit or len(tombstones) == limit
+    }
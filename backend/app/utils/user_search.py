@@ -0,0 +1,97 @@
+import base64
+import json
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.schema import CreateIndex
+from app.models.incident import Incident
+from app.models.user import User, SEARCH_COLUMNS, SEARCH_INDEXES
+from app import db
+
+# Words of a search beyond this are ignored, which bounds the size of the generated query
+MAX_SEARCH_TERMS = 4
+
+class CursorError(ValueError):
+    """Pagination cursor that cannot be parsed"""
+
+def encode_cursor(last_id):
+    """Opaque cursor for the page after the user with this id"""
+    return base64.urlsafe_b64encode(json.dumps({'u': last_id}).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Id of the last user already returned; 0 for the first page"""
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded.encode()))['u'])
+    except (ValueError, TypeError, KeyError):
+        raise CursorError('Invalid cursor')
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def _term_condition(term, dialect):
+    """A user matches a search term when any searchable field does"""
+    expressions = [expression for _, expression in SEARCH_COLUMNS]
+    if dialect == 'postgresql':
+        # Trigram indexes serve both; terms under three letters only have prefix trigrams to use
+        pattern = _escape_like(term) + '%'
+        if len(term) >= 3:
+            pattern = '%' + pattern
+        return or_(*(expression.like(pattern, escape='\\') for expression in expressions))
+
+    # Elsewhere a half-open range on the lower-cased expression indexes matches the prefix
+    upper = term[:-1] + chr(min(ord(term[-1]) + 1, 0x10FFFF))
+    return or_(*(and_(expression >= term, expression < upper) for expression in expressions))
+
+def search_users(search=None, role=None, is_active=None, after_id=0, limit=20):
+    """A page of users ordered by id, and the cursor for the next page (None on the last page).
+
+    Every word of `search` must match the start of the username, email, first or last
+    name (anywhere in them on PostgreSQL), so "jane do" finds Jane Doe.
+    """
+    dialect = db.session.get_bind().dialect.name
+    terms = (search or '').lower().split()[:MAX_SEARCH_TERMS]
+
+    # With search terms, SQLite would otherwise walk the primary key from the cursor and check
+    # every row; "id + 0" hides that range so it reads the search indexes and sorts the few matches
+    position = User.id + 0 if terms and dialect == 'sqlite' else User.id
+    query = User.query.filter(position > after_id)
+    if role:
+        query = query.filter(User.role == role)
+    if is_active is not None:
+        query = query.filter(User.is_active == is_active)
+    for term in terms:
+        query = query.filter(_term_condition(term, dialect))
+
+    users = query.order_by(User.id).limit(limit + 1).all()
+    next_cursor = encode_cursor(users[limit - 1].id) if len(users) > limit else None
+    return users[:limit], next_cursor
+
+def incident_counts(user_ids):
+    """Incidents reported by each user, in one grouped query over the reporter index"""
+    if not user_ids:
+        return {}
+    rows = db.session.query(
+        Incident.reported_by,
+        func.count(),
+        func.sum(case((Incident.status.in_(('open', 'in_progress')), 1), else_=0)),
+        func.sum(case((Incident.status.in_(('resolved', 'closed')), 1), else_=0))
+    ).filter(Incident.reported_by.in_(user_ids)).group_by(Incident.reported_by).all()
+    counts = {
+        user_id: {'reported': total, 'active': int(active or 0), 'resolved': int(resolved or 0)}
+        for user_id, total, active, resolved in rows
+    }
+    return {user_id: counts.get(user_id, {'reported': 0, 'active': 0, 'resolved': 0}) for user_id in user_ids}
+
+def create_search_indexes():
+    """Create the search and incident count indexes on a database that predates them"""
+    # IF NOT EXISTS rather than checkfirst: SQLAlchemy cannot reflect expression indexes
+    with db.engine.begin() as connection:
+        dialect = connection.dialect.name
+        if dialect == 'postgresql':
+            connection.execute(db.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        indexes = SEARCH_INDEXES.get(dialect, []) + [
+            index for index in Incident.__table__.indexes if index.name == 'ix_incidents_reporter_status'
+        ]
+        for index in indexes:
+            connection.execute(CreateIndex(index, if_not_exists=True))
@@ -0,0 +1,11 @@
+import os
+from dotenv import load_dotenv
+from app import create_app
+from app.asgi import create_asgi_app
+
+# Load environment variables
+load_dotenv()
+
+# ASGI entry point: uvicorn asgi:app (see README "ASGI mode")
+flask_app = create_app(os.getenv('FLASK_ENV', 'development'))
+app = create_asgi_app(flask_app)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark: gunicorn sync workers (WSGI) vs uvicorn (ASGI mode)
+
+Starts each server on a seeded database, optionally ties up connections with slow
+clients that trickle their request headers, then measures requests/second and
+latency percentiles for read-only endpoints at the given concurrency.
+
+    python scripts/bench_asgi.py --concurrency 200 --slow-clients 50 --duration 10
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def seed(database_url, incidents):
+    """Create the schema and sample incidents"""
+    os.environ['DATABASE_URL'] = database_url
+    from app import create_app, db
+    from app.models.user import User
+    from app.models.incident import Incident
+    
+    app = create_app('production')
+    with app.app_context():
+        db.create_all()
+        if Incident.query.count() >= incidents:
+            return
+        user = User(username='bench', email='bench@example.com', first_name='Bench', last_name='User')
+        user.set_password('bench-password')
+        db.session.add(user)
+        db.session.flush()
+        db.session.bulk_insert_mappings(Incident, [
+            {
+                'title': f'Benchmark incident {i}',
+                'description': 'Seeded by scripts/bench_asgi.py',
+                'category': ('infrastructure', 'safety', 'traffic')[i % 3],
+                'status': ('open', 'in_progress', 'resolved')[i % 3],
+                'priority': 'medium',
+                'latitude': -1.2921 + (i % 100) * 0.001,
+                'longitude': 36.8219 + (i // 100) * 0.001,
+                'reported_by': user.id,
+                'upvotes': 0,
+                'downvotes': 0,
+                'duplicate_reports': 0,
+                'trending_score': 0,
+                'urgency_score': 0
+            }
+            for i in range(incidents)
+        ])
+        db.session.commit()
+
+async def fetch(host, port, path):
+    """One GET over a fresh connection; returns the status code"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n'.encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+async def slow_client(host, port, stop):
+    """Hold a connection open by sending request headers one byte at a time"""
+    while not stop.is_set():
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            for byte in f'GET /health HTTP/1.1\r\nHost: {host}\r\nX-Slow: {"x" * 200}\r\n\r\n'.encode():
+                if stop.is_set():
+                    break
+                writer.write(bytes([byte]))
+                await writer.drain()
+                await asyncio.sleep(0.05)
+            writer.close()
+        except OSError:
+            await asyncio.sleep(0.1)
+
+async def load(host, port, paths, concurrency, duration, slow_clients):
+    """Run concurrent workers for duration seconds; returns latencies and error count"""
+    stop = asyncio.Event()
+    slow = [asyncio.create_task(slow_client(host, port, stop)) for _ in range(slow_clients)]
+    await asyncio.sleep(1 if slow_clients else 0)
+    
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    
+    async def worker(index):
+        nonlocal errors
+        request_number = index
+        while time.perf_counter() < deadline:
+            path = paths[request_number % len(paths)]
+            request_number += 1
+            start = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(fetch(host, port, path), timeout=30)
+                if status != 200:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - start)
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                errors += 1
+    
+    await asyncio.gather(*[worker(index) for index in range(concurrency)])
+    stop.set()
+    await asyncio.gather(*slow, return_exceptions=True)
+    return latencies, errors
+
+def wait_until_up(host, port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if asyncio.run(fetch(host, port, '/health')) == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server on port {port} did not start')
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] * 1000 if ordered else float('nan')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='Database to benchmark against (default: a temporary SQLite file)')
+    parser.add_argument('--incidents', type=int, default=5000, help='Incidents to seed')
+    parser.add_argument('--workers', type=int, default=4, help='Server worker processes')
+    parser.add_argument('--concurrency', type=int, default=100, help='Concurrent client connections')
+    parser.add_argument('--slow-clients', type=int, default=0, help='Connections trickling their headers')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per server')
+    args = parser.parse_args()
+    
+    database_url = args.database_url or f'sqlite:///{tempfile.mkdtemp()}/bench.db'
+    seed(database_url, args.incidents)
+    
+    env = dict(os.environ, DATABASE_URL=database_url, FLASK_ENV='production',
+               RATELIMIT_ENABLED='false', JOBS_WORKER='external')
+    servers = {
+        'wsgi (gunicorn sync)': ['gunicorn', '-w', str(args.workers), '-b', '127.0.0.1:{port}', 'run:app'],
+        'asgi (uvicorn)': ['uvicorn', 'asgi:app', '--workers', str(args.workers), '--port', '{port}',
+                           '--log-level', 'warning']
+    }
+    paths = ['/api/incidents/?view=compact', '/api/incidents/stats']
+    
+    print(f'{"server":<22} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8} {"errors":>7}')
+    for offset, (name, command) in enumerate(servers.items()):
+        port = 8701 + offset
+        process = subprocess.Popen(
+            [part.format(port=port) for part in command], cwd=BACKEND, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_until_up('127.0.0.1', port)
+            latencies, errors = asyncio.run(load(
+                '127.0.0.1', port, paths, args.concurrency, args.duration, args.slow_clients
+            ))
+        finally:
+            process.terminate()
+            process.wait()
+        print(f'{name:<22} {len(latencies) / args.duration:>8.1f} {percentile(latencies, 0.5):>8.1f} '
+              f'{percentile(latencies, 0.99):>8.1f} {errors:>7}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Coordinate storage benchmark: decimal columns (before) vs integer microdegrees (after)
+
+Loads the same random incidents into two tables that differ only in the type of
+their latitude/longitude columns, then times the bounding-box radius filter used
+by duplicate detection and map queries, and the row-to-JSON serialization used by
+the listing endpoints.
+
+    python scripts/bench_coordinates.py --rows 200000 --database postgresql://localhost/bench
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Column, Index, Integer, MetaData, Numeric, String, Table, create_engine, select
+
+def tables(metadata):
+    """Identical tables apart from the coordinate column type"""
+    from app.models.incident import MicroDegrees
+
+    def table(name, latitude, longitude):
+        return Table(
+            name, metadata,
+            Column('id', Integer, primary_key=True),
+            Column('title', String(200)),
+            Column('latitude', latitude, nullable=False),
+            Column('longitude', longitude, nullable=False),
+            Index(f'ix_{name}_lat_lng', 'latitude', 'longitude')
+        )
+
+    return {
+        'decimal': table('bench_decimal', Numeric(10, 8), Numeric(11, 8)),
+        'microdegrees': table('bench_microdegrees', MicroDegrees, MicroDegrees)
+    }
+
+def radius_filter(connection, table, centres, radius):
+    """Bounding-box query plus exact distance check, as in find_duplicates"""
+    from app.utils.dedup import distance_meters
+
+    matches = 0
+    for latitude, longitude in centres:
+        lat_delta = radius / 111320
+        lng_delta = radius / (111320 * math.cos(math.radians(latitude)))
+        rows = connection.execute(select(table.c.id, table.c.latitude, table.c.longitude).where(
+            table.c.latitude.between(latitude - lat_delta, latitude + lat_delta),
+            table.c.longitude.between(longitude - lng_delta, longitude + lng_delta)
+        )).all()
+        matches += sum(
+            distance_meters(latitude, longitude, float(row.latitude), float(row.longitude)) <= radius
+            for row in rows
+        )
+    return matches
+
+def serialize(connection, table, limit, convert):
+    """Fetch a page of rows and build the JSON dicts the listing endpoint returns"""
+    rows = connection.execute(select(table).order_by(table.c.id).limit(limit)).all()
+    return [
+        {'id': row.id, 'title': row.title, 'latitude': convert(row.latitude), 'longitude': convert(row.longitude)}
+        for row in rows
+    ]
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--queries', type=int, default=500, help='Radius queries per measurement')
+    parser.add_argument('--radius', type=float, default=500, help='Radius in meters')
+    parser.add_argument('--page', type=int, default=5000, help='Rows serialized per measurement')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database', help='Database URL (defaults to a temporary SQLite file)')
+    args = parser.parse_args()
+
+    url = args.database or f'sqlite:///{tempfile.mkdtemp()}/bench_coordinates.db'
+    engine = create_engine(url)
+    metadata = MetaData()
+    benchmarks = tables(metadata)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+
+    rng = random.Random(1)
+    points = [(round(rng.uniform(-1.45, -1.15), 8), round(rng.uniform(36.65, 37.05), 8)) for _ in range(args.rows)]
+    centres = [(rng.uniform(-1.45, -1.15), rng.uniform(36.65, 37.05)) for _ in range(args.queries)]
+    with engine.begin() as connection:
+        for table in benchmarks.values():
+            connection.execute(table.insert(), [
+                {'id': i + 1, 'title': f'Incident {i}', 'latitude': latitude, 'longitude': longitude}
+                for i, (latitude, longitude) in enumerate(points)
+            ])
+
+    # Before: Decimal values converted per row as Incident.to_dict did; after: floats straight from the type
+    converters = {'decimal': lambda value: float(value) if value else None, 'microdegrees': lambda value: value}
+
+    print(f'{args.rows} rows on {engine.dialect.name}')
+    print(f'{"":>14} {"radius filter":>16} {"serialize":>16}')
+    with engine.connect() as connection:
+        for name, table in benchmarks.items():
+            filtering = timed(lambda: radius_filter(connection, table, centres, args.radius), args.repeat)
+            serializing = timed(lambda: serialize(connection, table, args.page, converters[name]), args.repeat)
+            print(f'{name:>14} {filtering / args.queries * 1e6:>11.0f} us/q '
+                  f'{serializing / args.page * 1e6:>10.2f} us/row')
+
+if __name__ == '__main__':
+    main()
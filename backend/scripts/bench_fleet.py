@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Fleet tracking benchmark: position ping throughput and nearest-truck queries
+
+Registers --trucks trucks scattered around Nairobi, then feeds them --pings position
+pings three ways: one commit per ping (a trail row plus the truck's position, as a
+naive endpoint would), the fleet module's index with batched trail writes, and the
+in-memory index alone. Finally times nearest-available-truck queries.
+
+    python scripts/bench_fleet.py --trucks 5000 --pings 50000 --database postgresql://localhost/bench
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models.truck import Truck, TruckPosition
+from app.utils.fleet import FleetIndex, fleet_index, flush_trail, record_pings
+from config import config, TestingConfig
+
+CENTRE = (-1.2921, 36.8219)
+
+def ping_stream(truck_ids, count, rng):
+    """Pings that nudge random trucks about, with increasing timestamps"""
+    start = datetime.utcnow() - timedelta(days=1)
+    positions = {truck_id: [CENTRE[0] + rng.uniform(-0.2, 0.2), CENTRE[1] + rng.uniform(-0.2, 0.2)]
+                 for truck_id in truck_ids}
+    pings = []
+    for step in range(count):
+        truck_id = rng.choice(truck_ids)
+        position = positions[truck_id]
+        position[0] += rng.uniform(-5e-4, 5e-4)
+        position[1] += rng.uniform(-5e-4, 5e-4)
+        pings.append({
+            'truck_id': truck_id,
+            'latitude': position[0],
+            'longitude': position[1],
+            'speed_kph': rng.uniform(0, 60),
+            'heading': rng.uniform(0, 360),
+            'recorded_at': start + timedelta(milliseconds=step)
+        })
+    return pings
+
+def per_ping_commits(pings):
+    """Before: every ping is its own transaction"""
+    for ping in pings:
+        db.session.add(TruckPosition(**{field: ping[field] for field in (
+            'truck_id', 'latitude', 'longitude', 'speed_kph', 'heading', 'recorded_at'
+        )}))
+        truck = db.session.get(Truck, ping['truck_id'])
+        truck.latitude, truck.longitude, truck.located_at = ping['latitude'], ping['longitude'], ping['recorded_at']
+        db.session.commit()
+
+def batched(pings, request_size):
+    """After: pings go to the index and the trail buffer, written FLEET_TRAIL_BATCH_SIZE at a time"""
+    for start in range(0, len(pings), request_size):
+        record_pings(pings[start:start + request_size])
+    flush_trail()
+
+def rate(count, seconds):
+    return f'{count / seconds:>12,.0f} pings/s'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trucks', type=int, default=5000)
+    parser.add_argument('--pings', type=int, default=50000)
+    parser.add_argument('--slow-pings', type=int, default=5000, help='Pings for the per-commit run')
+    parser.add_argument('--request-size', type=int, default=1, help='Pings per ingestion call')
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--database', help='Database URL (defaults to a temporary SQLite file)')
+    args = parser.parse_args()
+
+    url = args.database or f'sqlite:///{tempfile.mkdtemp()}/bench_fleet.db'
+    config['bench'] = type('BenchConfig', (TestingConfig,), {'SQLALCHEMY_DATABASE_URI': url})
+    app = create_app('bench')
+    rng = random.Random(1)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add_all(Truck(license_plate=f'KXX {number:05d}') for number in range(args.trucks))
+        db.session.commit()
+        truck_ids = [truck_id for truck_id, in db.session.query(Truck.id)]
+        print(f'{args.trucks} trucks on {db.engine.dialect.name}, '
+              f'trail batches of {app.config["FLEET_TRAIL_BATCH_SIZE"]}')
+
+        pings = ping_stream(truck_ids, args.slow_pings, rng)
+        start = time.perf_counter()
+        per_ping_commits(pings)
+        print(f'{"commit per ping":>22} {rate(len(pings), time.perf_counter() - start)}')
+
+        db.session.query(TruckPosition).delete()
+        db.session.query(Truck).update({'latitude': None, 'longitude': None, 'located_at': None})
+        db.session.commit()
+        fleet_index()
+        pings = ping_stream(truck_ids, args.pings, rng)
+        start = time.perf_counter()
+        batched(pings, args.request_size)
+        print(f'{"index + batched trail":>22} {rate(len(pings), time.perf_counter() - start)}')
+        assert db.session.query(TruckPosition).count() == len(pings)
+
+        index = FleetIndex(app.config['FLEET_CELL_DEGREES'])
+        index.rebuild(Truck.query.all(), None)
+        later = [dict(ping, recorded_at=ping['recorded_at'] + timedelta(days=1)) for ping in pings]
+        start = time.perf_counter()
+        for ping in later:
+            index.move(ping['truck_id'], ping['latitude'], ping['longitude'], ping['recorded_at'])
+        print(f'{"index only":>22} {rate(len(later), time.perf_counter() - start)}')
+
+        points = [(CENTRE[0] + rng.uniform(-0.2, 0.2), CENTRE[1] + rng.uniform(-0.2, 0.2)) for _ in range(args.queries)]
+        start = time.perf_counter()
+        for latitude, longitude in points:
+            index.nearest(latitude, longitude, 5, app.config['FLEET_NEAREST_MAX_METERS'])
+        elapsed = time.perf_counter() - start
+        print(f'{"nearest 5 trucks":>22} {elapsed / args.queries * 1e6:>12.0f} us/query')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.models.user import User
+from app.models.incident import Incident
+from config import config, TestingConfig
+
+@pytest.fixture
+def app():
+    """Create application for testing"""
+    app = create_app('testing')
+    
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """Create test client"""
+    return app.test_client()
+
+@pytest.fixture
+def auth_headers():
+    """Get authentication headers"""
+    def _auth_headers(token):
+        return {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+    return _auth_headers
+
+@pytest.fixture
+def make_user(app):
+    """Create a user directly in the database"""
+    def _make_user(username='citizen', role='user', **kwargs):
+        user = User(
+            username=username,
+            email=kwargs.pop('email', f'{username}@example.com'),
+            first_name=kwargs.pop('first_name', username.title()),
+            last_name=kwargs.pop('last_name', 'Tester'),
+            role=role,
+            **kwargs
+        )
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return _make_user
+
+@pytest.fixture
+def token_for(app):
+    """Issue a JWT for a user"""
+    def _token_for(user):
+        return create_access_token(identity=user.id)
+    return _token_for
+
+@pytest.fixture
+def make_incident(app):
+    """Create an incident directly in the database"""
+    def _make_incident(reporter, **kwargs):
+        values = {
+            'title': 'Pothole on Main Street',
+            'description': 'Large pothole near the bus stop',
+            'category': 'infrastructure',
+            'latitude': -1.2921,
+            'longitude': 36.8219,
+            'reported_by': reporter.id
+        }
+        values.update(kwargs)
+        incident = Incident(**values)
+        db.session.add(incident)
+        db.session.commit()
+        return incident
+    return _make_incident
+
+@pytest.fixture
+def file_app(tmp_path):
+    """App on a SQLite file so concurrent requests use separate connections"""
+    config['file_testing'] = type('FileTestingConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "app.db"}',
+        'RATELIMIT_ENABLED': False
+    })
+    app = create_app('file_testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    del config['file_testing']
@@ -0,0 +1,134 @@
+import json
+from datetime import datetime, timedelta
+import numpy as np
+from app.utils import analytics
+
+def test_hotspot_analytics(client, make_user, make_incident, token_for, auth_headers):
+    """Test hotspot density, weekly trends and resolution times"""
+    admin = make_user('admin', role='admin')
+    now = datetime.utcnow()
+    for hours in (1, 2, 3):
+        make_incident(admin, latitude=-1.2921, longitude=36.8219,
+                      created_at=now - timedelta(days=1, hours=hours),
+                      status='resolved', resolved_at=now - timedelta(days=1) + timedelta(hours=hours))
+    make_incident(admin, latitude=-4.0435, longitude=39.6682, category='safety',
+                  created_at=now - timedelta(days=9))
+    
+    response = client.get('/api/admin/analytics/hotspots?days=14',
+                          headers=auth_headers(token_for(admin)))
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    
+    assert data['total_incidents'] == 4
+    assert data['hotspots'][0]['count'] == 3
+    assert data['hotspots'][0]['latitude'] == -1.295
+    
+    trends = data['category_trends']['categories']
+    assert trends['infrastructure']['weekly_counts'] == [0, 3]
+    assert trends['safety']['weekly_counts'] == [1, 0]
+    
+    area = data['resolution_times'][0]
+    assert area['resolved_count'] == 3
+    assert area['median_hours'] == 4.0
+
+def test_hotspot_analytics_requires_admin(client, make_user, token_for, auth_headers):
+    """Test that citizens cannot read analytics"""
+    user = make_user()
+    response = client.get('/api/admin/analytics/hotspots', headers=auth_headers(token_for(user)))
+    assert response.status_code == 403
+
+def test_hotspot_report_memoized_per_window(app, make_user, make_incident):
+    """Test that repeat reports inside one cache window reuse the computed result"""
+    app.config['ANALYTICS_CACHE_SECONDS'] = 3600
+    analytics._report_cache.clear()
+    user = make_user()
+    make_incident(user, created_at=datetime.utcnow() - timedelta(days=2))
+    
+    first = analytics.hotspot_report(days=7)
+    make_incident(user, created_at=datetime.utcnow() - timedelta(days=2))
+    assert analytics.hotspot_report(days=7) is first
+    analytics._report_cache.clear()
+
+def test_hotspot_report_cache_and_cell_size_are_bounded(app, make_user, make_incident):
+    """Test that tiny cells are clamped instead of overflowing and the cache keeps a fixed size"""
+    app.config.update(ANALYTICS_CACHE_SECONDS=3600, ANALYTICS_CACHE_SIZE=3)
+    analytics._report_cache.clear()
+    make_incident(make_user(), latitude=89.99, longitude=179.99,
+                  created_at=datetime.utcnow() - timedelta(days=2))
+    
+    report = analytics.hotspot_report(days=7, cell_size=1e-12)
+    assert report['hotspots'][0]['count'] == 1
+    assert abs(report['hotspots'][0]['latitude'] - 89.99) < analytics.MIN_CELL_SIZE
+    for top in range(1, 6):
+        analytics.hotspot_report(days=7, top=top)
+    assert len(analytics._report_cache) == 3
+    assert {key[3] for key in analytics._report_cache} == {3, 4, 5}
+    analytics._report_cache.clear()
+
+def test_density_grid_is_vectorized_over_arrays():
+    """Test density grid on plain arrays"""
+    latitude = np.array([0.001, 0.002, 0.5])
+    longitude = np.array([0.001, 0.003, 0.5])
+    hotspots = analytics.density_grid(latitude, longitude, cell_size=0.01, top=1)
+    assert hotspots == [{'latitude': 0.005, 'longitude': 0.005, 'count': 2}]
+
+def test_rollups_refresh_only_dirty_days(app, make_user, make_incident):
+    """Test that rollups track incident changes and refresh incrementally"""
+    from app import db
+    from app.models.rollup import IncidentDailyRollup, RollupDirtyDay
+    from app.utils.rollups import refresh_rollups
+    
+    user = make_user()
+    day = datetime(2024, 3, 1, 9, 0)
+    incident = make_incident(user, city='Nairobi', created_at=day)
+    make_incident(user, city='Nairobi', created_at=day - timedelta(days=400))
+    
+    assert len(refresh_rollups()) == 2
+    assert RollupDirtyDay.query.count() == 0
+    assert refresh_rollups() == []
+    
+    incident.status = 'resolved'
+    incident.resolved_at = day + timedelta(hours=6)
+    db.session.commit()
+    incident.upvotes = 5
+    db.session.commit()
+    
+    assert refresh_rollups() == [day.date()]
+    row = IncidentDailyRollup.query.filter_by(day=day.date()).one()
+    assert (row.city, row.status, row.created_count) == ('Nairobi', 'resolved', 1)
+    assert (row.resolved_count, row.resolution_days) == (1, 0)
+
+def test_summary_report_reads_rollups(app, client, make_user, make_incident, token_for, auth_headers):
+    """Test that the summary report is served from rollups the job worker keeps current"""
+    from app.utils.jobs import run_periodic
+    
+    admin = make_user('admin', role='admin')
+    now = datetime.utcnow()
+    make_incident(admin, created_at=now - timedelta(days=2), status='resolved',
+                  resolved_at=now - timedelta(days=1))
+    make_incident(admin, created_at=now - timedelta(days=3), priority='high', status='resolved',
+                  resolved_at=now - timedelta(days=1, hours=12))
+    make_incident(admin, created_at=now - timedelta(days=1000))
+    # Seven calendar days back is just outside a 7-day window (today is its first day)
+    make_incident(admin, created_at=datetime.combine(now.date() - timedelta(days=7), datetime.min.time()))
+    headers = auth_headers(token_for(admin))
+    
+    assert json.loads(client.get('/api/admin/reports/incident-summary', headers=headers).data)[
+        'summary']['total_incidents'] == 0
+    last_run = {}
+    run_periodic(app.config, last_run)
+    assert 'rollups' in last_run
+    
+    data = json.loads(client.get('/api/admin/reports/incident-summary?days=7', headers=headers).data)
+    assert data['summary']['total_incidents'] == 2
+    assert data['summary']['resolved_incidents'] == 2
+    # Whole days per incident (1 and 1.5 -> 1), for incidents created in the window
+    assert data['summary']['avg_resolution_time_days'] == 1.0
+    assert data['priority_breakdown'] == {'medium': 1, 'high': 1}
+    assert data['period']['start_date'] == f'{(now.date() - timedelta(days=6)).isoformat()}T00:00:00'
+    
+    data = json.loads(client.get('/api/admin/reports/incident-summary?days=1825', headers=headers).data)
+    assert data['summary']['total_incidents'] == 4
+    
+    dashboard = json.loads(client.get('/api/admin/dashboard', headers=headers).data)
+    assert dashboard['incident_stats'] == {'total': 4, 'open': 2, 'in_progress': 0, 'resolved': 2}
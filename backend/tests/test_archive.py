@@ -0,0 +1,63 @@
+import json
+from datetime import datetime, timedelta
+from app import db
+from app.models.archive import ArchivedIncident
+from app.models.incident import Incident
+from app.models.rollup import IncidentDailyRollup
+from app.utils.archive import archive_batch, archive_cutoff
+from app.utils.rollups import refresh_rollups
+
+def make_old_incidents(make_user, make_incident):
+    """One long-resolved incident, one recently resolved and one old but still open"""
+    user = make_user()
+    long_ago = datetime.utcnow() - timedelta(days=400)
+    old = make_incident(user, title='Old resolved', status='resolved', created_at=long_ago,
+                        resolved_at=long_ago + timedelta(days=2))
+    recent = make_incident(user, title='Recently resolved', status='resolved',
+                           resolved_at=datetime.utcnow())
+    still_open = make_incident(user, title='Old open', created_at=long_ago)
+    return user, old.id, recent.id, still_open.id
+
+def test_archive_moves_only_long_resolved(client, make_user, make_incident):
+    """Test that archival moves old resolved incidents and lookups stay transparent"""
+    user, old_id, recent_id, open_id = make_old_incidents(make_user, make_incident)
+    
+    assert archive_batch(archive_cutoff(365), batch_size=10) == [old_id]
+    assert db.session.get(Incident, old_id) is None
+    assert {incident.id for incident in Incident.query} == {recent_id, open_id}
+    
+    response = client.get(f'/api/incidents/{old_id}')
+    assert response.status_code == 200
+    incident = json.loads(response.data)['incident']
+    assert incident['title'] == 'Old resolved'
+    assert incident['archived_at']
+    
+    listing = json.loads(client.get('/api/incidents/?fields=id').data)
+    assert {incident['id'] for incident in listing['incidents']} == {recent_id, open_id}
+    
+    summary = json.loads(client.get('/api/incidents/stats').data)['summary']
+    assert summary == {'total': 3, 'open': 1, 'resolved': 2, 'in_progress': 0}
+
+def test_rollups_include_archived_incidents(app, make_user, make_incident):
+    """Test that a full rollup rebuild after archival still counts archived incidents"""
+    make_old_incidents(make_user, make_incident)
+    refresh_rollups(full=True)
+    before = IncidentDailyRollup.totals_by('status')
+    
+    archive_batch(archive_cutoff(365), batch_size=10)
+    refresh_rollups(full=True)
+    assert IncidentDailyRollup.totals_by('status') == before == {'resolved': 2, 'open': 1}
+
+def test_archive_command_reports_progress(app, make_user, make_incident):
+    """Test the batched archive command"""
+    user = make_user()
+    long_ago = datetime.utcnow() - timedelta(days=400)
+    for _ in range(3):
+        make_incident(user, status='closed', created_at=long_ago, updated_at=long_ago)
+    
+    result = app.test_cli_runner().invoke(args=['archive', 'run', '--batch-size', '2', '--pause', '0'])
+    assert result.exit_code == 0
+    assert 'Archived 2/3 incident(s)' in result.output
+    assert 'Archived 3 incident(s)' in result.output
+    assert ArchivedIncident.query.count() == 3
+    assert Incident.query.count() == 0
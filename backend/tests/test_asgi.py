@@ -0,0 +1,120 @@
+import asyncio
+import json
+import pytest
+from app import create_app, db
+from app.asgi import create_asgi_app, async_database_uri
+from config import config, TestingConfig
+from tests.test_replicas import seed
+
+@pytest.fixture
+def asgi_app(tmp_path):
+    """Flask app on a SQLite file (shared by the sync and async drivers) wrapped for ASGI"""
+    config['asgi_testing'] = type('AsgiTestingConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "app.db"}'
+    })
+    flask_app = create_app('asgi_testing')
+    with flask_app.app_context():
+        db.create_all()
+        yield create_asgi_app(flask_app)
+        db.session.remove()
+        db.drop_all()
+    del config['asgi_testing']
+
+def call(app, *requests):
+    """Send (method, path, query, headers) requests through the ASGI app; returns (status, headers, body)"""
+    async def send_one(method, path, query=b'', headers=()):
+        messages = []
+        received = []
+        
+        async def receive():
+            if received:
+                await asyncio.sleep(3600)
+            received.append(True)
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        
+        async def send(message):
+            messages.append(message)
+        
+        await app({
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query,
+            'root_path': '', 'headers': list(headers), 'client': ('127.0.0.1', 1234),
+            'server': ('testserver', 80)
+        }, receive, send)
+        start = next(message for message in messages if message['type'] == 'http.response.start')
+        body = b''.join(message.get('body', b'') for message in messages if message['type'] == 'http.response.body')
+        return start['status'], dict(start['headers']), body
+    
+    async def run_all():
+        try:
+            return [await send_one(*request) for request in requests]
+        finally:
+            await app.dispose()
+    
+    return asyncio.run(run_all())
+
+def test_async_routes_match_sync_responses(asgi_app, make_user, make_incident):
+    """Test that the async listing and stats return the same bodies as the Flask handlers"""
+    user = make_user()
+    make_incident(user)
+    make_incident(user, title='Flooded underpass', status='resolved', category='environmental')
+    client = asgi_app.flask_app.test_client()
+    
+    (listing_status, _, listing), (stats_status, _, stats) = call(
+        asgi_app,
+        ('GET', '/api/incidents/', b'view=compact&limit=1&page=2'),
+        ('GET', '/api/incidents/stats')
+    )
+    
+    assert listing_status == stats_status == 200
+    assert json.loads(listing) == json.loads(client.get('/api/incidents/?view=compact&limit=1&page=2').data)
+    assert json.loads(stats) == json.loads(client.get('/api/incidents/stats').data)
+    assert json.loads(listing)['pagination']['total_items'] == 2
+
+def test_async_routes_keep_flask_hooks(asgi_app):
+    """Test that validation errors and CORS headers work on the native path"""
+    [(status, headers, body)] = call(
+        asgi_app, ('GET', '/api/incidents/', b'sort=bogus', [(b'origin', b'http://localhost:3000')])
+    )
+    assert status == 400
+    assert json.loads(body)['error'] == 'Invalid sort'
+    assert headers[b'access-control-allow-origin'] == b'http://localhost:3000'
+
+def test_async_routes_read_from_replica(tmp_path):
+    """Test that the native listing uses a healthy replica like the sync handler does"""
+    config['asgi_replica_testing'] = type('AsgiReplicaTestingConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "primary.db"}',
+        'SQLALCHEMY_REPLICA_URIS': [f'sqlite:///{tmp_path / "replica.db"}']
+    })
+    flask_app = create_app('asgi_replica_testing')
+    replica = flask_app.extensions['replicas']['replica_0']
+    try:
+        with flask_app.app_context():
+            db.create_all()
+            db.metadata.create_all(replica)
+            seed(db.engines[None], 'On primary')
+            seed(replica, 'On replica')
+            
+            [(status, _, body)] = call(create_asgi_app(flask_app), ('GET', '/api/incidents/', b'fields=title'))
+            assert status == 200
+            assert [incident['title'] for incident in json.loads(body)['incidents']] == ['On replica']
+            
+            # A lagging replica is skipped
+            flask_app.extensions['replica_lag']['replica_0'] = (float('inf'), float('inf'))
+            [(status, _, body)] = call(create_asgi_app(flask_app), ('GET', '/api/incidents/', b'fields=title'))
+            assert [incident['title'] for incident in json.loads(body)['incidents']] == ['On primary']
+            db.session.remove()
+    finally:
+        replica.dispose()
+        del config['asgi_replica_testing']
+
+def test_other_routes_fall_back_to_flask(asgi_app):
+    """Test that routes without an async handler are served by the WSGI app"""
+    [(status, _, body)] = call(asgi_app, ('GET', '/health'))
+    assert status == 200
+    assert json.loads(body)['status'] == 'OK'
+
+def test_async_database_uri():
+    """Test driver rewriting for the async engine"""
+    assert async_database_uri('postgresql://u:p@db/velo').drivername == 'postgresql+asyncpg'
+    assert async_database_uri('sqlite:///app.db').drivername == 'sqlite+aiosqlite'
@@ -0,0 +1,71 @@
+from sqlalchemy import inspect, text, Integer
+from app import db
+from app.models.archive import ArchivedIncident
+from app.models.incident import Incident
+from app.utils.coordinates import prepare, copy_batch, swap
+
+def test_coordinates_round_trip(app, make_user, make_incident):
+    """Test that microdegree storage keeps the float API and integer bounding-box filters"""
+    incident = make_incident(make_user(), latitude='-1.29210749', longitude=36.8219)
+    db.session.expire_all()
+    
+    stored = db.session.execute(text('SELECT latitude, longitude FROM incidents')).one()
+    assert tuple(stored) == (-1292107, 36821900)
+    
+    incident = db.session.get(Incident, incident.id)
+    assert (incident.latitude, incident.longitude) == (-1.292107, 36.8219)
+    assert incident.to_dict(['latitude', 'longitude']) == {'latitude': -1.292107, 'longitude': 36.8219}
+    assert Incident.find_by_location(-1.2921, 36.8219, radius=1) == [incident]
+    assert Incident.find_by_location(-1.3, 36.9, radius=1) == []
+
+def _decimal_columns(reporter, rows=5):
+    """Put the tables back on the old decimal columns, with rows incidents"""
+    with db.engine.begin() as connection:
+        for index in ('ix_incidents_lat_lng', 'ix_incidents_dedup'):
+            connection.execute(text(f'DROP INDEX {index}'))
+        for table in ('incidents', 'incidents_archive'):
+            for column, precision in (('latitude', '10, 8'), ('longitude', '11, 8')):
+                connection.execute(text(f'ALTER TABLE {table} DROP COLUMN {column}'))
+                connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} NUMERIC({precision})'))
+        for i in range(rows):
+            connection.execute(text(
+                "INSERT INTO incidents (title, description, category, status, priority, latitude, longitude, "
+                "reported_by, upvotes, downvotes, duplicate_reports, trending_score, urgency_score) "
+                "VALUES ('Pothole', 'Deep pothole', 'infrastructure', 'open', 'medium', :latitude, :longitude, "
+                ":reporter, 0, 0, 0, 0, 0)"
+            ), {'latitude': -1.2921 + i / 1000, 'longitude': 36.8219, 'reporter': reporter.id})
+
+def test_migrate_decimal_columns(app, make_user):
+    """Test the batched migration from decimal columns to microdegrees"""
+    _decimal_columns(make_user())
+    
+    result = app.test_cli_runner().invoke(args=['coordinates', 'migrate', '--batch-size', '2'])
+    assert 'incidents: switched to microdegrees (5 row(s))' in result.output
+    
+    inspector = inspect(db.engine)
+    for table in ('incidents', 'incidents_archive'):
+        types = {column['name']: column['type'] for column in inspector.get_columns(table)}
+        assert isinstance(types['latitude'], Integer) and 'latitude_e6' not in types
+    assert 'ix_incidents_lat_lng' in {index['name'] for index in inspector.get_indexes('incidents')}
+    
+    db.session.expire_all()
+    assert sorted(incident.latitude for incident in Incident.query) == [-1.2921, -1.2911, -1.2901, -1.2891, -1.2881]
+    assert ArchivedIncident.query.count() == 0
+    
+    result = app.test_cli_runner().invoke(args=['coordinates', 'migrate'])
+    assert 'already stored as microdegrees' in result.output
+
+
+def test_swap_recopies_rows_updated_after_their_batch(app, make_user):
+    """Test that a coordinate edited after its batch was copied survives the swap"""
+    _decimal_columns(make_user(), rows=2)
+    prepare('incidents')
+    assert copy_batch('incidents', 0, 10)[1] == 2
+    with db.engine.begin() as connection:
+        connection.execute(text('UPDATE incidents SET latitude = -1.5, longitude = 36.9 WHERE id = 1'))
+    swap('incidents')
+    
+    db.session.expire_all()
+    incident = db.session.get(Incident, 1)
+    assert (incident.latitude, incident.longitude) == (-1.5, 36.9)
+    assert db.session.get(Incident, 2).latitude == -1.2911
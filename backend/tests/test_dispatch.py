@@ -0,0 +1,131 @@
+import json
+from app import db
+from app.models.incident import Incident
+from app.models.user import User
+from app.utils.dispatch import DispatchIndex, dispatch_index, recount_open_assignments
+
+NAIROBI = (-1.2921, 36.8219)
+MOMBASA = (-4.0435, 39.6682)
+
+INCIDENT = {
+    'title': 'Burst water main',
+    'description': 'Water flooding the road outside the market',
+    'category': 'infrastructure',
+    'latitude': NAIROBI[0],
+    'longitude': NAIROBI[1]
+}
+
+def test_index_prefers_nearby_admin_within_slack():
+    """Test proximity wins until the local admin is much busier than the least-loaded one"""
+    index = DispatchIndex(cell_size=0.25)
+    index.rebuild([(1, 3, *NAIROBI), (2, 0, *MOMBASA), (3, 1, None, None)])
+    
+    assert index.pick(*NAIROBI, slack=5) == 1
+    assert index.pick(*NAIROBI, slack=0) == 2
+    assert index.pick(0.0, 0.0, slack=5) == 2
+    
+    index.adjust(2, 4)
+    assert index.pick(0.0, 0.0) == 3
+    assert index.load_of(2) == 4
+    
+    # Uncommitted workload counts towards the pick without touching the index
+    assert index.pick(0.0, 0.0, pending={3: 5, 99: 1}) == 1
+    assert index.load_of(3) == 1
+
+def test_new_incidents_are_dispatched_and_counted(client, make_user, token_for, auth_headers):
+    """Test auto-assignment on report and workload counters following status changes"""
+    near = make_user('nairobi_admin', role='admin', home_latitude=NAIROBI[0], home_longitude=NAIROBI[1])
+    make_user('mombasa_admin', role='admin', home_latitude=MOMBASA[0], home_longitude=MOMBASA[1])
+    citizen = make_user()
+    
+    response = client.post('/api/incidents/', data=json.dumps(INCIDENT),
+                           headers=auth_headers(token_for(citizen)))
+    assert response.status_code == 201
+    incident = json.loads(response.data)['incident']
+    assert incident['assigned_to'] == near.id
+    assert db.session.get(User, near.id).open_assignments == 1
+    
+    response = client.put(f'/api/incidents/{incident["id"]}', data=json.dumps({'status': 'resolved'}),
+                          headers=auth_headers(token_for(near)))
+    assert response.status_code == 200
+    db.session.expire_all()
+    assert db.session.get(User, near.id).open_assignments == 0
+
+def test_bulk_auto_assignment_spreads_load(client, make_user, make_incident, token_for, auth_headers):
+    """Test that bulk auto-assignment balances incidents across admins"""
+    first = make_user('first_admin', role='admin')
+    second = make_user('second_admin', role='admin')
+    incidents = [make_incident(first) for _ in range(4)]
+    
+    response = client.put('/api/admin/incidents/bulk-update', data=json.dumps({
+        'incident_ids': [incident.id for incident in incidents],
+        'updates': {'assigned_to': 'auto'}
+    }), headers=auth_headers(token_for(first)))
+    assert response.status_code == 200
+    
+    workload = json.loads(client.get('/api/admin/workload', headers=auth_headers(token_for(first))).data)
+    assert [admin['open_assignments'] for admin in workload['admins']] == [2, 2]
+
+def test_bulk_auto_assignment_without_admins_conflicts(client, make_user, make_incident, token_for, auth_headers):
+    """Test that bulk auto-assignment with no active admins changes nothing and returns 409"""
+    admin = make_user('admin', role='admin')
+    incident = make_incident(admin, assigned_to=admin.id)
+    User.query.filter_by(id=admin.id).update({'is_active': False})
+    db.session.commit()
+    
+    response = client.put('/api/admin/incidents/bulk-update', data=json.dumps({
+        'incident_ids': [incident.id],
+        'updates': {'assigned_to': 'auto'}
+    }), headers=auth_headers(token_for(admin)))
+    assert response.status_code == 409
+    db.session.expire_all()
+    assert db.session.get(Incident, incident.id).assigned_to == admin.id
+
+def test_recount_repairs_counters(app, make_user, make_incident):
+    """Test that recount rebuilds counters from incidents"""
+    admin = make_user('admin', role='admin')
+    make_incident(admin, assigned_to=admin.id)
+    make_incident(admin, assigned_to=admin.id, status='closed')
+    User.query.filter_by(id=admin.id).update({'open_assignments': 7})
+    db.session.commit()
+    
+    recount_open_assignments()
+    assert db.session.get(User, admin.id).open_assignments == 1
+
+def test_index_follows_committed_workload_only(app, make_user, make_incident):
+    """Test that the index applies workload changes on commit and drops them on rollback"""
+    admin = make_user('admin', role='admin')
+    incident = make_incident(admin)
+    index = dispatch_index()
+    assert index.load_of(admin.id) == 0
+    
+    incident.assigned_to = admin.id
+    db.session.flush()
+    assert index.load_of(admin.id) == 0
+    db.session.rollback()
+    assert index.load_of(admin.id) == 0
+    
+    db.session.refresh(incident)
+    incident.assigned_to = admin.id
+    db.session.commit()
+    assert index.load_of(admin.id) == 1
+    assert db.session.get(User, admin.id).open_assignments == 1
+
+def test_role_change_refreshes_dispatch(client, make_user, token_for, auth_headers):
+    """Test that a demoted admin stops receiving incidents and a promoted user starts at once"""
+    admin = make_user('admin', role='admin', home_latitude=NAIROBI[0], home_longitude=NAIROBI[1])
+    other = make_user('other')
+    citizen = make_user()
+    headers = auth_headers(token_for(admin))
+    assert dispatch_index().load_of(admin.id) == 0
+    
+    response = client.put(f'/api/auth/users/{other.id}/role', data=json.dumps({'role': 'admin'}),
+                          headers=headers)
+    assert response.status_code == 200
+    response = client.put(f'/api/auth/users/{admin.id}/role', data=json.dumps({'role': 'user'}),
+                          headers=headers)
+    assert response.status_code == 200
+    
+    response = client.post('/api/incidents/', data=json.dumps(INCIDENT),
+                           headers=auth_headers(token_for(citizen)))
+    assert json.loads(response.data)['incident']['assigned_to'] == other.id
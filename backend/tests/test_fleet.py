@@ -0,0 +1,122 @@
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import db
+from app.models.truck import Truck, TruckPosition
+from app.utils.dedup import distance_meters
+from app.utils.fleet import FleetIndex, flush_trail, record_pings
+
+NAIROBI = (-1.2921, 36.8219)
+
+def test_nearest_matches_brute_force():
+    """Test the ring search against checking every truck"""
+    rng = random.Random(7)
+    index = FleetIndex(cell_size=0.01)
+    trucks = []
+    for truck_id in range(1, 2001):
+        truck = Truck(id=truck_id, status=rng.choice(['available', 'available', 'dispatched']), is_active=True,
+                      latitude=NAIROBI[0] + rng.uniform(-0.3, 0.3), longitude=NAIROBI[1] + rng.uniform(-0.3, 0.3),
+                      located_at=datetime(2024, 1, 1))
+        trucks.append(truck)
+    index.rebuild(trucks, None)
+    
+    for _ in range(50):
+        latitude, longitude = NAIROBI[0] + rng.uniform(-0.3, 0.3), NAIROBI[1] + rng.uniform(-0.3, 0.3)
+        expected = sorted(
+            (distance_meters(latitude, longitude, truck.latitude, truck.longitude), truck.id)
+            for truck in trucks if truck.status == 'available'
+        )
+        expected = [match for match in expected if match[0] <= 5000][:5]
+        assert index.nearest(latitude, longitude, 5, 5000) == expected
+    
+    # A ping moves the truck between cells; an older ping is ignored
+    truck = trucks[0]
+    assert index.move(truck.id, 10.0, 10.0, datetime(2024, 1, 2))
+    assert not index.move(truck.id, 0.0, 0.0, datetime(2024, 1, 1, 12))
+    assert index.position(truck.id) == (10.0, 10.0, datetime(2024, 1, 2))
+    assert index.nearest(10.0, 10.0, 5, 1000, statuses=Truck.STATUSES) == [(0.0, truck.id)]
+    assert not index.move(99999, 0.0, 0.0, datetime(2024, 1, 2))
+
+def test_pings_are_buffered_and_written_in_batches(app, client, make_user, make_incident, token_for, auth_headers):
+    """Test ping ingestion, batched trail writes and the nearest-truck query"""
+    admin = make_user('admin', role='admin')
+    headers = auth_headers(token_for(admin))
+    truck_ids = []
+    for plate in ('KAA 001A', 'KAA 002B', 'KAA 003C'):
+        response = client.post('/api/trucks/', data=json.dumps({'license_plate': plate}), headers=headers)
+        assert response.status_code == 201
+        truck_ids.append(json.loads(response.data)['truck']['id'])
+    response = client.post('/api/trucks/', data=json.dumps({'license_plate': 'KAA 001A'}), headers=headers)
+    assert response.status_code == 400
+    
+    app.config['FLEET_TRAIL_BATCH_SIZE'] = 30
+    app.config['FLEET_TRAIL_FLUSH_SECONDS'] = 3600
+    start = datetime.utcnow() - timedelta(minutes=5)
+    pings = [
+        {'truck_id': truck_id, 'latitude': NAIROBI[0] + 0.01 * (position + 1) + step * 1e-4, 'longitude': NAIROBI[1],
+         'recorded_at': (start + timedelta(seconds=step)).isoformat()}
+        for step in range(10) for position, truck_id in enumerate(truck_ids)
+    ]
+    response = client.post('/api/trucks/locations', data=json.dumps({'pings': pings[:20]}), headers=headers)
+    assert json.loads(response.data) == {'accepted': 20, 'ignored': 0}
+    assert TruckPosition.query.count() == 0
+    
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        client.post('/api/trucks/locations', data=json.dumps({'pings': pings[20:]}), headers=headers)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert TruckPosition.query.count() == 30
+    assert len([statement for statement in statements if statement.startswith('INSERT INTO truck_positions')]) == 1
+    assert Truck.query.get(truck_ids[0]).located_at == start + timedelta(seconds=9)
+    
+    # Out-of-order pings are dropped; unknown trucks are 404
+    stale = {'latitude': 0, 'longitude': 0, 'recorded_at': start.isoformat()}
+    response = client.put(f'/api/trucks/{truck_ids[0]}/location', data=json.dumps(stale), headers=headers)
+    assert response.status_code == 202
+    assert client.put('/api/trucks/9999/location', data=json.dumps(stale), headers=headers).status_code == 404
+    
+    client.put(f'/api/trucks/{truck_ids[2]}/location', data=json.dumps({
+        'latitude': NAIROBI[0], 'longitude': NAIROBI[1] + 0.001, 'speed_kph': 30
+    }), headers=headers)
+    trail = json.loads(client.get(f'/api/trucks/{truck_ids[2]}/trail', headers=headers).data)['trail']
+    assert len(trail) == 11 and trail[0]['speed_kph'] == 30
+    
+    client.put(f'/api/trucks/{truck_ids[1]}', data=json.dumps({'status': 'dispatched'}), headers=headers)
+    incident = make_incident(admin, latitude=NAIROBI[0], longitude=NAIROBI[1])
+    nearest = json.loads(client.get('/api/trucks/nearest', query_string={'incident_id': incident.id},
+                                    headers=headers).data)['trucks']
+    assert [truck['id'] for truck in nearest] == [truck_ids[2], truck_ids[0]]
+    assert nearest[0]['distance_meters'] == round(distance_meters(*NAIROBI, NAIROBI[0], NAIROBI[1] + 0.001))
+
+def test_trail_flush_keeps_newest_saved_position(app, make_user):
+    """Test that a flush never moves a truck's saved position backwards"""
+    truck = Truck(license_plate='KBB 100X', latitude=1.0, longitude=1.0, located_at=datetime(2024, 1, 2))
+    db.session.add(truck)
+    db.session.commit()
+    app.extensions['fleet_trail'].add([
+        {'truck_id': truck.id, 'latitude': 2.0, 'longitude': 2.0, 'speed_kph': None, 'heading': None,
+         'recorded_at': datetime(2024, 1, 1)}
+    ])
+    assert flush_trail() == 1
+    db.session.refresh(truck)
+    assert (truck.latitude, truck.located_at) == (1.0, datetime(2024, 1, 2))
+
+def test_buffered_pings_flush_without_further_traffic(file_app):
+    """Test that the flush thread writes a lone ping once the flush interval passes"""
+    file_app.config['FLEET_TRAIL_FLUSH_SECONDS'] = 0.05
+    truck = Truck(license_plate='KBB 200X')
+    db.session.add(truck)
+    db.session.commit()
+    
+    assert record_pings([{'truck_id': truck.id, 'latitude': 1.5, 'longitude': 2.5, 'speed_kph': None,
+                          'heading': None, 'recorded_at': datetime.utcnow()}]) == 1
+    deadline = time.monotonic() + 5
+    while not TruckPosition.query.count() and time.monotonic() < deadline:
+        db.session.rollback()
+        time.sleep(0.02)
+    assert TruckPosition.query.count() == 1
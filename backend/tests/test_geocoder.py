@@ -0,0 +1,78 @@
+import csv
+import json
+import pytest
+from app import db
+from app.models.incident import Incident
+from app.utils.geocoder import Gazetteer, build_gazetteer
+
+PLACES = [
+    {'latitude': -1.2864, 'longitude': 36.8172, 'address': 'Kenyatta Avenue', 'city': 'Nairobi', 'state': 'Nairobi County', 'zip_code': '00100'},
+    {'latitude': -1.2630, 'longitude': 36.8040, 'address': 'Westlands Road', 'city': 'Nairobi', 'state': 'Nairobi County', 'zip_code': '00800'},
+    {'latitude': -4.0435, 'longitude': 39.6682, 'address': '', 'city': 'Mombasa', 'state': 'Mombasa County', 'zip_code': '80100'}
+]
+
+@pytest.fixture
+def gazetteer_path(app, tmp_path):
+    """Build a small gazetteer index and point the app at it"""
+    path = str(tmp_path / 'gazetteer.idx')
+    build_gazetteer(PLACES, path, 0.05)
+    app.config['GEOCODER_INDEX_PATH'] = path
+    app.extensions.pop('geocoder', None)
+    yield path
+    app.extensions.pop('geocoder', None)
+
+def test_nearest_place_within_range(tmp_path):
+    """Test nearest-neighbour lookups across cells and the distance cut-off"""
+    path = str(tmp_path / 'gazetteer.idx')
+    assert build_gazetteer(PLACES, path, 0.01) == 3
+    gazetteer = Gazetteer(path)
+    
+    assert len(gazetteer) == 3
+    assert gazetteer.nearest(-1.2870, 36.8180, 2000)['address'] == 'Kenyatta Avenue'
+    assert gazetteer.nearest(-1.2650, 36.8050, 2000)['zip_code'] == '00800'
+    assert gazetteer.nearest(-4.0400, 39.6700, 2000) == {
+        'city': 'Mombasa', 'state': 'Mombasa County', 'zip_code': '80100'
+    }
+    assert gazetteer.nearest(-1.2864, 36.8800, 2000) is None
+    assert gazetteer.nearest(10.0, 10.0, 2000) is None
+
+def test_incident_creation_fills_missing_fields(client, gazetteer_path, make_user, token_for, auth_headers):
+    """Test that ingest fills only the location fields the client left empty"""
+    response = client.post('/api/incidents/', data=json.dumps({
+        'title': 'Blocked drainage',
+        'description': 'Drainage channel blocked with rubbish near the bus stage',
+        'category': 'environmental',
+        'latitude': -1.2870,
+        'longitude': 36.8180,
+        'address': 'Moi Avenue stage'
+    }), headers=auth_headers(token_for(make_user())))
+    assert response.status_code == 201
+    
+    incident = db.session.get(Incident, json.loads(response.data)['incident']['id'])
+    assert (incident.address, incident.city, incident.zip_code) == ('Moi Avenue stage', 'Nairobi', '00100')
+
+def test_backfill_command(app, tmp_path, make_user, make_incident):
+    """Test building the index from CSV and backfilling existing incidents"""
+    csv_path = tmp_path / 'places.csv'
+    with open(csv_path, 'w', newline='') as handle:
+        writer = csv.DictWriter(handle, fieldnames=list(PLACES[0]))
+        writer.writeheader()
+        writer.writerows(PLACES)
+    index_path = str(tmp_path / 'gazetteer.idx')
+    app.config['GEOCODER_INDEX_PATH'] = index_path
+    app.extensions.pop('geocoder', None)
+    
+    reporter = make_user()
+    near = make_incident(reporter, latitude=-4.0440, longitude=39.6690)
+    remote = make_incident(reporter, latitude=3.0, longitude=30.0)
+    
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['geocode', 'build', str(csv_path)])
+    assert 'Indexed 3 place(s)' in result.output
+    result = runner.invoke(args=['geocode', 'backfill', '--batch-size', '1'])
+    assert 'Geocoded 1/2 incident(s)' in result.output
+    
+    db.session.expire_all()
+    assert db.session.get(Incident, near.id).city == 'Mombasa'
+    assert db.session.get(Incident, remote.id).city is None
+    app.extensions.pop('geocoder', None)
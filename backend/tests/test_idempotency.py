@@ -0,0 +1,106 @@
+import json
+import threading
+from datetime import datetime, timedelta
+from flask_jwt_extended import create_access_token
+from app import db
+from app.models.idempotency import IdempotencyKey
+from app.models.incident import Incident
+from app.models.user import User
+
+INCIDENT = {
+    'title': 'Broken street light',
+    'description': 'The light at the junction has been out for a week',
+    'category': 'infrastructure',
+    'latitude': -1.2921,
+    'longitude': 36.8219
+}
+
+def test_retried_create_replays_stored_response(client, make_user, token_for, auth_headers):
+    """Test that a retried incident report returns the first response without creating another"""
+    headers = {**auth_headers(token_for(make_user())), 'Idempotency-Key': 'report-1'}
+    
+    first = client.post('/api/incidents/', data=json.dumps(INCIDENT), headers=headers)
+    second = client.post('/api/incidents/', data=json.dumps(INCIDENT), headers=headers)
+    
+    assert first.status_code == second.status_code == 201
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert second.data == first.data
+    assert Incident.query.count() == 1
+
+def test_key_reused_for_different_request(client, make_user, make_incident, token_for, auth_headers):
+    """Test that reusing a key with another payload is rejected"""
+    user = make_user()
+    incident = make_incident(user)
+    headers = {**auth_headers(token_for(user)), 'Idempotency-Key': 'vote-1'}
+    
+    response = client.post(f'/api/incidents/{incident.id}/vote',
+                           data=json.dumps({'vote_type': 'upvote'}), headers=headers)
+    assert response.status_code == 200
+    response = client.post(f'/api/incidents/{incident.id}/vote',
+                           data=json.dumps({'vote_type': 'downvote'}), headers=headers)
+    assert response.status_code == 422
+
+def test_failed_requests_release_the_key(client, make_user, token_for, auth_headers):
+    """Test that a rejected request can be corrected and retried with the same key"""
+    headers = {**auth_headers(token_for(make_user())), 'Idempotency-Key': 'report-2'}
+    
+    response = client.post('/api/incidents/', data=json.dumps({**INCIDENT, 'category': 'bogus'}),
+                           headers=headers)
+    assert response.status_code == 400
+    response = client.post('/api/incidents/', data=json.dumps(INCIDENT), headers=headers)
+    assert response.status_code == 201
+    assert 'Idempotent-Replayed' not in response.headers
+
+def test_in_flight_key_returns_conflict(client, make_user, token_for, auth_headers):
+    """Test that a retry arriving while the first request is still running is told to wait"""
+    user = make_user()
+    db.session.add(IdempotencyKey(user_id=user.id, key='report-3', request_hash=b'x' * 32,
+                                  expires_at=datetime.utcnow() + timedelta(hours=1)))
+    db.session.commit()
+    
+    response = client.post('/api/incidents/', data=json.dumps(INCIDENT),
+                           headers={**auth_headers(token_for(user)), 'Idempotency-Key': 'report-3'})
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
+    assert Incident.query.count() == 0
+
+def test_purge_expired_keys(app, make_user):
+    """Test that expired keys are purged"""
+    now = datetime.utcnow()
+    for key, expires_at in (('old', now - timedelta(seconds=1)), ('fresh', now + timedelta(hours=1))):
+        db.session.add(IdempotencyKey(user_id=1, key=key, request_hash=b'x' * 32, expires_at=expires_at))
+    db.session.commit()
+    
+    assert IdempotencyKey.purge_expired() == 1
+    assert [record.key for record in IdempotencyKey.query] == ['fresh']
+
+def test_concurrent_retries_create_one_incident(file_app):
+    """Test that simultaneous retries with one key run the handler once"""
+    user = User(username='citizen', email='citizen@example.com', first_name='C', last_name='T')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    headers = {
+        'Authorization': f'Bearer {create_access_token(identity=user.id)}',
+        'Content-Type': 'application/json',
+        'Idempotency-Key': 'burst'
+    }
+    barrier = threading.Barrier(6)
+    statuses = []
+    
+    def send():
+        with file_app.app_context():
+            client = file_app.test_client()
+            barrier.wait()
+            statuses.append(client.post('/api/incidents/', data=json.dumps(INCIDENT), headers=headers).status_code)
+            db.session.remove()
+    
+    threads = [threading.Thread(target=send) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert Incident.query.count() == 1
+    assert statuses.count(201) >= 1
+    assert set(statuses) <= {201, 409}
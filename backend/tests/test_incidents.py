@@ -0,0 +1,326 @@
+import json
+import pytest
+from app import db
+from app.models.incident import Incident
+from app.utils.ranking import scores_for
+
+def test_listing_map_view_returns_only_map_fields(client, make_user, make_incident):
+    """Test that ?view=map returns the map preset only"""
+    user = make_user()
+    make_incident(user)
+    
+    response = client.get('/api/incidents/?view=map')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert set(data['incidents'][0]) == {'id', 'latitude', 'longitude', 'status', 'category'}
+
+def test_listing_fields_selector(client, make_user, make_incident):
+    """Test that ?fields= selects keys and always includes id"""
+    user = make_user()
+    make_incident(user, upvotes=3, downvotes=1)
+    
+    response = client.get('/api/incidents/?fields=title,vote_count')
+    assert response.status_code == 200
+    incident = json.loads(response.data)['incidents'][0]
+    assert set(incident) == {'id', 'title', 'vote_count'}
+    assert incident['vote_count'] == 2
+
+def test_listing_rejects_unknown_fields(client):
+    """Test that unknown fields and views are rejected"""
+    assert client.get('/api/incidents/?fields=title,password').status_code == 400
+    assert client.get('/api/incidents/?view=huge').status_code == 400
+
+def test_load_options_defer_unrequested_columns(app, make_user, make_incident):
+    """Test that sparse queries leave heavy columns and relationships unloaded"""
+    user = make_user()
+    make_incident(user)
+    db.session.expunge_all()
+    
+    fields = Incident.resolve_fields(view='map')
+    incident = Incident.query.options(*Incident.load_options(fields)).first()
+    unloaded = db.inspect(incident).unloaded
+    assert {'description', 'images', 'contact_info', 'reporter'} <= unloaded
+    assert incident.to_dict(fields)['category'] == 'infrastructure'
+
+def test_full_view_matches_default_serialization(client, make_user, make_incident):
+    """Test that the full view keeps the original payload shape"""
+    user = make_user()
+    make_incident(user)
+    
+    incident = json.loads(client.get('/api/incidents/?view=full').data)['incidents'][0]
+    assert set(incident) == set(Incident.FIELDS)
+    assert incident['reporter']['username'] == 'citizen'
+
+def test_map_clusters_by_grid_cell(client, make_user, make_incident):
+    """Test that the map endpoint aggregates nearby incidents into one cluster"""
+    user = make_user()
+    make_incident(user, latitude=-1.2921, longitude=36.8219)
+    make_incident(user, latitude=-1.2925, longitude=36.8222, status='resolved')
+    make_incident(user, latitude=40.7128, longitude=-74.0060)
+    
+    response = client.get('/api/incidents/map?bbox=36.5,-1.5,37.0,-1.0&zoom=10')
+    assert response.status_code == 200
+    assert 'max-age' in response.headers['Cache-Control']
+    data = json.loads(response.data)
+    assert data['mode'] == 'clusters'
+    assert len(data['clusters']) == 1
+    cluster = data['clusters'][0]
+    assert cluster['count'] == 2
+    assert cluster['status_counts']['open'] == 1
+    assert cluster['status_counts']['resolved'] == 1
+    assert cluster['latitude'] == pytest.approx(-1.2923)
+    assert cluster['longitude'] == pytest.approx(36.82205)
+    assert cluster['bounds']['south'] <= cluster['latitude'] <= cluster['bounds']['north']
+    assert cluster['bounds']['west'] <= cluster['longitude'] <= cluster['bounds']['east']
+
+def test_map_returns_points_at_high_zoom(client, make_user, make_incident):
+    """Test that raw points are returned from MAP_POINT_ZOOM upwards"""
+    user = make_user()
+    make_incident(user)
+    
+    response = client.get('/api/incidents/map?bbox=36.82,-1.293,36.823,-1.291&zoom=17')
+    data = json.loads(response.data)
+    assert data['mode'] == 'points'
+    assert set(data['points'][0]) == {'id', 'latitude', 'longitude', 'status', 'category'}
+    assert data['truncated'] is False
+
+def test_map_flags_truncated_points(app, client, make_user, make_incident):
+    """Test that hitting MAP_MAX_POINTS is reported instead of silently cutting the list"""
+    app.config['MAP_MAX_POINTS'] = 1
+    user = make_user()
+    make_incident(user)
+    make_incident(user, latitude=-1.2922)
+    
+    data = json.loads(client.get('/api/incidents/map?bbox=36.82,-1.293,36.823,-1.291&zoom=17').data)
+    assert (len(data['points']), data['truncated']) == (1, True)
+
+def test_map_tile_cells_stay_inside_their_tile(client, make_user, make_incident):
+    """Test that cluster cells split the tile's Mercator span, so none straddles a tile edge"""
+    import math
+    
+    zoom, x, y = 6, 38, 32
+    edge = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / 2 ** zoom))))
+    user = make_user()
+    make_incident(user, latitude=edge + 0.001, longitude=36.82)
+    make_incident(user, latitude=edge - 0.001, longitude=36.82)
+    
+    counts = 0
+    for tile_y in (y, y + 1):
+        north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / 2 ** zoom))))
+        south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (tile_y + 1) / 2 ** zoom))))
+        data = json.loads(client.get(f'/api/incidents/map/tiles/{zoom}/{x}/{tile_y}').data)
+        for cluster in data['clusters']:
+            assert south - 1e-9 <= cluster['bounds']['south'] < cluster['bounds']['north'] <= north + 1e-9
+            assert cluster['bounds']['south'] <= cluster['latitude'] <= cluster['bounds']['north']
+            counts += cluster['count']
+    assert counts == 2
+
+def test_map_tile_is_conditional(client, make_user, make_incident):
+    """Test that tiles carry an ETag and honour If-None-Match"""
+    user = make_user()
+    make_incident(user)
+    
+    response = client.get('/api/incidents/map/tiles/2/2/2')
+    assert response.status_code == 200
+    assert json.loads(response.data)['clusters'][0]['count'] == 1
+    
+    cached = client.get('/api/incidents/map/tiles/2/2/2',
+                        headers={'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+    assert client.get('/api/incidents/map/tiles/2/9/1').status_code == 400
+
+def test_create_incident_flags_nearby_duplicate(client, make_user, make_incident, token_for, auth_headers):
+    """Test that a similar nearby report is created with the existing incident suggested,
+    and only blocked when the client asks for the check"""
+    from app.utils.dedup import text_signature
+    
+    user = make_user()
+    existing = make_incident(user, text_signature=text_signature(
+        'Pothole on Main Street', 'Large pothole near the bus stop'))
+    make_incident(user, title='Pothole on Main Street', category='traffic')
+    headers = auth_headers(token_for(make_user('neighbour')))
+    payload = {
+        'title': 'Huge pothole on Main Street',
+        'description': 'There is a large pothole by the bus stop',
+        'category': 'infrastructure',
+        'latitude': -1.2922,
+        'longitude': 36.8220
+    }
+    
+    response = client.post('/api/incidents/', data=json.dumps(dict(payload, check_duplicates=True)),
+                           headers=headers)
+    assert response.status_code == 409
+    duplicates = json.loads(response.data)['duplicates']
+    assert [duplicate['id'] for duplicate in duplicates] == [existing.id]
+    assert duplicates[0]['vote_url'] == f'/api/incidents/{existing.id}/vote'
+    assert duplicates[0]['distance_meters'] < 20
+    
+    response = client.post('/api/incidents/', data=json.dumps(payload), headers=headers)
+    assert response.status_code == 201
+    assert [duplicate['id'] for duplicate in json.loads(response.data)['possible_duplicates']] == [existing.id]
+    
+    # Retries and resubmissions by the same user count once
+    client.post('/api/incidents/', data=json.dumps(dict(payload, check_duplicates=True)), headers=headers)
+    db.session.expire_all()
+    assert db.session.get(Incident, existing.id).duplicate_reports == 1
+    
+    payload['confirm_new'] = True
+    response = client.post('/api/incidents/', data=json.dumps(payload), headers=headers)
+    assert response.status_code == 201
+    assert 'possible_duplicates' not in json.loads(response.data)
+
+def test_duplicate_candidates_keep_the_newest(app, make_user, make_incident):
+    """Test that the candidate cap drops the oldest incidents, not an arbitrary subset"""
+    from datetime import datetime, timedelta
+    from app.utils.dedup import find_duplicates, text_signature
+    
+    app.config['DUPLICATE_MAX_CANDIDATES'] = 2
+    user = make_user()
+    signature = text_signature('Pothole on Main Street', 'Large pothole near the bus stop')
+    unrelated = text_signature('Flooded underpass', 'Drain blocked after rain')
+    # Lower latitudes come first in the dedup index, so an unordered scan would stop at these
+    for offset in range(3):
+        make_incident(user, latitude=-1.2925 - offset * 0.0001, text_signature=unrelated,
+                      created_at=datetime.utcnow() - timedelta(days=2, hours=offset))
+    existing = make_incident(user, text_signature=signature, created_at=datetime.utcnow() - timedelta(hours=1))
+    
+    duplicates = find_duplicates('infrastructure', -1.2921, 36.8219, signature)
+    assert [duplicate['id'] for duplicate in duplicates] == [existing.id]
+
+def test_create_incident_ignores_distant_or_unrelated_reports(client, make_user, make_incident,
+                                                              token_for, auth_headers):
+    """Test that far away, resolved or dissimilar incidents are not flagged"""
+    from app.utils.dedup import text_signature
+    
+    user = make_user()
+    signature = text_signature('Pothole on Main Street', 'Large pothole near the bus stop')
+    make_incident(user, latitude=-1.30, text_signature=signature)
+    make_incident(user, status='resolved', text_signature=signature)
+    make_incident(user, text_signature=text_signature('Flooded underpass', 'Drain blocked after rain'))
+    
+    response = client.post('/api/incidents/', data=json.dumps({
+        'title': 'Pothole on Main Street',
+        'description': 'Large pothole near the bus stop',
+        'category': 'infrastructure',
+        'latitude': -1.2921,
+        'longitude': 36.8219
+    }), headers=auth_headers(token_for(make_user('neighbour'))))
+    assert response.status_code == 201
+    
+    incident = Incident.query.get(json.loads(response.data)['incident']['id'])
+    assert incident.text_signature == signature
+    assert 'text_signature' not in json.loads(response.data)['incident']
+
+def test_vote_ledger_one_vote_per_user(client, make_user, make_incident, token_for, auth_headers):
+    """Test that repeat votes change rather than add, and retraction restores counters"""
+    incident = make_incident(make_user())
+    voter = auth_headers(token_for(make_user('voter')))
+    other = auth_headers(token_for(make_user('other')))
+    url = f'/api/incidents/{incident.id}/vote'
+    
+    def vote(headers, vote_type):
+        response = client.post(url, data=json.dumps({'vote_type': vote_type}), headers=headers)
+        assert response.status_code == 200
+        return json.loads(response.data)['incident']
+    
+    assert vote(voter, 'upvote')['upvotes'] == 1
+    assert vote(voter, 'upvote')['upvotes'] == 1
+    assert vote(other, 'upvote')['upvotes'] == 2
+    
+    counts = vote(voter, 'downvote')
+    assert (counts['upvotes'], counts['downvotes'], counts['vote_count']) == (1, 1, 0)
+    
+    response = client.delete(url, headers=voter)
+    counts = json.loads(response.data)['incident']
+    assert (counts['upvotes'], counts['downvotes']) == (1, 0)
+    
+    db.session.expire_all()
+    assert (Incident.query.get(incident.id).upvotes, incident.votes.count()) == (1, 1)
+    
+    # Scores are rewritten by the counter UPDATE itself
+    incident = Incident.query.get(incident.id)
+    assert (incident.trending_score, incident.urgency_score) == pytest.approx(scores_for(incident), rel=1e-3)
+    assert incident.urgency_score > 200
+
+def test_my_votes_for_listing_page(client, make_user, make_incident, token_for, auth_headers):
+    """Test the batched "my votes" lookup"""
+    reporter = make_user()
+    first, second, third = (make_incident(reporter) for _ in range(3))
+    headers = auth_headers(token_for(make_user('voter')))
+    client.post(f'/api/incidents/{first.id}/vote', data=json.dumps({'vote_type': 'upvote'}), headers=headers)
+    client.post(f'/api/incidents/{third.id}/vote', data=json.dumps({'vote_type': 'downvote'}), headers=headers)
+    
+    response = client.get(f'/api/incidents/votes/mine?ids={first.id},{second.id},{third.id}', headers=headers)
+    assert response.status_code == 200
+    assert json.loads(response.data)['votes'] == {str(first.id): 'upvote', str(third.id): 'downvote'}
+
+def test_trending_sort_uses_precomputed_scores(client, make_user, make_incident, token_for, auth_headers):
+    """Test that votes refresh the trending score and ?sort=trending orders by it"""
+    from datetime import datetime, timedelta
+    from app.utils.ranking import decay_scores
+    
+    reporter = make_user()
+    old = make_incident(reporter, title='Old popular', created_at=datetime.utcnow() - timedelta(days=10),
+                        upvotes=20)
+    quiet = make_incident(reporter, title='Quiet new')
+    voted = make_incident(reporter, title='Voted new')
+    assert decay_scores() == 3
+    
+    headers = auth_headers(token_for(make_user('voter')))
+    client.post(f'/api/incidents/{voted.id}/vote', data=json.dumps({'vote_type': 'upvote'}), headers=headers)
+    
+    response = client.get('/api/incidents/?sort=trending&fields=title')
+    titles = [incident['title'] for incident in json.loads(response.data)['incidents']]
+    assert titles == ['Voted new', 'Quiet new', 'Old popular']
+    assert client.get('/api/incidents/?sort=random').status_code == 400
+
+def test_score_decay_matches_python_scores(app, make_user, make_incident):
+    """Test that the job worker's set-based rescoring computes the same scores as scores_for"""
+    from datetime import datetime, timedelta
+    from app.utils.jobs import run_periodic
+    
+    reporter = make_user()
+    aged = make_incident(reporter, created_at=datetime.utcnow() - timedelta(days=20), upvotes=6,
+                         downvotes=1, duplicate_reports=2, priority='high')
+    closed = make_incident(reporter, status='closed', trending_score=3.0, urgency_score=400)
+    last_run = {}
+    run_periodic(app.config, last_run)
+    assert 'score_decay' in last_run
+    
+    db.session.expire_all()
+    aged = db.session.get(Incident, aged.id)
+    assert (aged.trending_score, aged.urgency_score) == pytest.approx(scores_for(aged), rel=1e-6)
+    assert aged.urgency_score > 400 + 11 * 3
+    closed = db.session.get(Incident, closed.id)
+    assert (closed.trending_score, closed.urgency_score) == (0, 0)
+
+def test_trending_scores_are_time_anchored(app):
+    """Test that a trending score does not depend on when it was computed, and that one
+    half-life of age is worth doubling engagement"""
+    from datetime import datetime, timedelta
+    from app.utils.ranking import trending_score
+    
+    created = datetime(2024, 3, 1, 12)
+    half_life = timedelta(hours=app.config['TRENDING_HALF_LIFE_HOURS'])
+    assert trending_score(5, 'medium', 0, created, created) == \
+        trending_score(5, 'medium', 0, created, created + timedelta(days=30))
+    # Engagement 8 (1 + 5 votes + medium's 2) against 4 (1 + 1 vote + 2), one half-life later
+    assert trending_score(5, 'medium', 0, created, created) == \
+        pytest.approx(trending_score(1, 'medium', 0, created + half_life, created + half_life))
+
+def test_urgent_sort_prefers_priority_and_zeroes_resolved(client, make_user, make_incident, token_for, auth_headers):
+    """Test urgency ordering and that resolving an incident drops it from the ranking"""
+    from app.utils.ranking import decay_scores
+    
+    admin = make_user('admin', role='admin')
+    low = make_incident(admin, title='Low priority', priority='low', upvotes=5)
+    critical = make_incident(admin, title='Critical priority', priority='critical')
+    decay_scores()
+    
+    titles = [i['title'] for i in json.loads(client.get('/api/incidents/?sort=urgent').data)['incidents']]
+    assert titles == ['Critical priority', 'Low priority']
+    
+    client.put(f'/api/incidents/{critical.id}', data=json.dumps({'status': 'resolved'}),
+               headers=auth_headers(token_for(admin)))
+    assert Incident.query.get(critical.id).urgency_score == 0
+    assert Incident.query.get(low.id).urgency_score > 0
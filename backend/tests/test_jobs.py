@@ -0,0 +1,196 @@
+import json
+import socketserver
+import threading
+from datetime import datetime, timedelta
+import pytest
+from app import create_app, db
+from app.models.job import Job
+from config import config, TestingConfig
+from app.utils import jobs
+from app.utils.jobs import enqueue, job_handler, run_pending
+
+class SMTPStub(socketserver.StreamRequestHandler):
+    """Minimal local SMTP server that records delivered messages"""
+    
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+    
+    def handle(self):
+        self.reply('220 localhost stub')
+        envelope = {'to': [], 'data': ''}
+        while True:
+            line = self.rfile.readline().decode().rstrip('\r\n')
+            command = line[:4].upper()
+            if not line or command == 'QUIT':
+                self.reply('221 bye')
+                return
+            if command == 'EHLO':
+                self.reply('250 localhost')
+            elif command == 'RCPT':
+                envelope['to'].append(line.split(':', 1)[1].strip(' <>'))
+                self.reply('250 ok')
+            elif command == 'DATA':
+                self.reply('354 go ahead')
+                lines = []
+                while True:
+                    data = self.rfile.readline().decode()
+                    if data.rstrip('\r\n') == '.':
+                        break
+                    lines.append(data)
+                envelope['data'] = ''.join(lines)
+                self.server.messages.append(envelope)
+                envelope = {'to': [], 'data': ''}
+                self.reply('250 queued')
+            else:
+                self.reply('250 ok')
+
+@pytest.fixture
+def smtp_server(app):
+    """Run a local SMTP stand-in and point Flask-Mail at it"""
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), SMTPStub)
+    server.messages = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    app.config.update(
+        MAIL_SERVER='127.0.0.1',
+        MAIL_PORT=server.server_address[1],
+        MAIL_USE_TLS=False,
+        MAIL_USERNAME=None,
+        MAIL_SUPPRESS_SEND=False
+    )
+    app.extensions.pop('mail', None)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def always_fails():
+    """Register a handler that always raises, and unregister it afterwards"""
+    calls = []
+    
+    @job_handler('always_fails')
+    def handler(payload):
+        calls.append(payload)
+        raise RuntimeError('smtp down')
+    
+    yield calls
+    jobs._handlers.pop('always_fails', None)
+
+def test_update_enqueues_and_worker_sends_batched_email(client, make_user, make_incident,
+                                                        token_for, auth_headers, smtp_server):
+    """Test that status changes are queued and delivered as one digest per user"""
+    admin = make_user('admin', role='admin')
+    citizen = make_user('citizen')
+    first = make_incident(citizen)
+    second = make_incident(citizen, title='Broken street light')
+    headers = auth_headers(token_for(admin))
+    
+    response = client.put(f'/api/incidents/{first.id}', data=json.dumps({'status': 'resolved'}),
+                          headers=headers)
+    assert response.status_code == 200
+    assert json.loads(response.data)['incident']['resolved_at'] is not None
+    client.put(f'/api/incidents/{second.id}', data=json.dumps({'status': 'in_progress'}),
+               headers=headers)
+    
+    # Nothing is sent inline
+    assert smtp_server.messages == []
+    assert Job.query.filter_by(status='queued').count() == 2
+    
+    assert run_pending() == 2
+    assert len(smtp_server.messages) == 1
+    message = smtp_server.messages[0]
+    assert message['to'] == ['citizen@example.com']
+    assert 'has been resolved' in message['data']
+    assert 'is now in_progress' in message['data']
+    assert Job.query.filter_by(status='done').count() == 2
+
+def test_assignment_notifies_assignee(client, make_user, make_incident, token_for, auth_headers):
+    """Test that assigning an incident queues a notification for the assignee"""
+    admin = make_user('admin', role='admin')
+    other = make_user('other_admin', role='admin')
+    incident = make_incident(make_user('citizen'))
+    
+    response = client.post(f'/api/incidents/{incident.id}/assign',
+                           data=json.dumps({'admin_id': other.id}),
+                           headers=auth_headers(token_for(admin)))
+    assert response.status_code == 200
+    job = Job.query.one()
+    assert job.payload['event'] == 'assigned'
+    assert job.batch_key == f'notify:{other.id}'
+
+def test_failing_job_backs_off_then_dead_letters(client, app, make_user, token_for, auth_headers, always_fails):
+    """Test retries with exponential backoff and the dead-letter view"""
+    calls = always_fails
+    job = enqueue('always_fails', {'n': 1}, max_attempts=2)
+    db.session.commit()
+    
+    assert run_pending() == 1
+    db.session.refresh(job)
+    assert (job.status, job.attempts) == ('queued', 1)
+    assert job.run_at > datetime.utcnow() + timedelta(seconds=app.config['JOBS_RETRY_BASE_SECONDS'] - 5)
+    assert run_pending() == 0
+    
+    job.run_at = datetime.utcnow()
+    db.session.commit()
+    run_pending()
+    db.session.refresh(job)
+    assert job.status == 'dead'
+    assert 'smtp down' in job.last_error
+    assert len(calls) == 2
+    
+    headers = auth_headers(token_for(make_user('admin', role='admin')))
+    dead = json.loads(client.get('/api/admin/jobs', headers=headers).data)['jobs']
+    assert [item['id'] for item in dead] == [job.id]
+    
+    response = client.post(f'/api/admin/jobs/{job.id}/retry', headers=headers)
+    assert response.status_code == 200
+    assert Job.query.get(job.id).status == 'queued'
+
+def test_stale_running_job_counts_an_attempt_and_dead_letters(app, always_fails):
+    """Test that a job whose worker keeps dying is reclaimed with an attempt, then dead-lettered"""
+    job = enqueue('always_fails', {'n': 1}, max_attempts=2)
+    db.session.commit()
+    stale = timedelta(seconds=app.config['JOBS_LOCK_TIMEOUT_SECONDS'] + 1)
+    
+    job.status, job.locked_at = 'running', datetime.utcnow() - stale
+    db.session.commit()
+    assert run_pending() == 1
+    db.session.refresh(job)
+    # One attempt for the dead worker, one for this run's failure
+    assert (job.status, job.attempts) == ('dead', 2)
+    
+    job = enqueue('always_fails', {'n': 2}, max_attempts=2)
+    job.status, job.attempts, job.locked_at = 'running', 1, datetime.utcnow() - stale
+    db.session.commit()
+    assert run_pending() == 0
+    db.session.refresh(job)
+    assert (job.status, job.attempts) == ('dead', 2)
+    assert job.finished_at is not None and job.locked_at is None
+    assert 'Worker stopped' in job.last_error
+    assert always_fails == [{'n': 1}]
+
+def test_thread_worker_starts_with_the_first_request(tmp_path, monkeypatch):
+    """Test that the in-process worker starts under `flask run` but not for other CLI commands"""
+    monkeypatch.setenv('FLASK_RUN_FROM_CLI', 'true')
+    monkeypatch.setitem(config, 'thread_worker', type('ThreadWorkerConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "app.db"}',
+        'JOBS_WORKER': 'thread'
+    }))
+    app = create_app('thread_worker')
+    with app.app_context():
+        db.create_all()
+    assert 'job_worker' not in app.extensions
+    
+    assert app.test_client().get('/health').status_code == 200
+    thread, stop_event = app.extensions['job_worker']
+    assert thread.is_alive()
+    app.test_client().get('/health')
+    assert app.extensions['job_worker'][0] is thread
+    
+    stop_event.set()
+    thread.join(5)
+    assert not thread.is_alive()
+
+def test_periodic_tasks_are_registered(app):
+    """Test that maintenance runs from the job worker rather than needing cron"""
+    assert {'sla_breaches', 'rollups', 'score_decay'} <= set(jobs._periodic)
@@ -0,0 +1,83 @@
+import json
+import pytest
+from app.utils.ratelimit import MemoryBackend, PoolWaitMonitor, parse_budget
+
+def test_login_budget_returns_429_with_retry_after(app, client):
+    """Test that the per-route login budget is enforced per IP"""
+    app.config['RATELIMIT_BUDGETS'] = {'auth.login': '3/minute'}
+    payload = json.dumps({'email': 'nobody@example.com', 'password': 'wrongpassword'})
+    
+    statuses = [
+        client.post('/api/auth/login', data=payload, content_type='application/json').status_code
+        for _ in range(4)
+    ]
+    assert statuses == [401, 401, 401, 429]
+    
+    response = client.post('/api/auth/login', data=payload, content_type='application/json')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    
+    # A forged X-Forwarded-For does not buy a fresh bucket
+    spoofed = client.post('/api/auth/login', data=payload, content_type='application/json',
+                          headers={'X-Forwarded-For': '203.0.113.9'})
+    assert spoofed.status_code == 429
+    
+    # Other clients have their own bucket
+    other = client.post('/api/auth/login', data=payload, content_type='application/json',
+                        environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert other.status_code == 401
+
+def test_authenticated_users_are_limited_per_user(app, client, make_user, token_for, auth_headers):
+    """Test that authenticated requests are keyed by user rather than IP"""
+    app.config['RATELIMIT_BUDGETS'] = {'incidents.get_user_incidents': '2/minute'}
+    first = auth_headers(token_for(make_user('first')))
+    second = auth_headers(token_for(make_user('second')))
+    
+    assert [client.get('/api/incidents/user/incidents', headers=first).status_code
+            for _ in range(3)] == [200, 200, 429]
+    assert client.get('/api/incidents/user/incidents', headers=second).status_code == 200
+    assert client.get('/health').status_code == 200
+
+def test_load_shedding_rejects_anonymous_listings(app, client, make_user, token_for, auth_headers):
+    """Test that anonymous listings are shed while the pool wait average is high"""
+    client.get('/api/incidents/')
+    app.extensions['ratelimit']['pool_wait'].average = 1.0
+    
+    response = client.get('/api/incidents/')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(app.config['LOAD_SHED_RETRY_AFTER'])
+    
+    headers = auth_headers(token_for(make_user()))
+    assert client.get('/api/incidents/', headers=headers).status_code == 200
+
+def test_pool_wait_average_decays_while_shedding():
+    """Test that the pool wait average falls off with time when no checkouts are measured"""
+    monitor = PoolWaitMonitor(alpha=1.0, half_life=5.0)
+    monitor.record(1.0)
+    assert monitor.should_shed(250)
+    
+    monitor.updated -= 10
+    assert monitor.current() == pytest.approx(0.25, rel=0.01)
+    monitor.updated -= 10
+    assert not monitor.should_shed(250)
+
+def test_memory_bucket_refills():
+    """Test token bucket refill arithmetic"""
+    capacity, rate = parse_budget('2/second')
+    bucket = MemoryBackend()
+    assert [bucket.take('k', capacity, rate, 100.0)[0] for _ in range(3)] == [True, True, False]
+    assert bucket.take('k', capacity, rate, 100.5)[0] is True
+    assert bucket.take('k', capacity, rate, 100.5)[0] is False
+
+def test_memory_buckets_are_swept_once_refilled():
+    """Test that buckets back at capacity are dropped, so many clients do not grow memory forever"""
+    capacity, rate = parse_budget('2/second')
+    bucket = MemoryBackend(sweep_seconds=10)
+    for address in range(1000):
+        bucket.take(f'ip:{address}', capacity, rate, 100.0)
+    bucket.take('busy', capacity, rate, 105.0)
+    assert len(bucket) == 1001
+    
+    # The next sweep drops every bucket that has refilled, keeping the one just used
+    assert bucket.take('busy', capacity, rate, 111.0) == (True, 1.0)
+    assert len(bucket) == 1
@@ -0,0 +1,98 @@
+import json
+import threading
+from types import SimpleNamespace
+from sqlalchemy import event
+from app import db
+from app.models.user import User
+from app.utils.auth import unique_violation
+
+def registration(username='citizen', email='citizen@example.com'):
+    return json.dumps({
+        'username': username,
+        'email': email,
+        'password': 'password123',
+        'first_name': 'Test',
+        'last_name': 'Citizen'
+    })
+
+def test_duplicates_rejected_without_lookup_queries(client):
+    """Test that duplicates are caught by the unique indexes, not by SELECTs before the insert"""
+    headers = {'Content-Type': 'application/json'}
+    assert client.post('/api/auth/register', data=registration(), headers=headers).status_code == 201
+    
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        response = client.post('/api/auth/register', data=registration('other', ' Citizen@Example.COM'),
+                               headers=headers)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert response.status_code == 400
+    assert json.loads(response.data)['error'] == 'User already exists'
+    assert not [statement for statement in statements if statement.startswith('SELECT') and 'FROM users' in statement]
+    
+    response = client.post('/api/auth/register', data=registration(email='new@example.com'), headers=headers)
+    assert response.status_code == 400
+    assert json.loads(response.data)['error'] == 'Username taken'
+    
+    assert User.find_by_email('CITIZEN@example.com').username == 'citizen'
+
+def test_concurrent_registrations_create_one_user(file_app):
+    """Test that simultaneous sign-ups for one email create a single account"""
+    barrier = threading.Barrier(8)
+    statuses = []
+    
+    def register(index):
+        with file_app.app_context():
+            client = file_app.test_client()
+            barrier.wait()
+            email = 'CITIZEN@example.com' if index % 2 else 'citizen@Example.com'
+            response = client.post('/api/auth/register', data=registration(f'citizen{index}', email),
+                                   headers={'Content-Type': 'application/json'})
+            statuses.append(response.status_code)
+            db.session.remove()
+    
+    threads = [threading.Thread(target=register, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert sorted(statuses) == [201] + [400] * 7
+    assert User.query.count() == 1
+
+def test_normalize_emails_command(app):
+    """Test backfilling normalized emails and refusing case-only duplicates"""
+    for username, email in (('first', 'First@Example.com'), ('second', 'second@example.com')):
+        user = User(username=username, email=email, first_name='T', last_name='C', password='password123')
+        db.session.add(user)
+    db.session.commit()
+    User.query.update({'email_normalized': None})
+    db.session.commit()
+    assert User.find_by_email(' FIRST@example.com').username == 'first'
+    
+    result = app.test_cli_runner().invoke(args=['users', 'normalize-emails'])
+    assert 'Normalized 2' in result.output
+    assert User.find_by_email('first@example.com').username == 'first'
+    
+    User.query.filter_by(username='second').update({'email': 'FIRST@example.com ', 'email_normalized': None})
+    db.session.commit()
+    result = app.test_cli_runner().invoke(args=['users', 'normalize-emails'])
+    assert result.exit_code != 0
+    assert '2 accounts share the email first@example.com' in result.output
+
+def test_unique_violation_matches_constraint_names():
+    """Test that violations are told apart by constraint, not by words in the error text"""
+    def error(message, constraint=None):
+        orig = Exception(message)
+        orig.diag = SimpleNamespace(constraint_name=constraint)
+        return SimpleNamespace(orig=orig)
+    
+    assert unique_violation(error('UNIQUE constraint failed: users.username')) == 'username'
+    assert unique_violation(error('UNIQUE constraint failed: users.email_normalized')) == 'email'
+    assert unique_violation(error('UNIQUE constraint failed: trucks.license_plate')) is None
+    assert unique_violation(error('Key (email_normalized)=(username@example.com) already exists',
+                                  'users_email_normalized_key')) == 'email'
+    assert unique_violation(error('duplicate key value violates unique constraint "users_username_key"',
+                                  'users_username_key')) == 'username'
@@ -0,0 +1,72 @@
+import json
+import pytest
+from flask import g
+from app import create_app, db
+from app.models.incident import Incident
+from app.models.user import User
+from config import config, TestingConfig
+
+@pytest.fixture
+def replica_app(tmp_path):
+    """App with a primary and one replica, both local SQLite files"""
+    config['replica_testing'] = type('ReplicaTestingConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "primary.db"}',
+        'SQLALCHEMY_REPLICA_URIS': [f'sqlite:///{tmp_path / "replica.db"}']
+    })
+    app = create_app('replica_testing')
+    
+    with app.app_context():
+        db.create_all()
+        # The "replica" gets the same schema but its own rows, so tests can tell them apart
+        db.metadata.create_all(app.extensions['replicas']['replica_0'])
+        yield app
+        db.session.remove()
+        db.drop_all()
+    app.extensions['replicas']['replica_0'].dispose()
+    del config['replica_testing']
+
+def seed(engine, title):
+    """Insert one user and one incident directly into a database"""
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), {
+            'id': 1, 'username': 'citizen', 'email': 'citizen@example.com', 'password_hash': 'x',
+            'first_name': 'C', 'last_name': 'T', 'role': 'admin', 'is_active': True
+        })
+        connection.execute(Incident.__table__.insert(), {
+            'title': title, 'description': 'Seeded for routing tests', 'category': 'other',
+            'status': 'open', 'priority': 'medium', 'latitude': 1, 'longitude': 1, 'reported_by': 1,
+            'duplicate_reports': 0, 'trending_score': 0, 'urgency_score': 0
+        })
+
+def test_get_routes_read_from_replica(replica_app):
+    """Test that read-only listings are served by the replica"""
+    seed(db.engines[None], 'On primary')
+    seed(replica_app.extensions['replicas']['replica_0'], 'On replica')
+    
+    data = json.loads(replica_app.test_client().get('/api/incidents/?fields=title').data)
+    assert [incident['title'] for incident in data['incidents']] == ['On replica']
+
+def test_writes_pin_request_to_primary(replica_app):
+    """Test read-after-write within a replica-routed request stays on the primary"""
+    seed(db.engines[None], 'On primary')
+    seed(replica_app.extensions['replicas']['replica_0'], 'On replica')
+    
+    with replica_app.test_request_context():
+        g.use_replica = True
+        assert Incident.query.one().title == 'On replica'
+        Incident.query.filter_by(id=1).update({'title': 'Renamed'})
+        assert Incident.query.one().title == 'Renamed'
+        db.session.commit()
+    
+    with db.engines[None].connect() as connection:
+        assert connection.execute(Incident.__table__.select()).one().title == 'Renamed'
+
+def test_lagging_replica_falls_back_to_primary(replica_app, monkeypatch):
+    """Test that a replica over the lag threshold is skipped"""
+    from app.utils import replicas
+    seed(db.engines[None], 'On primary')
+    seed(replica_app.extensions['replicas']['replica_0'], 'On replica')
+    monkeypatch.setattr(replicas, '_replica_lag', lambda engine: 60.0)
+    
+    data = json.loads(replica_app.test_client().get('/api/incidents/?fields=title').data)
+    assert [incident['title'] for incident in data['incidents']] == ['On primary']
@@ -0,0 +1,80 @@
+import json
+import logging
+import queue
+import pytest
+from app import create_app, db
+from app.utils.request_log import NonBlockingQueueHandler, stop_request_logging
+from config import config, TestingConfig
+
+@pytest.fixture
+def logged_app(tmp_path):
+    """App writing request logs to a file"""
+    config['logged_testing'] = type('LoggedTestingConfig', (TestingConfig,), {
+        'REQUEST_LOG_ENABLED': True,
+        'REQUEST_LOG_PATH': str(tmp_path / 'requests.log'),
+        'RATELIMIT_ENABLED': False
+    })
+    app = create_app('logged_testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    stop_request_logging(app)
+    del config['logged_testing']
+
+def read_log(app):
+    """Stop the writer thread (draining the queue) and parse the lines it wrote"""
+    stop_request_logging(app)
+    with open(app.config['REQUEST_LOG_PATH']) as handle:
+        return [json.loads(line) for line in handle]
+
+def test_request_lines_include_route_user_and_sql(logged_app, make_user, token_for, auth_headers, monkeypatch):
+    """Test the logged fields, sampling and swallowed exception details"""
+    client = logged_app.test_client()
+    user = make_user()
+    headers = auth_headers(token_for(user))
+    
+    assert client.get('/health').status_code == 200  # sampled out
+    response = client.get('/api/subscriptions/', headers=dict(headers, **{'X-Request-ID': 'abc123'}))
+    assert response.headers['X-Request-ID'] == 'abc123'
+    
+    def broken_index():
+        raise RuntimeError('index unavailable')
+    monkeypatch.setattr('app.routes.subscriptions.subscription_index', broken_index)
+    response = client.post('/api/subscriptions/', data=json.dumps({
+        'shape': 'circle', 'latitude': -1.29, 'longitude': 36.82, 'radius_meters': 500
+    }), headers=headers)
+    assert response.status_code == 500
+    
+    listing, failure = read_log(logged_app)
+    assert listing['request_id'] == 'abc123'
+    assert listing['route'] == '/api/subscriptions/'
+    assert listing['endpoint'] == 'subscriptions.get_subscriptions'
+    assert (listing['status'], listing['user_id'], listing['level']) == (200, user.id, 'info')
+    assert listing['sql_count'] == 1 and listing['latency_ms'] > 0
+    assert 'error' not in listing
+    
+    assert (failure['status'], failure['level']) == (500, 'error')
+    assert failure['error']['type'] == 'RuntimeError'
+    assert failure['error']['message'] == 'index unavailable'
+    assert 'broken_index' in failure['error']['traceback']
+
+def test_full_queue_drops_and_counts_records():
+    """Test that logging never waits for a full queue and reports what it dropped"""
+    log_queue = queue.Queue(1)
+    handler = NonBlockingQueueHandler(log_queue)
+    logger = logging.Logger('request_log_test')
+    logger.addHandler(handler)
+    
+    for number in range(3):
+        logger.info('record %d', number)
+    assert log_queue.get_nowait().message == 'record 0'
+    
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        logger.exception('failed')
+    record = log_queue.get_nowait()
+    assert record.dropped == 2
+    assert record.exc_info is None and 'ValueError: boom' in record.traceback
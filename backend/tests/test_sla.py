@@ -0,0 +1,46 @@
+import json
+from datetime import datetime, timedelta
+from app import db
+from app.models.job import Job
+from app.utils.sla import check_breaches, sla_summary
+
+def test_due_at_follows_priority(app, make_user, make_incident):
+    """Test deadlines at creation and after a priority change"""
+    incident = make_incident(make_user(), priority='critical')
+    assert incident.due_at - incident.created_at <= timedelta(hours=4, seconds=1)
+    
+    incident.priority = 'low'
+    db.session.commit()
+    assert incident.due_at - incident.created_at == timedelta(hours=336)
+
+def test_breach_check_marks_and_notifies_once(app, make_user, make_incident):
+    """Test that overdue active incidents are flagged once and their assignee notified"""
+    admin = make_user('admin', role='admin')
+    reporter = make_user()
+    overdue = make_incident(reporter, priority='high', assigned_to=admin.id,
+                            created_at=datetime.utcnow() - timedelta(hours=30))
+    make_incident(reporter, priority='high')
+    make_incident(reporter, priority='high', status='resolved',
+                  created_at=datetime.utcnow() - timedelta(hours=30))
+    
+    assert check_breaches() == [overdue.id]
+    assert check_breaches() == []
+    
+    notification = Job.query.filter_by(kind='incident_notification').one()
+    assert notification.payload['event'] == 'sla_breached'
+    assert notification.payload['user_id'] == admin.id
+    
+    summary = sla_summary()
+    assert summary['breached'] == 1
+    assert summary['breached_by_priority'] == {'high': 1}
+    assert summary['due_soon'] == 1
+
+def test_dashboard_reports_sla(client, make_user, make_incident, token_for, auth_headers):
+    """Test the SLA section of the admin dashboard"""
+    admin = make_user('admin', role='admin')
+    make_incident(admin, priority='critical', created_at=datetime.utcnow() - timedelta(hours=5))
+    check_breaches()
+    
+    response = client.get('/api/admin/dashboard', headers=auth_headers(token_for(admin)))
+    assert response.status_code == 200
+    assert json.loads(response.data)['sla_stats']['breached_by_priority'] == {'critical': 1}
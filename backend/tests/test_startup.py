@@ -0,0 +1,30 @@
+import json
+from app.utils.startup import measure_startup, profile_imports, _run_fresh
+from config import config
+
+def test_startup_within_budget():
+    """Test that a fresh worker imports and builds the app within the startup budget"""
+    # Best of three to ignore a cold filesystem cache
+    elapsed = min(measure_startup('testing') for _ in range(3))
+    assert elapsed < config['testing'].STARTUP_TIME_BUDGET_SECONDS
+
+def test_rarely_used_extensions_are_lazy():
+    """Test that Mail and Migrate are not imported when serving requests"""
+    result = _run_fresh(
+        'import sys, json; from app import create_app; create_app("testing"); '
+        'print(json.dumps([m in sys.modules for m in ("flask_mail", "flask_migrate", "alembic")]))'
+    )
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == [False, False, False]
+
+def test_mail_initializes_on_first_use(app):
+    """Test that get_mail binds Flask-Mail to the current app"""
+    from app import get_mail
+    assert 'mail' not in app.extensions
+    mail = get_mail()
+    assert app.extensions['mail'].server == app.config['MAIL_SERVER']
+    assert get_mail() is mail
+
+def test_import_profile_reports_app_modules():
+    """Test that the import profile parses -X importtime output"""
+    names = {name for name, self_us, cumulative, depth in profile_imports('testing')}
+    assert {'app', 'flask', 'config'} <= names
@@ -0,0 +1,96 @@
+import json
+from app import db
+from app.models.job import Job
+from app.models.subscription import AreaSubscription
+from app.utils.geofence import SubscriptionIndex
+from app.utils.jobs import run_pending
+
+NAIROBI = (-1.2921, 36.8219)
+
+def subscription(id, shape='circle', categories=None, **kwargs):
+    values = {
+        'center_latitude': NAIROBI[0],
+        'center_longitude': NAIROBI[1],
+        'radius_meters': 1000
+    } if shape == 'circle' else {}
+    values.update(kwargs)
+    return AreaSubscription(id=id, user_id=id, shape=shape, categories=categories, is_active=True, **values)
+
+def test_index_matches_circles_polygons_and_categories():
+    """Test exact shape checks, category filters and removal"""
+    index = SubscriptionIndex(cell_size=0.05, max_cells=400)
+    square = [[-1.30, 36.81], [-1.30, 36.83], [-1.28, 36.83], [-1.28, 36.81]]
+    index.rebuild([
+        subscription(1),
+        subscription(2, shape='polygon', polygon=square),
+        subscription(3, categories=['safety']),
+        subscription(4, shape='polygon', polygon=[[-10, 30], [-10, 45], [5, 45], [5, 30]])
+    ], None)
+    
+    assert sorted(region.id for region in index.match(*NAIROBI, 'infrastructure')) == [1, 2, 4]
+    assert sorted(region.id for region in index.match(*NAIROBI, 'safety')) == [1, 2, 3, 4]
+    assert [region.id for region in index.match(-1.2921, 36.84, 'infrastructure')] == [4]
+    assert index.match(20.0, 36.82, 'infrastructure') == []
+    
+    removed = subscription(2, shape='polygon', polygon=square)
+    removed.is_active = False
+    index.apply([removed])
+    assert sorted(region.id for region in index.match(*NAIROBI, 'infrastructure')) == [1, 4]
+    assert len(index) == 3
+
+def test_subscription_crud(client, make_user, token_for, auth_headers):
+    """Test creating, listing and deleting subscriptions"""
+    user = make_user()
+    other = make_user('other')
+    headers = auth_headers(token_for(user))
+    
+    response = client.post('/api/subscriptions/', data=json.dumps({
+        'shape': 'circle', 'latitude': NAIROBI[0], 'longitude': NAIROBI[1], 'radius_meters': 10 ** 6
+    }), headers=headers)
+    assert response.status_code == 400
+    
+    response = client.post('/api/subscriptions/', data=json.dumps({
+        'name': 'Home', 'shape': 'circle', 'latitude': NAIROBI[0], 'longitude': NAIROBI[1],
+        'radius_meters': 500, 'categories': ['safety']
+    }), headers=headers)
+    assert response.status_code == 201
+    subscription_id = json.loads(response.data)['subscription']['id']
+    
+    listing = json.loads(client.get('/api/subscriptions/', headers=headers).data)
+    assert [item['name'] for item in listing['subscriptions']] == ['Home']
+    
+    response = client.delete(f'/api/subscriptions/{subscription_id}', headers=auth_headers(token_for(other)))
+    assert response.status_code == 404
+    response = client.delete(f'/api/subscriptions/{subscription_id}', headers=headers)
+    assert response.status_code == 200
+    assert json.loads(client.get('/api/subscriptions/', headers=headers).data)['subscriptions'] == []
+
+def test_new_incident_alerts_subscribers(client, make_user, token_for, auth_headers):
+    """Test that reports inside a subscribed area are fanned out to subscribers' digests"""
+    reporter = make_user()
+    neighbour = make_user('neighbour')
+    client.post('/api/subscriptions/', data=json.dumps({
+        'shape': 'circle', 'latitude': NAIROBI[0], 'longitude': NAIROBI[1], 'radius_meters': 2000
+    }), headers=auth_headers(token_for(neighbour)))
+    client.post('/api/subscriptions/', data=json.dumps({
+        'shape': 'circle', 'latitude': NAIROBI[0], 'longitude': NAIROBI[1], 'radius_meters': 2000
+    }), headers=auth_headers(token_for(reporter)))
+    
+    response = client.post('/api/incidents/', data=json.dumps({
+        'title': 'Broken streetlight',
+        'description': 'The streetlight at the junction has been out for a week',
+        'category': 'infrastructure',
+        'latitude': NAIROBI[0] + 0.005,
+        'longitude': NAIROBI[1]
+    }), headers=auth_headers(token_for(reporter)))
+    assert response.status_code == 201
+    
+    alert = Job.query.filter_by(kind='area_alert').one()
+    assert alert.payload['user_ids'] == [neighbour.id]
+    
+    Job.query.filter(Job.kind != 'area_alert').delete()
+    db.session.commit()
+    run_pending()
+    notification = Job.query.filter_by(kind='incident_notification').one()
+    assert notification.payload['user_id'] == neighbour.id
+    assert notification.batch_key == f'notify:{neighbour.id}'
@@ -0,0 +1,77 @@
+import json
+from datetime import datetime, timedelta
+from app import db
+from app.models.incident import Incident
+from app.utils.archive import archive_batch, archive_cutoff
+from app.utils.ranking import decay_scores
+from app.utils.sync import encode_watermark
+
+def sync(client, since=None, **params):
+    query = '&'.join(f'{key}={value}' for key, value in params.items())
+    response = client.get(f'/api/incidents/sync?fields=id,title&{query}' + (f'&since={since}' if since else ''))
+    return response.status_code, json.loads(response.data)
+
+def test_sync_pages_then_returns_only_changes(app, client, make_user, make_incident, token_for, auth_headers):
+    """Test batched catch-up, then a feed of updates and deletions"""
+    app.config['SYNC_SETTLE_SECONDS'] = 0
+    admin = make_user('admin', role='admin')
+    incidents = [make_incident(admin, title=f'Incident {number}') for number in range(3)]
+    
+    status, first = sync(client, limit=2)
+    assert status == 200
+    assert [incident['id'] for incident in first['incidents']] == [incidents[0].id, incidents[1].id]
+    assert first['has_more']
+    
+    status, second = sync(client, first['watermark'], limit=2)
+    assert [incident['id'] for incident in second['incidents']] == [incidents[2].id]
+    assert not second['has_more']
+    
+    status, idle = sync(client, second['watermark'])
+    assert idle['incidents'] == idle['deleted'] == []
+    
+    headers = auth_headers(token_for(admin))
+    client.put(f'/api/incidents/{incidents[1].id}', data=json.dumps({'title': 'Renamed'}), headers=headers)
+    client.delete(f'/api/incidents/{incidents[0].id}', headers=headers)
+    
+    status, changes = sync(client, idle['watermark'])
+    assert changes['incidents'] == [{'id': incidents[1].id, 'title': 'Renamed'}]
+    assert [(tombstone['id'], tombstone['reason']) for tombstone in changes['deleted']] == [
+        (incidents[0].id, 'deleted')
+    ]
+
+def test_sync_reports_archived_incidents(app, client, make_user, make_incident):
+    """Test that archival shows up as a removal for syncing clients"""
+    app.config['SYNC_SETTLE_SECONDS'] = 0
+    long_ago = datetime.utcnow() - timedelta(days=400)
+    incident_id = make_incident(make_user(), status='resolved', created_at=long_ago, resolved_at=long_ago).id
+    status, snapshot = sync(client)
+    
+    archive_batch(archive_cutoff(365), batch_size=10)
+    status, changes = sync(client, snapshot['watermark'])
+    assert [(tombstone['id'], tombstone['reason']) for tombstone in changes['deleted']] == [
+        (incident_id, 'archived')
+    ]
+
+def test_sync_holds_back_unsettled_rows(client, make_user, make_incident):
+    """Test that rows younger than the settle window wait for the next call"""
+    make_incident(make_user())
+    status, data = sync(client)
+    assert data['incidents'] == []
+
+def test_sync_rejects_bad_or_expired_watermarks(client):
+    """Test watermark validation"""
+    assert sync(client, 'not-a-watermark')[0] == 400
+    
+    expired = datetime.utcnow() - timedelta(days=365)
+    assert sync(client, encode_watermark((expired, 0), (expired, 0)))[0] == 410
+
+def test_score_decay_does_not_touch_updated_at(app, make_user, make_incident):
+    """Test that periodic rescoring is invisible to the change feed"""
+    last_week = datetime.utcnow() - timedelta(days=7)
+    incident = make_incident(make_user(), created_at=last_week, updated_at=last_week)
+    
+    decay_scores()
+    db.session.expire_all()
+    incident = db.session.get(Incident, incident.id)
+    assert incident.updated_at == last_week
+    assert incident.trending_score > 0
@@ -0,0 +1,65 @@
+import json
+from sqlalchemy import event
+from app import db
+
+def test_search_matches_every_term_by_prefix(client, make_user, token_for, auth_headers):
+    """Test searching across username, email and names, with role filters"""
+    admin = make_user('admin', role='admin')
+    make_user('jdoe', first_name='Jane', last_name='Doe', email='jane.doe@example.com')
+    make_user('jsmith', first_name='John', last_name='Smith', email='smith@example.com')
+    make_user('mwanjiku', first_name='Mary', last_name='Wanjiku', email='MWanjiku@Example.com')
+    headers = auth_headers(token_for(admin))
+    
+    def search(query, **params):
+        params['q'] = query
+        data = json.loads(client.get('/api/auth/users', query_string=params, headers=headers).data)
+        return [user['username'] for user in data['users']]
+    
+    assert search('J') == ['jdoe', 'jsmith']
+    assert search('jane do') == ['jdoe']
+    assert search('SMITH') == ['jsmith']
+    assert search('mwanjiku@example') == ['mwanjiku']
+    assert search('', role='admin') == ['admin']
+
+def test_cursor_pagination_and_incident_counts(client, make_user, make_incident, token_for, auth_headers):
+    """Test walking pages with the cursor and counting incidents in one grouped query"""
+    admin = make_user('admin', role='admin')
+    reporters = [make_user(f'reporter{index}') for index in range(5)]
+    make_incident(reporters[0])
+    make_incident(reporters[0], status='resolved')
+    make_incident(reporters[2])
+    headers = auth_headers(token_for(admin))
+    
+    seen = []
+    cursor = None
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        while True:
+            params = {'limit': 2, 'q': 'reporter', 'include_counts': 'true'}
+            if cursor:
+                params['cursor'] = cursor
+            data = json.loads(client.get('/api/auth/users', query_string=params, headers=headers).data)
+            seen.extend(data['users'])
+            cursor = data['pagination']['next_cursor']
+            if not cursor:
+                break
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    
+    assert [user['username'] for user in seen] == [f'reporter{index}' for index in range(5)]
+    assert seen[0]['incident_counts'] == {'reported': 2, 'active': 1, 'resolved': 1}
+    assert seen[1]['incident_counts'] == {'reported': 0, 'active': 0, 'resolved': 0}
+    assert seen[2]['incident_counts']['reported'] == 1
+    assert len([statement for statement in statements if 'FROM incidents' in statement]) == 3
+    
+    response = client.get('/api/auth/users', query_string={'cursor': 'not-a-cursor'}, headers=headers)
+    assert response.status_code == 400
+    
+    # Without q or cursor, the listing keeps its offset pagination
+    offset = json.loads(client.get('/api/auth/users', query_string={'page': 2, 'limit': 4}, headers=headers).data)
+    assert offset['pagination']['total_items'] == 6
+    assert [user['username'] for user in offset['users']] == ['reporter3', 'reporter4']
+    first = json.loads(client.get('/api/auth/users', query_string={'limit': 4}, headers=headers).data)
+    assert first['pagination']['current_page'] == 1 and 'next_cursor' not in first['pagination']